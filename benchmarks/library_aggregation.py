@@ -0,0 +1,65 @@
+"""
+Times building the albums and artists of a synthetic library,
+in one pass over the tracks and in a pass each.
+
+Usage:
+    python benchmarks/library_aggregation.py [tracks]
+
+eg. python benchmarks/library_aggregation.py 500000
+"""
+
+import random
+import sys
+import time
+
+from library_memory import make_tracks
+
+from swingmusic.lib.aggregate import aggregate_library
+from swingmusic.lib.albumslib import aggregate_albums
+from swingmusic.lib.tagger import aggregate_artists
+from swingmusic.store.tracks import TrackStore
+
+
+def timed(label: str, fn):
+    start = time.perf_counter()
+    result = fn()
+    print(f"{label:<24} {time.perf_counter() - start:8.2f}s")
+    return result
+
+
+def main(count: int):
+    rng = random.Random(0)
+
+    start = time.perf_counter()
+    for track in make_tracks(count, rng):
+        TrackStore.add_track(track)
+
+    tracks = TrackStore.get_flat_list()
+    print(f"{count:,} tracks ({time.perf_counter() - start:.1f}s to build)")
+
+    albums, artists = timed("single pass", lambda: aggregate_library(tracks))
+    timed("albums only", lambda: aggregate_albums(tracks))
+    timed("artists only", lambda: aggregate_artists(tracks))
+
+    # INFO: What the watchdog rebuilds when a track of one album changes
+    album = rng.choice(albums)[0]
+    changed = {album.albumhash}
+    changed_artists = set(album.artisthashes)
+    subset = [
+        *TrackStore.get_tracks_by_albumhash(album.albumhash),
+        *(
+            track
+            for artisthash in changed_artists
+            for track in TrackStore.get_tracks_by_artisthash(artisthash)
+        ),
+    ]
+    timed(
+        f"one album ({len(subset)} tracks)",
+        lambda: aggregate_library(subset, changed, changed_artists),
+    )
+
+    print(f"{len(albums):,} albums, {len(artists):,} artists")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 500_000)
@@ -0,0 +1,104 @@
+"""
+Measures the resident memory of the track, album and artist stores
+for a synthetic library.
+
+Usage:
+    python benchmarks/library_memory.py [tracks]
+
+eg. python benchmarks/library_memory.py 400000
+"""
+
+import gc
+import os
+import random
+import sys
+import tempfile
+import time
+
+# INFO: Keep the benchmark from touching the real config directory
+os.environ.setdefault("HOME", tempfile.mkdtemp())
+
+import psutil
+
+from swingmusic.config import UserConfig
+from swingmusic.lib.albumslib import create_albums
+from swingmusic.lib.tagger import create_artists
+from swingmusic.models import Track
+from swingmusic.store.tracks import TrackStore
+from swingmusic.utils.hashing import create_hash
+
+GENRES = ["rock", "pop", "hip hop", "r&b", "jazz", "electronic", "indie", "soul"]
+TRACKS_PER_ALBUM = 12
+ALBUMS_PER_ARTIST = 4
+
+
+def rss():
+    gc.collect()
+    return psutil.Process().memory_info().rss / 1024 / 1024
+
+
+def make_tracks(count: int, rng: random.Random):
+    config = UserConfig()
+    artist_count = max(count // (TRACKS_PER_ALBUM * ALBUMS_PER_ARTIST), 1)
+    artists = [f"Artist {i}" for i in range(artist_count)]
+
+    for i in range(count):
+        albumno = i // TRACKS_PER_ALBUM
+        artist = artists[albumno // ALBUMS_PER_ARTIST % artist_count]
+        trackartists = artist
+
+        # INFO: About a fifth of the tracks have a featured artist
+        if rng.random() < 0.2:
+            trackartists += ", " + rng.choice(artists)
+
+        folder = f"/music/{artist}/Album {albumno}"
+
+        yield Track(
+            id=i,
+            album=f"Album {albumno}",
+            albumartists=artist,
+            albumhash=create_hash(f"Album {albumno}", artist),
+            artists=trackartists,
+            bitrate=320,
+            copyright="",
+            date=2000 + albumno % 20,
+            disc=1,
+            duration=200,
+            filepath=f"{folder}/{i}.mp3",
+            folder=folder,
+            genres="/".join(rng.sample(GENRES, 2)),
+            last_mod=i,
+            title=f"Song {i}",
+            track=i % TRACKS_PER_ALBUM + 1,
+            trackhash="",
+            extra={},
+            lastplayed=0,
+            playcount=0,
+            playduration=0,
+            config=config,
+        )
+
+
+def main(count: int):
+    rng = random.Random(0)
+    base = rss()
+
+    start = time.perf_counter()
+    for track in make_tracks(count, rng):
+        TrackStore.add_track(track)
+
+    tracks = rss()
+    elapsed = time.perf_counter() - start
+
+    albums = create_albums()
+    artists = create_artists([])
+    total = rss()
+
+    print(f"{count:,} tracks, {len(albums):,} albums, {len(artists):,} artists")
+    print(f"tracks:  {tracks - base:8.1f} MB ({elapsed:.1f}s to build)")
+    print(f"albums + artists: {total - tracks:8.1f} MB")
+    print(f"total:   {total - base:8.1f} MB")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200_000)
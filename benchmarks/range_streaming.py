@@ -0,0 +1,206 @@
+"""
+Measures how many concurrent audio streams the file endpoint can serve
+per CPU core, with the range streaming and with the old chunked sending.
+
+The app is served by Granian, as in production. Each client plays a whole
+track: the range endpoint is read with one `Range: bytes=0-` request, the
+chunked endpoint with a request per chunk, like the web client does.
+
+Usage:
+    python benchmarks/range_streaming.py [streams] [size_mb]
+
+eg. python benchmarks/range_streaming.py 32 10
+"""
+
+import http.client
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import psutil
+
+BITRATE = 320_000 // 8
+"""
+Bytes per second of a 320 kbps stream.
+"""
+PLAYS = 5
+"""
+Times each client plays the track.
+"""
+
+
+def create_app():
+    """
+    The Granian factory. Serves the file in `BENCH_FILE` on both endpoints.
+    """
+    from flask import Flask
+
+    from swingmusic.api.stream import send_file_as_chunks
+    from swingmusic.utils.filestream import send_file_range
+
+    app = Flask(__name__)
+    filepath = os.environ["BENCH_FILE"]
+
+    @app.get("/range")
+    def range_endpoint():
+        return send_file_range(filepath, "audio/mpeg")
+
+    @app.get("/chunks")
+    def chunks_endpoint():
+        return send_file_as_chunks(filepath)
+
+    return app
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(filepath: str, port: int, threads: int):
+    env = {**os.environ, "BENCH_FILE": filepath}
+    server = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "granian",
+            "--interface",
+            "wsgi",
+            "--factory",
+            "--working-dir",
+            os.path.dirname(os.path.abspath(__file__)),
+            "--port",
+            str(port),
+            "--workers",
+            "1",
+            "--blocking-threads",
+            str(threads),
+            "--no-log",
+            "range_streaming:create_app",
+        ],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+
+    for _ in range(100):
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.1).close()
+            return server
+        except OSError:
+            time.sleep(0.1)
+
+    server.kill()
+    raise RuntimeError("The server did not start")
+
+
+def server_cpu(server: subprocess.Popen) -> float:
+    process = psutil.Process(server.pid)
+    total = 0.0
+
+    for p in [process, *process.children(recursive=True)]:
+        times = p.cpu_times()
+        total += times.user + times.system
+
+    return total
+
+
+def play_range(port: int, size: int) -> tuple[int, int]:
+    conn = http.client.HTTPConnection("127.0.0.1", port)
+    conn.request("GET", "/range", headers={"Range": "bytes=0-"})
+    response = conn.getresponse()
+    received = 0
+
+    while chunk := response.read(64 * 1024):
+        received += len(chunk)
+
+    conn.close()
+    return received, 1
+
+
+def play_chunks(port: int, size: int) -> tuple[int, int]:
+    conn = http.client.HTTPConnection("127.0.0.1", port)
+    received = requests = 0
+
+    while received < size:
+        conn.request("GET", "/chunks", headers={"Range": f"bytes={received}-"})
+        body = conn.getresponse().read()
+        requests += 1
+
+        if not body:
+            break
+
+        received += len(body)
+
+    conn.close()
+    return received, requests
+
+
+def run(name: str, play, filepath: str, streams: int):
+    size = os.path.getsize(filepath)
+    port = free_port()
+    server = start_server(filepath, port, threads=streams)
+    results: list[tuple[int, int]] = []
+
+    def client():
+        for _ in range(PLAYS):
+            results.append(play(port, size))
+
+    try:
+        cpu = server_cpu(server)
+        start = time.perf_counter()
+        clients = [threading.Thread(target=client) for _ in range(streams)]
+
+        for c in clients:
+            c.start()
+
+        for c in clients:
+            c.join()
+
+        wall = time.perf_counter() - start
+        cpu = server_cpu(server) - cpu
+    finally:
+        server.kill()
+        server.wait()
+
+    served = sum(r[0] for r in results)
+    requests = sum(r[1] for r in results)
+
+    if served != size * streams * PLAYS:
+        print(f"{name}: expected {size * streams * PLAYS} bytes, got {served}")
+
+    per_core = served / cpu / BITRATE if cpu > 0 else float("inf")
+
+    print(
+        f"{name:<8} {streams} streams x {PLAYS} plays in {wall:6.2f}s, "
+        f"{requests / streams / PLAYS:6.1f} requests per track, "
+        f"{served / wall / 1024 / 1024:7.1f} MB/s, "
+        f"server cpu {cpu:5.2f}s, "
+        f"~{per_core:,.0f} 320kbps streams per core"
+    )
+
+
+def main(streams: int, size_mb: int):
+    # INFO: Tracks are rarely a multiple of the old 512 KB chunk size
+    with tempfile.NamedTemporaryFile(suffix=".mp3", delete=False) as f:
+        f.write(os.urandom(size_mb * 1024 * 1024 + 12_345))
+        filepath = f.name
+
+    try:
+        print(f"{size_mb} MB track, {psutil.cpu_count()} cpus")
+        run("range", play_range, filepath, streams)
+        run("chunks", play_chunks, filepath, streams)
+    finally:
+        os.remove(filepath)
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 32,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 10,
+    )
@@ -0,0 +1,134 @@
+"""
+Compares the trigram prefiltered search against an exhaustive search
+on synthetic corpora of different sizes.
+
+Usage:
+    python benchmarks/search_prefilter.py [sizes...]
+
+eg. python benchmarks/search_prefilter.py 10000 100000 1000000
+"""
+
+import random
+import sys
+import time
+from dataclasses import dataclass
+
+from rapidfuzz import fuzz
+
+from swingmusic.store.searchcorpus import SearchCorpus
+
+SYLLABLES = [
+    "la", "mo", "ri", "ka", "shi", "en", "tor", "vel", "an", "dre",
+    "mi", "lo", "sa", "ne", "qu", "ber", "gon", "ti", "ya", "zel",
+]
+LIMIT = 150
+CUTOFF = 50
+QUERIES = 50
+
+
+@dataclass
+class Item:
+    id: int
+    title: str
+
+
+def make_vocabulary(size: int, rng: random.Random):
+    words = set()
+
+    while len(words) < size:
+        words.add("".join(rng.choices(SYLLABLES, k=rng.randint(1, 4))))
+
+    return sorted(words)
+
+
+def make_title(vocab: list[str], rng: random.Random):
+    # INFO: Zipf-like word distribution, common words appear more often
+    count = rng.randint(1, 5)
+    return " ".join(
+        vocab[min(int(rng.paretovariate(1.2)) - 1, len(vocab) - 1)]
+        if rng.random() < 0.5
+        else rng.choice(vocab)
+        for _ in range(count)
+    ).title()
+
+
+def make_query(title: str, rng: random.Random):
+    words = title.split()
+    query = " ".join(words[: rng.randint(1, len(words))])
+
+    # INFO: Simulate a typo in a third of the queries
+    if len(query) > 4 and rng.random() < 0.33:
+        i = rng.randrange(len(query))
+        query = query[:i] + query[i + 1 :]
+
+    # INFO: Simulate type-ahead by cutting off the last characters
+    if rng.random() < 0.5:
+        query = query[: max(3, len(query) - rng.randint(0, 3))]
+
+    return query
+
+
+def run(size: int):
+    rng = random.Random(size)
+    vocab = make_vocabulary(5000, rng)
+    items = [Item(i, make_title(vocab, rng)) for i in range(size)]
+    queries = [make_query(rng.choice(items).title, rng) for _ in range(QUERIES)]
+
+    corpus = SearchCorpus(key=lambda i: i.id, text=lambda i: i.title)
+
+    start = time.perf_counter()
+    corpus.load(items)
+    load_time = time.perf_counter() - start
+
+    # INFO: Build the trigram index ahead of the timed runs
+    start = time.perf_counter()
+    corpus.extract("warmup", scorer=fuzz.WRatio, score_cutoff=CUTOFF, limit=LIMIT)
+    index_time = time.perf_counter() - start
+
+    full_times = []
+    pre_times = []
+    recalls = []
+
+    for query in queries:
+        start = time.perf_counter()
+        full = corpus.extract(
+            query, fuzz.WRatio, score_cutoff=CUTOFF, limit=LIMIT, prefilter=False
+        )
+        full_times.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        pre = corpus.extract(query, fuzz.WRatio, score_cutoff=CUTOFF, limit=LIMIT)
+        pre_times.append(time.perf_counter() - start)
+
+        # INFO: Compare against the top results of the exhaustive search.
+        # Ties at the lowest score are interchangeable, so only results
+        # scoring above the last exhaustive score have to be found.
+        if not full:
+            recalls.append(1.0)
+            continue
+
+        floor = full[-1].score
+        expected = {
+            m.item.id for m in full if m.score > floor or len(full) < LIMIT
+        }
+        found = {m.item.id for m in pre}
+        recalls.append(len(expected & found) / len(expected) if expected else 1.0)
+
+    def ms(values: list[float]):
+        values = sorted(values)
+        return (
+            f"p50 {values[len(values) // 2] * 1000:8.1f} ms  "
+            f"p95 {values[int(len(values) * 0.95)] * 1000:8.1f} ms"
+        )
+
+    print(f"\n{size:,} entries (load {load_time:.1f}s, trigram index {index_time:.1f}s)")
+    print(f"  exhaustive:  {ms(full_times)}")
+    print(f"  prefiltered: {ms(pre_times)}")
+    print(f"  mean recall: {sum(recalls) / len(recalls):.3f}")
+
+
+if __name__ == "__main__":
+    sizes = [int(s) for s in sys.argv[1:]] or [10_000, 100_000, 1_000_000]
+
+    for size in sizes:
+        run(size)
@@ -39,6 +39,12 @@ parser.add_argument(
     type=pathlib.Path,
 )
 parser.add_argument("--client", help="Path to the Web UI folder.", type=pathlib.Path)
+parser.add_argument(
+    "--profile-startup",
+    default=False,
+    action="store_true",
+    help="Print the time taken by each startup phase and module import.",
+)
 
 tools = parser.add_argument_group(title="Tools")
 tools.add_argument("--password-reset", help="Reset the password.", action="store_true")
@@ -122,6 +128,10 @@ def run(*args, **kwargs):
     AssetHandler.setup_default_client()
 
     os.environ["SWINGMUSIC_DEBUG"] = "1" if args["debug"] else "0"
+
+    # INFO: Read by the server worker process
+    if args["profile_startup"]:
+        os.environ["SWINGMUSIC_PROFILE_STARTUP"] = "1"
     setup_logger(debug=args["debug"], app_dir=settings.Paths().config_dir)
 
     if args["password_reset"]:
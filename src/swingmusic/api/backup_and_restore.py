@@ -236,7 +236,7 @@ def restore(body: RestoreBackupBody):
             restore_backup.restore()
             backups.append(backup_dir.name)
 
-    index_everything()
+    index_everything(rebuild=True)
     return {"msg": f"Restored successfully", "backups": backups}, 200
 
 
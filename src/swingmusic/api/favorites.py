@@ -221,7 +221,7 @@ def get_all_favorites(query: GetAllFavoritesQuery):
         "artists": len(artists),
     }
 
-    tracks = TrackStore.get_tracks_by_trackhashes(tracks[:track_limit])
+    tracks = TrackStore.get_tracks_by_trackhashes(tracks, limit=track_limit)
     albums = AlbumStore.get_albums_by_hashes(albums[:album_limit])
     artists = ArtistStore.get_artists_by_hashes(artists[:artist_limit])
 
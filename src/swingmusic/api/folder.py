@@ -150,9 +150,9 @@ def get_folder_tree(body: FolderTree):
                     }, 404
 
             tracks = TrackStore.get_tracks_by_trackhashes(
-                playlist.trackhashes[
-                    body.start : body.start + body.limit if body.limit > 0 else None
-                ]
+                playlist.trackhashes,
+                start=body.start,
+                limit=body.limit if body.limit > 0 else None,
             )
 
             return {
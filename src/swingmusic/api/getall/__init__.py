@@ -1,10 +1,8 @@
 from flask_openapi3 import Tag
-from natsort import natsorted
 from pydantic import BaseModel, Field
 from flask_openapi3 import APIBlueprint
 
 from datetime import datetime
-from swingmusic.config import UserConfig
 from swingmusic.store.albums import AlbumStore
 from swingmusic.store.artists import ArtistStore
 from swingmusic.api.apischemas import GenericLimitSchema
@@ -16,7 +14,6 @@ from swingmusic.utils.dates import (
     seconds_to_time_string,
     timestamp_to_time_passed,
 )
-from swingmusic.utils.parsers import get_sort_name
 from swingmusic.serializers.album import serialize_for_card as serialize_album
 from swingmusic.serializers.artist import serialize_for_card as serialize_artist
 
@@ -68,18 +65,18 @@ def get_all_items(path: GetAllItemsPath, query: GetAllItemsQuery):
     is_albums = path.itemtype == "albums"
     is_artists = path.itemtype == "artists"
 
-    if is_albums:
-        items = AlbumStore.get_flat_list()
-    elif is_artists:
-        items = ArtistStore.get_flat_list()
-
-    total = len(items)
-
     start = query.start
     limit = query.limit
     sortkey = query.sortby
     reverse = query.reverse == "1"
 
+    if is_albums:
+        sorted_items = AlbumStore.get_sorted(sortkey, reverse)
+    elif is_artists:
+        sorted_items = ArtistStore.get_sorted(sortkey, reverse)
+
+    total = len(sorted_items)
+
     sort_is_count = sortkey == "trackcount"
     sort_is_duration = sortkey == "duration"
     sort_is_create_date = sortkey == "created_date"
@@ -88,49 +85,10 @@ def get_all_items(path: GetAllItemsPath, query: GetAllItemsQuery):
     sort_is_lastplayed = sortkey == "lastplayed"
 
     sort_is_date = is_albums and sortkey == "date"
-    sort_is_albumartists = is_albums and sortkey == "albumartists"
-    sort_is_artistname = is_artists and sortkey == "name"
 
     sort_is_artist_trackcount = is_artists and sortkey == "trackcount"
     sort_is_artist_albumcount = is_artists and sortkey == "albumcount"
 
-    def sortfunc(x):
-        return getattr(x, sortkey)
-
-    def sortfunc_casefold(x):
-        return getattr(x, sortkey).casefold()
-
-    if sort_is_albumartists:
-        config = UserConfig()
-
-        if config.artistArticleAwareSorting:
-
-            def sortfunc(x):
-                return get_sort_name(
-                    getattr(x, sortkey)[0]["name"],
-                    articles=config.artistSortingArticles,
-                )
-        else:
-
-            def sortfunc(x):
-                return getattr(x, sortkey)[0]["name"].casefold()
-
-    if sort_is_artistname:
-        config = UserConfig()
-
-        if config.artistArticleAwareSorting:
-
-            def sortfunc_casefold(x):
-                return get_sort_name(
-                    getattr(x, sortkey),
-                    articles=config.artistSortingArticles,
-                )
-
-    try:
-        sorted_items = natsorted(items, key=sortfunc_casefold, reverse=reverse)
-    except AttributeError:
-        sorted_items = sorted(items, key=sortfunc, reverse=reverse)
-
     items = sorted_items[start : start + limit]
     album_list = []
 
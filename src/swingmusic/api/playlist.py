@@ -239,11 +239,10 @@ def get_playlist(path: PlaylistIDPath, query: GetPlaylistQuery):
     if playlist is None:
         return {"msg": "Playlist not found"}, 404
 
-    if query.limit == -1:
-        query.limit = len(playlist.trackhashes) - 1
-
     tracks = TrackStore.get_tracks_by_trackhashes(
-        playlist.trackhashes[query.start : query.start + query.limit]
+        playlist.trackhashes,
+        start=query.start,
+        limit=None if query.limit == -1 else query.limit,
     )
     duration = sum(t.duration for t in tracks)
     playlist._last_updated = date_string_to_time_passed(playlist.last_updated)
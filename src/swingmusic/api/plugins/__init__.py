@@ -4,7 +4,6 @@ from pydantic import BaseModel, Field
 from swingmusic.api.auth import admin_required
 from swingmusic.config import UserConfig
 from swingmusic.db.userdata import PluginTable
-from swingmusic.plugins.lastfm import LastFmPlugin
 from swingmusic.utils.auth import get_current_userid
 
 bp_tag = Tag(name="Plugins", description="Manage plugins")
@@ -78,6 +77,8 @@ def create_lastfm_session(body: LastFmSessionBody):
     if not body.token:
         return {"error": "Missing token"}, 400
 
+    from swingmusic.plugins.lastfm import LastFmPlugin
+
     lastfm = LastFmPlugin(current_userid=get_current_userid())
     session_key = lastfm.get_session_key(body.token)
 
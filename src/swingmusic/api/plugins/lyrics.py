@@ -4,8 +4,6 @@ from pydantic import Field
 from swingmusic.api.apischemas import TrackHashSchema
 from swingmusic.config import UserConfig
 from swingmusic.lib.lyrics import Lyrics as Lyrics_class
-
-from swingmusic.plugins.lyrics import Lyrics
 from swingmusic.premium import CloudError, LicenseError
 from swingmusic.settings import Defaults
 from swingmusic.utils.hashing import create_hash
@@ -66,6 +64,8 @@ def search_lyrics(body: LyricsSearchBody):
         print("Error getting lyrics from cloud server: ", e)
         pass
 
+    from swingmusic.plugins.lyrics import Lyrics
+
     finder = Lyrics()
     data = finder.search_lyrics_by_title_and_artist(title, artist)
 
@@ -13,7 +13,6 @@ from swingmusic.lib.recipes.recents import RecentlyPlayed
 from swingmusic.models.album import Album
 from swingmusic.models.stats import StatItem
 from swingmusic.models.track import Track
-from swingmusic.plugins.lastfm import LastFmPlugin
 from swingmusic.serializers.artist import serialize_for_card
 from swingmusic.serializers.album import serialize_for_card as serialize_for_album_card
 from swingmusic.serializers.track import serialize_track, serialize_tracks
@@ -103,6 +102,8 @@ def log_track(body: LogTrackBody):
     trackentry.increment_playcount(duration, timestamp)
     track = trackentry.tracks[0]
 
+    from swingmusic.plugins.lastfm import LastFmPlugin
+
     lastfm = LastFmPlugin(current_userid=get_current_userid())
 
     if (
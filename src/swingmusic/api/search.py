@@ -96,6 +96,18 @@ def get_top_results(query: TopResultsQuery):
     return Search(query.q).get_top_results(limit=query.limit)
 
 
+@api.get("/cache-stats")
+def get_search_cache_stats():
+    """
+    Get search cache stats
+
+    Returns the hit and miss counters of the search result cache.
+    Only exact repeats of a search (same type, query and limit) are
+    served from the cache.
+    """
+    return searchlib.SearchCache.stats()
+
+
 @api.get("/")
 def search_items(query: SearchLoadMoreQuery):
     """
@@ -13,13 +13,16 @@ from swingmusic.premium import (
     LicenseManager,
     CloudClient,
 )
-from swingmusic.lib.index import index_everything
+from swingmusic.lib.index import cancel_scan, index_everything
 from swingmusic.config import UserConfig
 from swingmusic.store.general import GeneralStore
+from swingmusic.store.scanstatus import ScanStatus
 from swingmusic.settings import Metadata
 from swingmusic.utils.auth import get_current_userid
 from swingmusic.utils.hardware_id import get_device_id, get_device_name
 from swingmusic.utils.paths import normalize_paths
+from swingmusic.utils.profiler import StartupProfiler
+from swingmusic.utils.workers import WorkerPool
 
 # Error payload returned by premium-gated endpoints when the compiled
 # premium module is not shipped in this build (free-tier / OSS clone).
@@ -132,15 +135,75 @@ class SetSettingBody(BaseModel):
     )
 
 
+class TriggerScanQuery(BaseModel):
+    quick: bool = Field(
+        description="Only rescan folders that changed since the last scan",
+        example=False,
+        default=False,
+    )
+
+
 @api.get("/trigger-scan")
-def trigger_scan():
+def trigger_scan(query: TriggerScanQuery):
     """
     Triggers scan for new music
+
+    A quick scan skips folders whose modification time has not changed
+    since the last scan. Returns 409 if a scan is already running.
     """
-    index_everything()
+    if not index_everything(quick=query.quick, queue=False):
+        return {"msg": "A scan is already running"}, 409
+
     return {"msg": "Scan triggered!"}
 
 
+@api.post("/cancel-scan")
+@admin_required()
+def cancel_running_scan():
+    """
+    Cancels the running scan
+
+    The tracks indexed so far are kept. The next scan continues
+    with the files that were not indexed yet.
+    """
+    if not cancel_scan():
+        return {"error": "No scan is running"}, 404
+
+    return {"msg": "Scan cancelled!"}
+
+
+@api.get("/workers")
+def get_worker_stats():
+    """
+    Get the worker pool stats
+
+    Returns the queue depth and throughput of each background work queue.
+    """
+    return WorkerPool.get_stats()
+
+
+@api.get("/scan-status")
+def get_scan_status():
+    """
+    Get the scan status
+
+    Returns the progress, throughput and timings of each stage of the
+    current (or last) library scan.
+    """
+    return ScanStatus.to_dict()
+
+
+@api.get("/startup-profile")
+def get_startup_profile():
+    """
+    Get the startup profile
+
+    Returns the time taken by each startup phase and the slowest module
+    imports. Only recorded when the server is started with `--profile-startup`.
+    """
+    return StartupProfiler.to_dict()
+
+
 class UpdateConfigBody(BaseModel):
     key: str = Field(
         description="The setting key",
@@ -176,7 +239,7 @@ def update_config(body: UpdateConfigBody):
     }
 
     if body.key in reset_stores_lists:
-        index_everything()
+        index_everything(rebuild=True)
 
     return {
         "msg": "Config updated!",
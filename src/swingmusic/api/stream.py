@@ -17,6 +17,7 @@ from flask import request, Response, send_from_directory
 from swingmusic.lib.trackslib import get_silence_paddings
 
 from swingmusic.store.tracks import TrackStore
+from swingmusic.utils.filestream import send_file_range
 from swingmusic.utils.files import guess_mime_type
 
 bp_tag = Tag(name="File", description="Audio files")
@@ -51,23 +52,16 @@ class SendTrackFileQuery(BaseModel):
     )
 
 
-@api.get("/<trackhash>/legacy")
-def send_track_file_legacy(path: TrackHashSchema, query: SendTrackFileQuery):
+def find_track_file(trackhash: str, filepath: str):
     """
-    Get a playable audio file without Range support
+    Returns the track to play, and an error response if there is none.
 
-    Returns a playable audio file that corresponds to the given filepath. Falls back to track hash if filepath is not found.
-
-    NOTE: Does not support range requests or transcoding.
+    The track at the given filepath is preferred. Falls back to the existing
+    file with the highest bitrate of the same trackhash.
     """
-    requested_trackhash = path.trackhash.strip()
-    filepath = query.filepath.strip()
-
-    msg = {"msg": "File Not Found"}
-
     # prevent path traversal
     if "/../" in filepath:
-        return {"msg": "Invalid filepath", "error": "Path traversal detected"}, 400
+        return None, ({"msg": "Invalid filepath", "error": "Path traversal detected"}, 400)
 
     requested_filepath = Path(filepath).resolve()
 
@@ -84,21 +78,24 @@ def send_track_file_legacy(path: TrackHashSchema, query: SendTrackFileQuery):
             break
 
     if not inside_root:
-        return {
-            "msg": "Invalid filepath",
-            "error": "File not inside root directories",
-        }, 400
+        return None, (
+            {
+                "msg": "Invalid filepath",
+                "error": "File not inside root directories",
+            },
+            400,
+        )
 
     track = None
     tracks = TrackStore.get_tracks_by_filepaths([filepath])
 
     if len(tracks) > 0 and os.path.exists(tracks[0].filepath):
         for t in tracks:
-            if os.path.exists(t.filepath) and t.trackhash == requested_trackhash:
+            if os.path.exists(t.filepath) and t.trackhash == trackhash:
                 track = t
                 break
     else:
-        group = TrackStore.trackhashmap.get(requested_trackhash)
+        group = TrackStore.trackhashmap.get(trackhash)
 
         # When finding by trackhash, sort by bitrate
         # and get the first track that exists
@@ -110,72 +107,54 @@ def send_track_file_legacy(path: TrackHashSchema, query: SendTrackFileQuery):
                     track = t
                     break
 
-    if track is not None:
-        audio_type = guess_mime_type(track.filepath)
-        return send_from_directory(
-            Path(track.filepath).parent,
-            Path(track.filepath).name,
-            mimetype=audio_type,
-            conditional=True,
-            as_attachment=True,
-        )
-
-    return msg, 404
-
+    if track is None:
+        return None, ({"msg": "File Not Found"}, 404)
 
-# @api.get("/<trackhash>")
-# def send_track_file(path: TrackHashSchema, query: SendTrackFileQuery):
-#     """
-#     Get a playable audio file with Range headers support
+    return track, None
 
-#     Returns a playable audio file that corresponds to the given filepath. Falls back to track hash if filepath is not found.
 
-#     Transcoding can be done by sending the quality and container query parameters.
+@api.get("/<trackhash>/legacy")
+def send_track_file_legacy(path: TrackHashSchema, query: SendTrackFileQuery):
+    """
+    Get a playable audio file without Range support
 
-#     **NOTES:**
-#     - Transcoded streams report incorrect duration during playback (idk why! FFMPEG gurus we need your help here).
-#     - The quality parameter is the desired bitrate in kbps.
-#     - The mp3 container is the best container for upto 320kbps (and has better duration reporting). The flac container allows for higher bitrates but it produces dramatically larger files (when transcoding from lossy formats).
-#     - You can get the transcoded bitrate by checking the X-Transcoded-Bitrate header on the first request's response.
-#     """
-#     trackhash = path.trackhash
-#     filepath = query.filepath
+    Returns a playable audio file that corresponds to the given filepath. Falls back to track hash if filepath is not found.
 
-#     # If filepath is provided, try to send that
-#     track = None
-#     tracks = TrackStore.get_tracks_by_filepaths([filepath])
+    NOTE: Does not support range requests or transcoding.
+    """
+    track, error = find_track_file(path.trackhash.strip(), query.filepath.strip())
 
-#     if len(tracks) > 0 and os.path.exists(filepath):
-#         track = tracks[0]
-#     else:
-#         res = TrackStore.trackhashmap.get(trackhash)
+    if track is None:
+        return error
 
-#         # When finding by trackhash, sort by bitrate
-#         # and get the first track that exists
-#         if res is not None:
-#             tracks = sorted(res.tracks, key=lambda x: x.bitrate, reverse=True)
+    audio_type = guess_mime_type(track.filepath)
+    return send_from_directory(
+        Path(track.filepath).parent,
+        Path(track.filepath).name,
+        mimetype=audio_type,
+        conditional=True,
+        as_attachment=True,
+    )
 
-#             for t in tracks:
-#                 if os.path.exists(t.filepath):
-#                     track = t
-#                     break
 
-#     if track is not None:
-#         if query.quality == "original":
-#             return send_file_as_chunks(track.filepath)
+@api.get("/<trackhash>")
+def send_track_file(path: TrackHashSchema, query: SendTrackFileQuery):
+    """
+    Get a playable audio file with Range headers support
 
-#         # prevent requesting over transcoding
-#         max_bitrate = track.bitrate
-#         requested_bitrate = int(query.quality)
+    Returns a playable audio file that corresponds to the given filepath. Falls back to track hash if filepath is not found.
 
-#         if query.container != "flac":
-#             # drop to 320 for non-flac containers
-#             requested_bitrate = min(320, requested_bitrate)
+    **NOTES:**
+    - Send `Range: bytes=<start>-` to stream the rest of the file in one response. Multiple ranges are not supported.
+    - The ETag header can be sent back in `If-Range`, so that a range is only resumed if the file has not changed.
+    - Transcoding is not available yet, the quality and container parameters are ignored and the original file is sent.
+    """
+    track, error = find_track_file(path.trackhash.strip(), query.filepath.strip())
 
-#         quality = f"{min(max_bitrate, requested_bitrate)}k"
-#         return transcode_and_stream(trackhash, track.filepath, quality, query.container)
+    if track is None:
+        return error
 
-#     return {"msg": "File Not Found"}, 404
+    return send_file_range(track.filepath, guess_mime_type(track.filepath))
 
 
 def transcode_and_stream(trackhash: str, filepath: str, bitrate: str, container: str):
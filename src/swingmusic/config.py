@@ -81,6 +81,10 @@ class UserConfig(metaclass=Singleton):
     scanInterval: int = 10
     enableWatchdog: bool = False
     showPlaylistsInFolderView: bool = False
+    # max cores used for search scoring. 0 = half the cores, 1 = no parallelism
+    searchCoreBudget: int = 0
+    # worker processes shared by background stages. 0 = half the cores
+    workerCount: int = 0
 
     # plugins
     enablePlugins: bool = True
@@ -1,12 +1,31 @@
 from swingmusic.config import UserConfig
 from swingmusic.db import Base
-from swingmusic.db.utils import track_to_dataclass, tracks_to_dataclasses
+from swingmusic.db.utils import track_to_dataclass
 from swingmusic.db.engine import DbEngine
-from sqlalchemy import JSON, Integer, String, delete, select
+from sqlalchemy import (
+    DDL,
+    JSON,
+    ForeignKey,
+    Integer,
+    String,
+    bindparam,
+    delete,
+    event,
+    insert,
+    select,
+    update,
+)
+from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import Mapped, mapped_column
 
 
-from typing import Any, Optional
+from logging import getLogger
+from pathlib import Path
+from typing import Any, Iterable, Iterator, Optional
+
+from swingmusic.models.track import Track, get_derived_fingerprint
+
+log = getLogger(__name__)
 
 
 class TrackTable(Base):
@@ -36,46 +55,286 @@ class TrackTable(Base):
         JSON(), default_factory=dict
     )
 
+    @classmethod
+    def select_with_derived(cls):
+        """
+        Selects tracks with their saved derived values (see `TrackDerivedTable`).
+        """
+        derived = TrackDerivedTable
+        return select(
+            cls.__table__,
+            derived.fingerprint.label("derived_fingerprint"),
+            derived.data.label("derived"),
+        ).outerjoin(derived, derived.trackid == cls.id)
+
+    @staticmethod
+    def to_tracks(rows: Iterable[Any], stale: list[dict]) -> Iterator[Track]:
+        """
+        Creates tracks from rows of `select_with_derived`.
+
+        Tracks whose derived values were saved with the current settings
+        are hydrated from them. The others are derived again, and their
+        new values are added to `stale`, to be saved.
+        """
+        config = UserConfig()
+        fingerprint = get_derived_fingerprint(config)
+
+        for row in rows:
+            track = dict(row._mapping)
+            derived_fingerprint = track.pop("derived_fingerprint")
+            derived = track.pop("derived")
+
+            if derived and derived_fingerprint == fingerprint:
+                try:
+                    yield Track.from_derived(track, derived)
+                    continue
+                except (KeyError, TypeError, AttributeError) as e:
+                    log.warning(f"Invalid derived values for {track['filepath']}: {e}")
+
+            item = track_to_dataclass(track, config)
+            stale.append(
+                {
+                    "trackid": item.id,
+                    "fingerprint": fingerprint,
+                    "data": item.get_derived(),
+                }
+            )
+            yield item
+
     @classmethod
     def get_all(cls):
+        stale: list[dict] = []
+
+        with DbEngine.manager() as conn:
+            result = conn.execute(
+                cls.select_with_derived().execution_options(yield_per=1000)
+            )
+            yield from cls.to_tracks(result, stale)
+
+        TrackDerivedTable.save(stale)
+
+    @classmethod
+    def insert_batch(cls, tracks: list[dict[str, Any]]) -> list[dict[str, Any]]:
+        """
+        Inserts tracks in a single transaction, using executemany.
+
+        If the transaction fails, the batch is split in halves which are
+        retried separately, so a bad row is skipped without losing the
+        rest of the batch.
+
+        Returns the tracks that were inserted.
+        """
+        if not tracks:
+            return []
+
+        try:
+            with DbEngine.manager(commit=True) as conn:
+                conn.execute(insert(cls), tracks)
+
+            return tracks
+        except SQLAlchemyError as e:
+            if len(tracks) == 1:
+                error = getattr(e, "orig", e)
+                log.warning(f"Failed to index {tracks[0].get('filepath')}: {error}")
+                return []
+
+        mid = len(tracks) // 2
+        return cls.insert_batch(tracks[:mid]) + cls.insert_batch(tracks[mid:])
+
+    @classmethod
+    def get_file_stats(cls, folders: set[str] | None = None):
+        """
+        Yields the filepath, last modified time and albumhash of tracks,
+        optionally only those in the given folders.
+        """
+        columns = select(cls.filepath, cls.last_mod, cls.albumhash)
+
         with DbEngine.manager() as conn:
-            config = UserConfig()
-            result = conn.execute(select(cls).execution_options(yield_per=100))
+            if folders is None:
+                yield from conn.execute(columns.execution_options(yield_per=1000))
+                return
 
-            for i in result.scalars():
-                d = i.__dict__
-                del d["_sa_instance_state"]
+            folders = list(folders)
 
-                yield track_to_dataclass(d, config)
+            # INFO: Query in chunks to stay below the SQLite variable limit
+            for i in range(0, len(folders), 500):
+                yield from conn.execute(
+                    columns.where(cls.folder.in_(folders[i : i + 500]))
+                )
 
     @classmethod
     def get_tracks_by_filepaths(cls, filepaths: list[str]):
+        tracks: list[Track] = []
+        stale: list[dict] = []
+
         with DbEngine.manager() as conn:
-            result = conn.execute(
-                select(TrackTable)
-                .where(TrackTable.filepath.in_(filepaths))
-                .order_by(TrackTable.last_mod)
+            # INFO: Query in chunks to stay below the SQLite variable limit
+            for i in range(0, len(filepaths), 500):
+                result = conn.execute(
+                    cls.select_with_derived().where(
+                        TrackTable.filepath.in_(filepaths[i : i + 500])
+                    )
+                )
+
+                tracks.extend(cls.to_tracks(result, stale))
+
+        TrackDerivedTable.save(stale)
+        tracks.sort(key=lambda t: t.last_mod)
+        return tracks
+
+    @classmethod
+    def get_move_info(cls, filepaths: Iterable[str]):
+        """
+        Yields the columns used to detect moved files (see `lib.filemoves`).
+        """
+        filepaths = list(filepaths)
+        columns = select(cls.filepath, cls.last_mod, cls.title, cls.album, cls.extra)
+
+        with DbEngine.manager() as conn:
+            # INFO: Query in chunks to stay below the SQLite variable limit
+            for i in range(0, len(filepaths), 500):
+                yield from conn.execute(
+                    columns.where(cls.filepath.in_(filepaths[i : i + 500]))
+                )
+
+    @classmethod
+    def move_tracks(cls, moves: dict[str, str]):
+        """
+        Updates the filepath and folder of moved tracks.
+
+        :param moves: A dict of old filepaths to new filepaths.
+        """
+        if not moves:
+            return
+
+        # INFO: A Core update, as ORM bulk updates only match rows by primary key
+        table = cls.__table__
+        stmt = (
+            update(table)
+            .where(table.c.filepath == bindparam("old_filepath"))
+            .values(filepath=bindparam("new_filepath"), folder=bindparam("new_folder"))
+        )
+
+        with DbEngine.manager(commit=True) as conn:
+            conn.execute(
+                stmt,
+                [
+                    {
+                        "old_filepath": old,
+                        "new_filepath": new,
+                        "new_folder": Path(new).parent.as_posix(),
+                    }
+                    for old, new in moves.items()
+                ],
             )
-            return tracks_to_dataclasses(result.fetchall())
 
     @classmethod
     def get_tracks_in_path(cls, path: str):
+        stale: list[dict] = []
+
         with DbEngine.manager() as conn:
             result = conn.execute(
-                select(TrackTable)
+                cls.select_with_derived()
                 .where(TrackTable.filepath.contains(path))
                 .order_by(TrackTable.last_mod)
             )
+            tracks = list(cls.to_tracks(result, stale))
 
-            clean = []
-            for row in result.fetchall():
-                d = row[0].__dict__
-                del d["_sa_instance_state"]
-                clean.append(d)
-
-            return tracks_to_dataclasses(clean)
+        TrackDerivedTable.save(stale)
+        return tracks
 
     @classmethod
     def remove_tracks_by_filepaths(cls, filepaths: set[str]):
         with DbEngine.manager(commit=True) as conn:
             conn.execute(delete(TrackTable).where(TrackTable.filepath.in_(filepaths)))
+
+
+class TrackDerivedTable(Base):
+    """
+    The values `Track.__post_init__` derives from each track row
+    (split artists, cleaned titles, hashes), so that loading tracks
+    does not parse every row again.
+
+    The values are saved with a fingerprint of the settings they depend
+    on, and are derived again when it changes. Rows are removed with
+    their track, so modified files are derived again once re-indexed.
+    """
+
+    __tablename__ = "trackderived"
+
+    trackid: Mapped[int] = mapped_column(
+        ForeignKey("track.id", ondelete="CASCADE"), primary_key=True
+    )
+    fingerprint: Mapped[str] = mapped_column(String())
+    data: Mapped[dict[str, Any]] = mapped_column(JSON())
+
+    @classmethod
+    def save(cls, rows: list[dict[str, Any]]):
+        """
+        Inserts or replaces derived values, in chunks.
+        """
+        for i in range(0, len(rows), 1000):
+            try:
+                with DbEngine.manager(commit=True) as conn:
+                    conn.execute(
+                        insert(cls).prefix_with("OR REPLACE"), rows[i : i + 1000]
+                    )
+            except SQLAlchemyError as e:
+                # INFO: eg. a track removed by a scan in the meantime.
+                # The values are derived again on the next load.
+                log.warning(f"Failed to save derived track values: {e}")
+
+
+class LibraryVersionTable(Base):
+    """
+    Holds a counter that is incremented by triggers on every change
+    to the track table, whichever code path made it.
+
+    Used to tell whether a snapshot of the stores is still up to date.
+    """
+
+    __tablename__ = "libraryversion"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    dbid: Mapped[str] = mapped_column(String())
+    """
+    A random id set when the database is created, so that a replaced
+    database with the same counter is not mistaken for this one.
+    """
+    version: Mapped[int] = mapped_column(Integer())
+
+    @classmethod
+    def get_version(cls) -> str:
+        """
+        Returns the database id and the change counter, as a string.
+        """
+        result = cls.execute(select(cls.dbid, cls.version).where(cls.id == 1))
+        row = next(result).first()
+
+        if row is None:
+            return ""
+
+        return f"{row.dbid}:{row.version}"
+
+
+# INFO: Run on every create_all, so that existing databases get the triggers too
+event.listen(
+    Base.metadata,
+    "after_create",
+    DDL(
+        "INSERT OR IGNORE INTO libraryversion (id, dbid, version) "
+        "VALUES (1, lower(hex(randomblob(16))), 0)"
+    ),
+)
+
+for operation in ("INSERT", "UPDATE", "DELETE"):
+    event.listen(
+        Base.metadata,
+        "after_create",
+        DDL(
+            f"CREATE TRIGGER IF NOT EXISTS track_{operation.lower()}_version "
+            f"AFTER {operation} ON track BEGIN "
+            "UPDATE libraryversion SET version = version + 1 WHERE id = 1; "
+            "END"
+        ),
+    )
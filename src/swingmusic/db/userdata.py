@@ -349,6 +349,26 @@ class ScrobbleTable(Base):
         for i in next(result).scalars():
             yield tracklog_to_dataclass(i)
 
+    @classmethod
+    def get_by_trackhashes(cls, trackhashes: Iterable[str], userid: int | None = None):
+        """
+        Returns the scrobbles of the given tracks.
+        """
+        trackhashes = list(trackhashes)
+        userid = userid if userid else get_current_userid()
+
+        # INFO: Query in chunks to stay below the SQLite variable limit
+        for i in range(0, len(trackhashes), 500):
+            result = cls.execute(
+                select(cls).where(
+                    (cls.userid == userid)
+                    & cls.trackhash.in_(trackhashes[i : i + 500])
+                )
+            )
+
+            for entry in next(result).scalars():
+                yield tracklog_to_dataclass(entry)
+
     @classmethod
     def get_all_in_period(cls, start_time: int, end_time: int, userid: int | None):
         # UserId will be None if function is called from the API
@@ -555,16 +575,37 @@ class LibDataTable(Base):
         return None
 
     @classmethod
-    def get_all_colors(cls, type: str) -> Iterable[dict[str, str]]:
-        result = cls.execute(select(cls).where(cls.itemtype == type))
+    def get_all_colors(
+        cls, type: str, hashes: Iterable[str] | None = None
+    ) -> Iterable[dict[str, str]]:
+        """
+        Returns the colors of all items of the given type,
+        or only of the given item hashes.
+        """
+        if hashes is None:
+            queries = [select(cls).where(cls.itemtype == type)]
+        else:
+            itemhashes = [type + h for h in hashes]
 
-        for i in next(result).scalars():
-            yield {
-                "itemhash": i.itemhash.replace(type, ""),
-                "type": type,
-                "color": i.color,
-                "extra": i.extra,
-            }
+            # INFO: Query in chunks to stay below the SQLite variable limit
+            queries = [
+                select(cls).where(
+                    (cls.itemtype == type)
+                    & cls.itemhash.in_(itemhashes[i : i + 500])
+                )
+                for i in range(0, len(itemhashes), 500)
+            ]
+
+        for query in queries:
+            result = cls.execute(query)
+
+            for i in next(result).scalars():
+                yield {
+                    "itemhash": i.itemhash.replace(type, ""),
+                    "type": type,
+                    "color": i.color,
+                    "extra": i.extra,
+                }
 
 
 class MixTable(Base):
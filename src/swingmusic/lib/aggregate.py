@@ -0,0 +1,187 @@
+"""
+Builds albums and artists from tracks in a single pass.
+"""
+
+from typing import Iterable
+
+from natsort import natsort_keygen
+
+from swingmusic.models.album import Album
+from swingmusic.models.artist import Artist
+from swingmusic.models.track import Track
+from swingmusic.utils.parsers import get_base_album_title
+
+natsort_key = natsort_keygen()
+
+AlbumEntry = tuple[Album, set[str]]
+ArtistEntry = tuple[Artist, set[str], set[str]]
+
+
+def pick_best_tracks(tracks: Iterable[Track]) -> Iterable[Track]:
+    """
+    Returns one track per trackhash, the one with the highest bitrate.
+
+    Same as `remove_duplicates`, without grouping the tracks in lists first.
+    """
+    best: dict[str, Track] = {}
+
+    for track in tracks:
+        current = best.get(track.trackhash)
+
+        if current is None or track.bitrate > current.bitrate:
+            best[track.trackhash] = track
+
+    return best.values()
+
+
+def finalize_genres(entry: dict):
+    # INFO: Genres are collected in a dict keyed by genrehash, keeping their order
+    genres = list(entry["genres"].values())
+
+    entry["genres"] = genres
+    entry["genrehashes"] = " ".join([g["genrehash"] for g in genres])
+
+
+def aggregate_library(
+    all_tracks: Iterable[Track],
+    albumhashes: set[str] | None = None,
+    artisthashes: set[str] | None = None,
+) -> tuple[list[AlbumEntry], list[ArtistEntry]]:
+    """
+    Creates album and artist objects from the given tracks, in one pass.
+
+    Each album and artist is only built from the tracks passed in,
+    so all their tracks should be included. Pass `albumhashes` or
+    `artisthashes` to only build those albums or artists, eg. when
+    rebuilding the items touched by a change.
+    """
+    albums: dict[str, dict] = {}
+    artists: dict[str, dict] = {}
+
+    for track in pick_best_tracks(all_tracks):
+        genres = track.genres or ()
+
+        # SECTION: Album
+        if albumhashes is None or track.albumhash in albumhashes:
+            album = albums.get(track.albumhash)
+
+            if album is None:
+                albums[track.albumhash] = {
+                    "albumartists": track.albumartists,
+                    "artisthashes": [a["artisthash"] for a in track.albumartists],
+                    "albumhash": track.albumhash,
+                    "base_title": None,
+                    "color": None,
+                    "created_date": track.last_mod,
+                    "date": track.date,
+                    "duration": track.duration,
+                    "genres": {g["genrehash"]: g for g in genres},
+                    "og_title": track.og_album,
+                    "lastplayed": track.lastplayed,
+                    "playcount": track.playcount,
+                    "playduration": track.playduration,
+                    "title": track.album,
+                    "tracks": {track.trackhash},
+                    "pathhash": track.pathhash,
+                    "extra": {},
+                }
+            else:
+                album["tracks"].add(track.trackhash)
+                album["playcount"] += track.playcount
+                album["playduration"] += track.playduration
+                album["lastplayed"] = max(album["lastplayed"], track.lastplayed)
+                album["duration"] += track.duration
+                album["date"] = min(album["date"], track.date)
+                album["created_date"] = min(album["created_date"], track.last_mod)
+
+                for genre in genres:
+                    album["genres"].setdefault(genre["genrehash"], genre)
+
+        # SECTION: Artists
+        # INFO: Album artists appended after the track artists are not credited
+        # on the track itself. The artist records are shared between tracks,
+        # so this is not flagged on the records.
+        credited = len(track.artists)
+        this_artists = [*track.artists]
+        seen = {a["artisthash"] for a in this_artists}
+
+        for a in track.albumartists:
+            if a["artisthash"] not in seen:
+                seen.add(a["artisthash"])
+                this_artists.append(a)
+
+        for index, thisartist in enumerate(this_artists):
+            artisthash = thisartist["artisthash"]
+
+            if artisthashes is not None and artisthash not in artisthashes:
+                continue
+
+            artist = artists.get(artisthash)
+
+            if artist is None:
+                artists[artisthash] = {
+                    "albumcount": None,
+                    "albums": {track.albumhash},
+                    "artisthash": artisthash,
+                    "created_date": track.last_mod,
+                    "date": track.date,
+                    "duration": track.duration,
+                    "genres": {g["genrehash"]: g for g in genres},
+                    "name": None,
+                    "names": {thisartist["name"]},
+                    "lastplayed": track.lastplayed,
+                    "playcount": track.playcount,
+                    "playduration": track.playduration,
+                    "trackcount": None,
+                    "tracks": {track.trackhash} if index < credited else set(),
+                    "extra": {},
+                }
+                continue
+
+            artist["duration"] += track.duration
+            artist["playcount"] += track.playcount
+            artist["playduration"] += track.playduration
+            artist["albums"].add(track.albumhash)
+            artist["date"] = min(artist["date"], track.date)
+            artist["lastplayed"] = max(artist["lastplayed"], track.lastplayed)
+            artist["created_date"] = min(artist["created_date"], track.last_mod)
+            artist["names"].add(thisartist["name"])
+
+            if index < credited:
+                artist["tracks"].add(track.trackhash)
+
+            for genre in genres:
+                artist["genres"].setdefault(genre["genrehash"], genre)
+
+    album_entries: list[AlbumEntry] = []
+
+    for album in albums.values():
+        finalize_genres(album)
+        album["base_title"], _ = get_base_album_title(album["og_title"])
+        album["blurhash"] = ""
+
+        trackhashes = album.pop("tracks")
+        album["trackcount"] = len(trackhashes)
+
+        album_entries.append((Album(**album), trackhashes))
+
+    artist_entries: list[ArtistEntry] = []
+
+    for artist in artists.values():
+        finalize_genres(artist)
+        names = artist.pop("names")
+
+        # INFO: Most artists have a single spelling, skip sorting those
+        if len(names) == 1:
+            artist["name"] = next(iter(names))
+        else:
+            artist["name"] = min(names, key=natsort_key)
+
+        trackhashes = artist.pop("tracks")
+        artist_albums = artist.pop("albums")
+        artist["albumcount"] = len(artist_albums)
+        artist["trackcount"] = len(trackhashes)
+
+        artist_entries.append((Artist(**artist), trackhashes, artist_albums))
+
+    return album_entries, artist_entries
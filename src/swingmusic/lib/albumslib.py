@@ -2,11 +2,12 @@
 Contains methods relating to albums.
 """
 
+from typing import Iterable
+
+from swingmusic.lib.aggregate import aggregate_library
 from swingmusic.models.album import Album
 from swingmusic.models.track import Track
 from swingmusic.store.tracks import TrackStore
-from swingmusic.utils.parsers import get_base_album_title
-from swingmusic.utils.remove_duplicates import remove_duplicates
 
 
 def remove_duplicate_on_merge_versions(tracks: list[Track]):
@@ -47,64 +48,20 @@ def create_albums(_trackhashes: list[str] = []) -> list[tuple[Album, set[str]]]:
 
     >>> list[tuple[Album, set[str]]]
     """
-    albums = dict()
-
     if _trackhashes:
         all_tracks: list[Track] = TrackStore.get_tracks_by_trackhashes(_trackhashes)
     else:
-        all_tracks: list[Track] = TrackStore.get_flat_list()
-
-    all_tracks = remove_duplicates(all_tracks)
-
-    for track in all_tracks:
-        if track.albumhash not in albums:
-            albums[track.albumhash] = {
-                "albumartists": track.albumartists,
-                "artisthashes": [a["artisthash"] for a in track.albumartists],
-                "albumhash": track.albumhash,
-                "base_title": None,
-                "color": None,
-                "created_date": track.last_mod,
-                "date": track.date,
-                "duration": track.duration,
-                "genres": [*track.genres] if track.genres else [],
-                "og_title": track.og_album,
-                "lastplayed": track.lastplayed,
-                "playcount": track.playcount,
-                "playduration": track.playduration,
-                "title": track.album,
-                "tracks": {track.trackhash},
-                "pathhash": track.pathhash,
-                "extra": {},
-            }
-        else:
-            album = albums[track.albumhash]
-            album["tracks"].add(track.trackhash)
-            album["playcount"] += track.playcount
-            album["playduration"] += track.playduration
-            album["lastplayed"] = max(album["lastplayed"], track.lastplayed)
-            album["duration"] += track.duration
-            album["date"] = min(album["date"], track.date)
-            album["created_date"] = min(album["created_date"], track.last_mod)
-
-            if track.genres:
-                album["genres"].extend(track.genres)
-
-    for album in albums.values():
-        genres = []
-        for genre in album["genres"]:
-            if genre not in genres:
-                genres.append(genre)
-
-        album["genres"] = genres
-        album["genrehashes"] = " ".join([g["genrehash"] for g in genres])
-        album["base_title"], _ = get_base_album_title(album["og_title"])
-        album["blurhash"] = ""
-
-        del genres
-        trackhashes = album.pop("tracks")
-        album["trackcount"] = len(trackhashes)
-
-        albums[album["albumhash"]] = (Album(**album), trackhashes)
-
-    return list(albums.values())
+        all_tracks = TrackStore.get_flat_list()
+
+    return aggregate_albums(all_tracks)
+
+
+def aggregate_albums(all_tracks: Iterable[Track]) -> list[tuple[Album, set[str]]]:
+    """
+    Creates album objects from the given tracks.
+
+    Each album is only built from the tracks passed in,
+    so all the tracks of an album should be included.
+    """
+    albums, _ = aggregate_library(all_tracks, artisthashes=set())
+    return albums
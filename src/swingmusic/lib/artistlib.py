@@ -3,7 +3,6 @@ import random
 import time
 from typing import Any
 import urllib
-from concurrent.futures import ProcessPoolExecutor
 from io import BytesIO
 from pathlib import Path
 
@@ -15,8 +14,10 @@ from requests.exceptions import ReadTimeout
 from swingmusic import settings
 from swingmusic.models.artist import Artist
 from swingmusic.store.artists import ArtistStore
+from swingmusic.store.scanstatus import ScanStatus
 from swingmusic.utils.hashing import create_hash
 from swingmusic.utils.progressbar import tqdm
+from swingmusic.utils.workers import WorkerPool
 
 LARGE_ENOUGH_NUMBER = 100
 PngImagePlugin.MAX_TEXT_CHUNK = LARGE_ENOUGH_NUMBER * (1024**2)
@@ -148,13 +149,12 @@ class CheckArtistImages:
             artist for artist in storeArtists if artist.artisthash not in processed
         ]
 
-        num_workers = max(1, (os.cpu_count() or 1) // 2)
-
-        with ProcessPoolExecutor(max_workers=num_workers) as executor:
+        with ScanStatus.stage("artist images") as stage:
+            tasks = WorkerPool.map(self.download_image, unprocessed, queue="network")
             list(
                 tqdm(
-                    executor.map(self.download_image, unprocessed),
-                    total=len(unprocessed),
+                    ScanStatus.follow(stage, tasks),
+                    total=len(tasks),
                     desc="Downloading missing artist images",
                 )
             )
@@ -3,22 +3,21 @@ Contains everything that deals with image colour extraction.
 """
 
 import logging
-import os
 import pathlib
 
 import blurhash
-import colorgram
 from PIL import Image
 from pathlib import Path
 from typing import Any, Generator, Optional
 from swingmusic.store.tracks import TrackStore
 from swingmusic.utils.progressbar import tqdm
-from concurrent.futures import ProcessPoolExecutor, as_completed
+from swingmusic.utils.workers import WorkerPool
 
 from swingmusic import settings
 from swingmusic.store.albums import AlbumMapEntry, AlbumStore
 from swingmusic.db.userdata import LibDataTable
 from swingmusic.store.artists import ArtistMapEntry, ArtistStore
+from swingmusic.store.scanstatus import ScanStatus
 
 log = logging.getLogger(__name__)
 
@@ -31,6 +30,8 @@ def get_image_colors(image: pathlib.Path, count=1) -> list[str]:
     :params count: How many colours should be extracted?
     :returns: List["rgb(red, green, blue)", ...]
     """
+    # INFO: Imported on first use, colors are only extracted in the workers
+    import colorgram
 
     if image.exists():
         colors = sorted(colorgram.extract(image, count), key=lambda c: c.hsl.h)
@@ -200,26 +201,21 @@ class ColorProcessor:
         if not items_list:
             return
 
-        cpus = max(1, (os.cpu_count() or 1) // 2)
         batch_size = 20  # Process results in batches
+        batch = []
+        processed_count = 0
 
-        with ProcessPoolExecutor(max_workers=cpus) as executor:
-            # Submit all jobs
-            future_to_item = {
-                executor.submit(extract_color_worker, item): item for item in items_list
-            }
-
-            batch = []
-            processed_count = 0
+        with ScanStatus.stage(f"{self.item_type} colors", total=len(items_list)) as stage:
+            tasks = WorkerPool.map(extract_color_worker, items_list, queue="colors")
 
             # Process results as they complete
             progress_bar = tqdm(
-                as_completed(future_to_item),
+                tasks.as_completed(),
                 total=len(items_list),
                 desc=f"Processing {self.item_type} colors",
             )
 
-            for future in progress_bar:
+            for item_data, future in progress_bar:
                 try:
                     result = future.result()
 
@@ -235,11 +231,18 @@ class ColorProcessor:
                             batch = []
 
                     processed_count += 1
+                    ScanStatus.update(
+                        stage,
+                        done=1,
+                        queues={"workers": WorkerPool.queue_depth("colors")},
+                    )
 
                 except Exception as e:
-                    item_data = future_to_item[future]
                     item_hash = item_data[self.hash_field]
                     log.error(f"Error processing {self.item_type} {item_hash}: {e}")
+                    ScanStatus.update(stage, failed=1)
+
+            ScanStatus.update(stage, cpu_seconds=tasks.cpu_seconds)
 
     def _process_batch(self, batch: list[dict]) -> None:
         """
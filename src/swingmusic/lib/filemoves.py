@@ -0,0 +1,105 @@
+"""
+Detects indexed files that were moved or renamed, so that they can be
+updated in place instead of being removed and tagged again.
+"""
+
+import os
+from pathlib import Path
+from typing import Iterable, NamedTuple
+
+from swingmusic.config import UserConfig
+from swingmusic.lib.taglib import extract_artist_title
+
+
+class IndexedFile(NamedTuple):
+    """
+    The columns of an indexed track needed to match it to a moved file.
+    """
+
+    filepath: str
+    last_mod: int
+    title: str
+    album: str
+    extra: dict | None
+
+
+def get_identity(filepath: str, size: int, last_mod: int):
+    """
+    Returns a cheap identity for a file.
+
+    Moving or renaming a file keeps its size and modification time,
+    so together with the extension they identify the file well enough
+    without reading it.
+    """
+    return size, round(last_mod), Path(filepath).suffix.lower()
+
+
+def uses_filename(file: IndexedFile, config: UserConfig):
+    """
+    Whether the title or album of a track was taken from its filename,
+    because the tags were empty. Such tracks need to be tagged again
+    when renamed.
+    """
+    parsed = extract_artist_title(Path(file.filepath).stem, config)
+    title = parsed.title.replace("_", " ")
+
+    return title in (file.title, file.album)
+
+
+def match_moves(
+    missing: Iterable[IndexedFile], candidates: Iterable[str]
+) -> dict[str, str]:
+    """
+    Matches indexed files that no longer exist to new files.
+
+    An identity shared by more than one missing or new file is ambiguous
+    (eg. copies of the same file), so those files are left to be removed
+    and tagged as usual.
+
+    Returns a dict of old filepaths to new filepaths.
+    """
+    config = UserConfig()
+    by_identity: dict[tuple, IndexedFile | None] = {}
+
+    for file in missing:
+        size = (file.extra or {}).get("filesize")
+
+        # INFO: Tracks indexed without a file size can't be matched
+        if not size:
+            continue
+
+        key = get_identity(file.filepath, size, file.last_mod)
+        by_identity[key] = None if key in by_identity else file
+
+    if not by_identity:
+        return {}
+
+    matches: dict[tuple, str | None] = {}
+
+    for filepath in candidates:
+        try:
+            stat = os.stat(filepath)
+        except OSError:
+            continue
+
+        key = get_identity(filepath, stat.st_size, stat.st_mtime)
+
+        if by_identity.get(key) is not None:
+            matches[key] = None if key in matches else filepath
+
+    moves: dict[str, str] = {}
+
+    for key, filepath in matches.items():
+        file = by_identity[key]
+
+        if filepath is None or file is None:
+            continue
+
+        renamed = Path(file.filepath).name != Path(filepath).name
+
+        if renamed and uses_filename(file, config):
+            continue
+
+        moves[file.filepath] = filepath
+
+    return moves
@@ -1,5 +1,6 @@
 import gc
 import logging
+from threading import Lock
 from time import time
 from swingmusic.lib.mapstuff import (
     map_album_colors,
@@ -9,35 +10,184 @@ from swingmusic.lib.mapstuff import (
 )
 from swingmusic.lib.populate import CordinateMedia
 from swingmusic.lib.recipes.recents import RecentlyAdded
-from swingmusic.lib.tagger import IndexTracks
-from swingmusic.store.albums import AlbumStore
-from swingmusic.store.artists import ArtistStore
+from swingmusic.lib.scansession import ScanSession
+from swingmusic.db.libdata import TrackTable
+from swingmusic.events import events
+from swingmusic.lib.storeupdater import (
+    apply_moves,
+    apply_track_changes,
+    load_albums_and_artists,
+)
+from swingmusic.lib.tagger import ChangeSet, IndexTracks
+from swingmusic.serializers.album import serialize_for_card_many as serialize_albums
+from swingmusic.serializers.artist import serialize_for_cards as serialize_artists
 from swingmusic.store.folder import FolderStore
+from swingmusic.store.scanstatus import ScanStatus
+from swingmusic.store.snapshot import StoreSnapshot
 from swingmusic.store.tracks import TrackStore
 from swingmusic.utils.threading import background
+from swingmusic.utils.workers import WorkerPool
 
 log = logging.getLogger(__name__)
 
+
+def publish_changes(changes: ChangeSet):
+    """
+    Applies the changes of a scan batch to the stores,
+    and notifies clients of the new albums and artists.
+    """
+    apply_moves(changes.moved)
+
+    filepaths = [*changes.added, *changes.modified]
+    tracks = TrackTable.get_tracks_by_filepaths(filepaths) if filepaths else []
+    albums, artists = apply_track_changes(tracks, changes.removed)
+
+    events.dispatch(
+        "scan_items_added",
+        {
+            "tracks": len(tracks),
+            "removed": len(changes.removed),
+            "moved": len(changes.moved),
+            "albums": serialize_albums(albums),
+            "artists": serialize_artists(artists),
+        },
+    )
+
+
+scan_lock = Lock()
+"""
+Held while a scan runs, so that only one scan runs at a time.
+"""
+queued_scan: dict[str, bool] | None = None
+_queue_lock = Lock()
+
+
+def index_everything(
+    quick: bool = False, rebuild: bool = False, queue: bool = True
+) -> bool:
+    """
+    Starts a scan in a background thread. See `run_scan`.
+
+    Only one scan runs at a time. If a scan is already running, the scan
+    is queued to run once it finishes, unless `queue` is False. Scans
+    queued meanwhile are merged into a single one.
+
+    Returns False if a scan is already running.
+    """
+    global queued_scan
+
+    with _queue_lock:
+        if not scan_lock.acquire(blocking=False):
+            if queue:
+                queued = queued_scan or {"quick": True, "rebuild": False}
+                queued_scan = {
+                    "quick": queued["quick"] and quick,
+                    "rebuild": queued["rebuild"] or rebuild,
+                }
+                log.info("A scan is already running, queued another one")
+
+            return False
+
+    try:
+        run_scan(quick=quick, rebuild=rebuild)
+    except BaseException:
+        scan_lock.release()
+        raise
+
+    return True
+
+
 @background
-def index_everything():
-    IndexTracks()
+def run_scan(quick: bool = False, rebuild: bool = False):
+    """
+    Scans the root directories and updates the stores.
+
+    The changes of each batch written to the database are applied to the
+    stores as they are committed, and only the albums and artists they
+    touch are rebuilt. Set `rebuild` to reload all the stores from the
+    database once the scan is done instead. eg. after changing settings
+    that affect how tracks are parsed. A full reload is also done if
+    applying the changes fails.
 
-    key = str(time())
-    TrackStore.load_all_tracks(key)
-    AlbumStore.load_albums(key)
-    ArtistStore.load_artists(key)
-    FolderStore.load_filepaths()
+    If the previous scan was interrupted or cancelled, the files it had
+    left to tag are tagged instead of scanning the root directories.
 
-    # NOTE: Rebuild recently added items on the homepage store
-    RecentlyAdded()
+    Should be called with the `scan_lock` held. Releases it once done,
+    and starts the queued scan, if any.
+    """
+    global queued_scan
 
-    # map colors
-    map_album_colors()
-    map_artist_colors()
+    try:
+        scan_library(quick, rebuild)
+    finally:
+        with _queue_lock:
+            follow_up, queued_scan = queued_scan, None
+            scan_lock.release()
 
-    map_scrobble_data()
-    map_favorites()
+    if follow_up is not None:
+        index_everything(**follow_up)
+
+
+def scan_library(quick: bool, rebuild: bool):
+    ScanStatus.begin()
+
+    try:
+        indexer = IndexTracks(
+            quick=quick, publish=None if rebuild else publish_changes
+        )
+
+        if indexer.publish_failed:
+            log.warning("Failed to apply scan changes to the stores, reloading")
+            rebuild = True
+
+        if rebuild:
+            key = str(time())
+            TrackStore.load_all_tracks(key)
+            load_albums_and_artists(key)
+            FolderStore.load_filepaths()
+
+        # NOTE: Rebuild recently added items on the homepage store
+        RecentlyAdded()
+
+        if rebuild:
+            # map colors
+            map_album_colors()
+            map_artist_colors()
+
+            map_scrobble_data()
+            map_favorites()
+
+        if not indexer.cancelled:
+            CordinateMedia(instance_key=str(time()))
+
+        gc.collect()
+
+        # INFO: So that the next startup does not rebuild the stores
+        if indexer.changes or rebuild:
+            StoreSnapshot.save()
+    finally:
+        ScanStatus.end()
 
-    CordinateMedia(instance_key=str(time()))
-    gc.collect()
     log.info("Indexing completed")
+
+
+def resume_scan():
+    """
+    Resumes the scan that was interrupted when the server stopped, if any.
+    """
+    if ScanSession.exists():
+        index_everything()
+
+
+def cancel_scan() -> bool:
+    """
+    Cancels the running scan, and kills the workers tagging its files.
+
+    The batches committed so far are kept, and the next scan tags the
+    remaining files. Returns False if no scan is running.
+    """
+    if not ScanStatus.cancel():
+        return False
+
+    WorkerPool.cancel("tagging", terminate=True)
+    return True
@@ -1,31 +1,37 @@
 from swingmusic.db.userdata import LibDataTable, FavoritesTable, ScrobbleTable
+from swingmusic.models.logger import TrackLog
 from swingmusic.store.albums import AlbumStore
 from swingmusic.store.artists import ArtistStore
 from swingmusic.store.tracks import TrackStore
 
 
-from typing import Any
+from typing import Any, Iterable
 
 
-def map_scrobble_data():
+def group_scrobbles(records: Iterable[TrackLog]) -> dict[str, dict[str, Any]]:
     """
-    Maps scrobble data to the in-memory stores.
-
-    The scrobble data is loaded from the database and grouped by trackhash.
-    The album and artist scrobble data (for those tracks) are then incremented based on the data.
+    Aggregates playcount, playduration and lastplayed by trackhash.
     """
-    records = ScrobbleTable.get_all(0, None)
-
-    # group records by trackhash
     grouped: dict[str, dict[str, Any]] = {}
 
     for record in records:
-        # aggregate playcount, playduration and lastplayed
         item = grouped.setdefault(record.trackhash, {})
         item["playcount"] = item.get("playcount", 0) + 1
         item["playduration"] = item.get("playduration", 0) + record.duration
         item["lastplayed"] = max(item.get("lastplayed", 0), record.timestamp)
 
+    return grouped
+
+
+def map_scrobble_data():
+    """
+    Maps scrobble data to the in-memory stores.
+
+    The scrobble data is loaded from the database and grouped by trackhash.
+    The album and artist scrobble data (for those tracks) are then incremented based on the data.
+    """
+    grouped = group_scrobbles(ScrobbleTable.get_all(0, None))
+
     # increment playcount, playduration and lastplayed for albums and artists
     for trackhash, data in grouped.items():
         track = TrackStore.trackhashmap.get(trackhash)
@@ -51,13 +57,78 @@ def map_scrobble_data():
                 )
 
 
-def map_favorites():
+def map_scrobble_delta(
+    trackhashes: set[str], albumhashes: set[str], artisthashes: set[str]
+):
+    """
+    Maps scrobble data to the given tracks, albums and artists only.
+
+    Their play data is expected to be unset, eg. because they were just
+    rebuilt. Only the scrobbles of their tracks are read from the database,
+    and they are credited the same way as in `map_scrobble_data`.
+    """
+    needed = set(trackhashes)
+
+    for albumhash in albumhashes:
+        entry = AlbumStore.albummap.get(albumhash)
+        if entry:
+            needed.update(entry.trackhashes)
+
+    for artisthash in artisthashes:
+        entry = ArtistStore.artistmap.get(artisthash)
+        if entry:
+            needed.update(entry.trackhashes)
+
+    if not needed:
+        return
+
+    grouped = group_scrobbles(ScrobbleTable.get_by_trackhashes(needed))
+
+    for trackhash, data in grouped.items():
+        track = TrackStore.trackhashmap.get(trackhash)
+
+        if track is None:
+            continue
+
+        stats = (data["playduration"], data["lastplayed"], data["playcount"])
+
+        if trackhash in trackhashes:
+            track.increment_playcount(*stats)
+
+        albumhash = track.tracks[0].albumhash
+        if albumhash in albumhashes:
+            album = AlbumStore.albummap.get(albumhash)
+            if album:
+                album.increment_playcount(*stats)
+
+        for artisthash in track.tracks[0].artisthashes:
+            if artisthash not in artisthashes:
+                continue
+
+            artist = ArtistStore.artistmap.get(artisthash)
+            if artist:
+                artist.increment_playcount(*stats)
+
+
+def map_favorites(
+    tracks: set[str] | None = None,
+    albums: set[str] | None = None,
+    artists: set[str] | None = None,
+):
     """
     Maps favorites data to the in-memory stores.
+
+    When any of `tracks`, `albums` or `artists` is given, only the
+    favorites of those hashes are mapped.
     """
     favorites = FavoritesTable.get_all()
+    scopes = {"track": tracks, "album": albums, "artist": artists}
+    scoped = any(scope is not None for scope in scopes.values())
 
     for entry in favorites:
+        if scoped and entry.hash not in (scopes.get(entry.type) or ()):
+            continue
+
         if entry.type == "album":
             album = AlbumStore.albummap.get(entry.hash)
             if album:
@@ -74,8 +145,8 @@ def map_favorites():
                 track.toggle_favorite_user(entry.userid)
 
 
-def map_artist_colors():
-    colors = LibDataTable.get_all_colors(type="artist")
+def map_artist_colors(artisthashes: Iterable[str] | None = None):
+    colors = LibDataTable.get_all_colors(type="artist", hashes=artisthashes)
 
     for color in colors:
         artist = ArtistStore.artistmap.get(color["itemhash"])
@@ -85,8 +156,8 @@ def map_artist_colors():
             artist.update_color_info(color["color"], blurhash)
 
 
-def map_album_colors():
-    colors = LibDataTable.get_all_colors(type="album")
+def map_album_colors(albumhashes: Iterable[str] | None = None):
+    colors = LibDataTable.get_all_colors(type="album", hashes=albumhashes)
 
     for color in colors:
         album = AlbumStore.albummap.get(color["itemhash"])
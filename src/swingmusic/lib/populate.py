@@ -1,9 +1,6 @@
 import functools
-import os
 from dataclasses import asdict
-import multiprocessing as mp
 from requests import ReadTimeout
-from concurrent.futures import ProcessPoolExecutor
 from requests import ConnectionError as RequestConnectionError
 import logging
 
@@ -15,8 +12,10 @@ from swingmusic.models.lastfm import SimilarArtist
 from swingmusic.models.track import Track
 from swingmusic.store.albums import AlbumStore
 from swingmusic.store.artists import ArtistStore
+from swingmusic.store.scanstatus import ScanStatus
 from swingmusic.utils.network import has_connection
 from swingmusic.utils.progressbar import tqdm
+from swingmusic.utils.workers import WorkerPool
 from swingmusic.request.artists import fetch_similar_artists
 from swingmusic.lib.colorlib import ProcessAlbumColors, ProcessArtistColors
 
@@ -68,7 +67,9 @@ def get_image(tracks: list[Track], paths=None):
     """
 
     for track in tracks:
-        extracted = extract_thumb(track.filepath, track.albumhash + ".webp", paths)
+        extracted = extract_thumb(
+            track.filepath, track.albumhash + ".webp", paths=paths
+        )
 
         if extracted:
             return
@@ -84,25 +85,19 @@ class ProcessTrackThumbnails:
         Extracts the album art with platform-specific logic.
         """
 
-        cpus = max(1, os.cpu_count() // 2)
-
-        albumsMap = ( AlbumStore.get_album_tracks(album.albumhash) for album in albums )
-
-        # Create process pool with worker function
-        with mp.Pool(processes=cpus) as pool:
-            worker = functools.partial(get_image, paths=settings.Paths())
-            # Process files and track progress
+        albumsMap = (AlbumStore.get_album_tracks(album.albumhash) for album in albums)
+        worker = functools.partial(get_image, paths=settings.Paths())
 
-            results = list(
+        with ScanStatus.stage("thumbnails") as stage:
+            tasks = WorkerPool.map(worker, albumsMap, queue="thumbnails")
+            list(
                 tqdm(
-                    pool.imap_unordered(worker, albumsMap),
-                    total=len(albums),
+                    ScanStatus.follow(stage, tasks),
+                    total=len(tasks),
                     desc="Extracting track images",
                 )
             )
 
-            list(results)
-
     def __init__(self) -> None:
         """
         Filters out albums that already have thumbnails and
@@ -156,21 +151,20 @@ class FetchSimilarArtistsLastFM:
                     yield artist
 
         artists = list(artist_generator())
-        cpus = max(1, os.cpu_count() // 2)
 
-        with ProcessPoolExecutor(max_workers=cpus) as executor:
+        with ScanStatus.stage("similar artists") as stage:
+            tasks = WorkerPool.map(save_similar_artists, artists, queue="network")
+
             try:
-                # TODO: fix negative total length
-                results = list(
+                list(
                     tqdm(
-                        executor.map(save_similar_artists, artist_generator()),
-                        total=len(artists),
+                        ScanStatus.follow(stage, tasks),
+                        total=len(tasks),
                         desc="Fetching similar artists",
                     )
                 )
-
-                list(results)
-            # any exception that can be raised by the pool
+            # any exception that can be raised by the workers
             except Exception as e:
                 log.warning(e)
+                ScanStatus.update(stage, failed=1)
                 return
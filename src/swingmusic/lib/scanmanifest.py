@@ -0,0 +1,409 @@
+"""
+Contains the directory manifest used to skip unchanged folders when rescanning.
+"""
+
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from logging import getLogger
+from pathlib import Path
+from queue import Queue
+from stat import S_ISDIR, S_ISLNK
+from typing import Callable, Iterator, NamedTuple
+
+from swingmusic import settings
+from swingmusic.utils.filesystem import SUPPORTED_FILES, is_hidden_dir, is_ignored_path
+
+log = getLogger(__name__)
+
+MANIFEST_VERSION = 1
+
+RACY_WINDOW_NS = 2_000_000_000
+"""
+Directories modified this close to the start of the scan that recorded them
+are listed again on the next scan. Some filesystems (eg. FAT, SMB shares)
+only store modification times to the nearest 2 seconds, so a change made
+right after a directory was listed may not change its mtime.
+"""
+
+
+WALK_THREADS_PER_DEVICE = 4
+"""
+The number of directories listed at the same time on each device
+(eg. a disk or a network share).
+"""
+
+MAX_WALK_THREADS = 32
+"""
+The total number of walker threads. Each device gets at least one.
+"""
+
+
+class DirRecord(NamedTuple):
+    """
+    The state of a directory when it was last listed.
+    """
+
+    mtime: int
+    """
+    The directory modification time, in nanoseconds.
+    """
+    files: int
+    """
+    The number of supported audio files in the directory.
+    """
+    subdirs: list[str]
+    """
+    The names of the subdirectories that are scanned.
+    """
+
+
+@dataclass
+class ScanManifest:
+    """
+    Records the mtime and entry count of every scanned directory.
+
+    Adding, removing or renaming an entry updates the mtime of its parent
+    directory. So a directory with an unchanged mtime has the same files and
+    subdirectories as in the previous scan, and does not need to be listed.
+    """
+
+    started: int = 0
+    """
+    The time the scan that produced this manifest started, in nanoseconds.
+    """
+    dirs: dict[str, DirRecord] = field(default_factory=dict)
+
+    @staticmethod
+    def path() -> Path:
+        return settings.Paths().scan_manifest_path
+
+    @classmethod
+    def load(cls) -> "ScanManifest | None":
+        """
+        Reads the manifest saved by the last scan.
+        Returns None if there is no usable manifest.
+        """
+        try:
+            with open(cls.path(), "r") as f:
+                data = json.load(f)
+
+            return cls.from_dict(data)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            log.warning(f"Ignoring unreadable scan manifest: {e}")
+            return None
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "ScanManifest | None":
+        if data.get("version") != MANIFEST_VERSION:
+            return None
+
+        return cls(
+            started=data["started"],
+            dirs={path: DirRecord(*record) for path, record in data["dirs"].items()},
+        )
+
+    def to_dict(self):
+        return {
+            "version": MANIFEST_VERSION,
+            "started": self.started,
+            "dirs": self.dirs,
+        }
+
+    def save(self):
+        path = self.path()
+        temp = path.with_suffix(".tmp")
+
+        with open(temp, "w") as f:
+            json.dump(self.to_dict(), f)
+
+        os.replace(temp, path)
+
+    def is_unchanged(self, path: str, mtime: int) -> DirRecord | None:
+        """
+        Returns the record of a directory if it has not changed since
+        it was recorded, otherwise None.
+        """
+        record = self.dirs.get(path)
+
+        if record is None or record.mtime != mtime:
+            return None
+
+        if record.mtime >= self.started - RACY_WINDOW_NS:
+            return None
+
+        return record
+
+
+@dataclass
+class DirScan:
+    """
+    The result of walking the root directories.
+    """
+
+    manifest: ScanManifest
+    files: set[str] = field(default_factory=set)
+    """
+    The audio files found in the listed directories.
+    """
+    listed: set[str] = field(default_factory=set)
+    """
+    Directories that are new or changed since the previous scan, and were listed.
+    """
+    vanished: set[str] = field(default_factory=set)
+    """
+    Directories from the previous scan that no longer exist.
+    """
+    skipped_dirs: int = 0
+    skipped_files: int = 0
+
+
+def is_supported_file(name: str):
+    return os.path.splitext(name)[1].lower() in SUPPORTED_FILES
+
+
+def is_within(path: str, roots: list[str]):
+    return any(path == root or path.startswith(root + "/") for root in roots)
+
+
+class WalkedDir(NamedTuple):
+    """
+    A directory visited by `walk_dirs`.
+    """
+
+    path: str
+    record: DirRecord
+    files: list[str]
+    """
+    The supported audio files in the directory. Empty if it was not listed.
+    """
+    listed: bool
+
+
+def list_dir(path: str, mtime: int) -> WalkedDir | None:
+    subdirs = []
+    files = []
+
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir():
+                        if not is_hidden_dir(entry.name):
+                            subdirs.append(entry.name)
+                    elif entry.is_file() and is_supported_file(entry.name):
+                        files.append(Path(entry.path).as_posix())
+                except OSError:
+                    continue
+    except (OSError, ValueError):
+        return None
+
+    return WalkedDir(path, DirRecord(mtime, len(files), subdirs), files, listed=True)
+
+
+WalkTask = tuple[str, os.stat_result | None]
+"""
+A directory to visit, and its stat once known.
+"""
+
+
+def walk_dirs(
+    roots: list[str],
+    previous: ScanManifest | None = None,
+    per_device: int = WALK_THREADS_PER_DEVICE,
+) -> Iterator[WalkedDir]:
+    """
+    Walks the root directories on threads, and yields each
+    directory as soon as it is visited, in no particular order.
+
+    Each device has its own queue and `per_device` threads, so roots on
+    separate disks and network shares are walked concurrently without
+    thrashing a single disk, and a slow device does not hold up the others.
+    A directory found to be on another device (eg. a mount point) is
+    handed over to that device's threads.
+
+    Directories are identified by device and inode, so a directory reached
+    through several symlinks (or a symlink loop) is only visited once.
+    """
+    roots = [Path(root).resolve().as_posix() for root in roots if root]
+
+    if not roots:
+        return
+
+    results: Queue[WalkedDir | None] = Queue()
+    seen: set[tuple[int, int]] = set()
+    # {device: (tasks, threads)}
+    lanes: dict[int | None, tuple[Queue[WalkTask | None], int]] = {}
+    lock = threading.Lock()
+    stopped = threading.Event()
+
+    def get_stat(path: str) -> WalkTask:
+        """
+        Returns the resolved path of a directory and its stat, if it exists.
+        """
+        try:
+            # INFO: Only symlinks need resolving, the parent path is already resolved
+            stat = os.lstat(path)
+
+            if S_ISLNK(stat.st_mode):
+                path = os.path.realpath(path)
+                stat = os.stat(path)
+        except OSError:
+            return path, None
+
+        return path, stat
+
+    def route(path: str, stat: os.stat_result | None):
+        """
+        Queues a directory on the lane of its device, starting the lane if needed.
+        """
+        device = stat.st_dev if stat is not None else None
+
+        with lock:
+            if stopped.is_set():
+                return
+
+            lane = lanes.get(device)
+
+            if lane is None:
+                started = sum(threads for _, threads in lanes.values())
+                threads = max(1, min(per_device, MAX_WALK_THREADS - started))
+                lane = (Queue(), threads)
+                lanes[device] = lane
+
+                for i in range(threads):
+                    threading.Thread(
+                        target=work,
+                        args=(device, lane[0]),
+                        name=f"scan-walker-{len(lanes)}-{i}",
+                        daemon=True,
+                    ).start()
+
+        lane[0].put((path, stat))
+
+    def visit(path: str, stat: os.stat_result | None) -> WalkedDir | None:
+        if stat is None:
+            return None
+
+        if not S_ISDIR(stat.st_mode) or is_ignored_path(Path(path)):
+            return None
+
+        with lock:
+            key = (stat.st_dev, stat.st_ino)
+
+            if key in seen:
+                return None
+
+            seen.add(key)
+
+        record = previous.is_unchanged(path, stat.st_mtime_ns) if previous else None
+
+        if record is not None:
+            return WalkedDir(path, record, [], listed=False)
+
+        return list_dir(path, stat.st_mtime_ns)
+
+    def work(device: int | None, tasks: Queue[WalkTask | None]):
+        while True:
+            task = tasks.get()
+
+            if task is None:
+                return
+
+            # INFO: Drain the queue without visiting if the caller stopped early
+            if stopped.is_set():
+                continue
+
+            path, stat = task
+            walked = None
+
+            try:
+                if stat is None:
+                    path, stat = get_stat(path)
+
+                    # INFO: Mount points and symlinks can lead to another device
+                    if stat is not None and stat.st_dev != device:
+                        route(path, stat)
+                        continue
+
+                walked = visit(path, stat)
+            except Exception as e:
+                log.warning(f"Failed to scan {path}: {e}")
+                walked = None
+
+            if walked is not None:
+                for name in walked.record.subdirs:
+                    tasks.put((os.path.join(walked.path, name), None))
+
+            # INFO: One result per task, so that the caller knows when the walk is done
+            results.put(walked)
+
+    for root in roots:
+        route(*get_stat(root))
+
+    remaining = len(roots)
+
+    try:
+        while remaining:
+            walked = results.get()
+            remaining -= 1
+
+            if walked is not None:
+                remaining += len(walked.record.subdirs)
+                yield walked
+    finally:
+        with lock:
+            stopped.set()
+
+            for tasks, threads in lanes.values():
+                for _ in range(threads):
+                    tasks.put(None)
+
+
+def scan_dirs(
+    roots: list[str],
+    previous: ScanManifest | None = None,
+    on_dir: Callable[[WalkedDir], None] | None = None,
+) -> DirScan:
+    """
+    Walks the root directories and records them in a new manifest.
+
+    When a previous manifest is given, directories whose mtime has not
+    changed are not listed. Their subdirectories are taken from the
+    manifest and still visited, since a change deep in the tree does not
+    update the mtime of its ancestors.
+
+    The same rules as `run_fast_scandir` apply: paths are resolved, hidden
+    and ignored directories are skipped. A directory is only visited once,
+    so symlink loops are not followed.
+
+    `on_dir` is called with each directory as it is visited.
+    """
+    scan = DirScan(manifest=ScanManifest(started=time.time_ns()))
+
+    for walked in walk_dirs(roots, previous):
+        scan.manifest.dirs[walked.path] = walked.record
+
+        if walked.listed:
+            scan.listed.add(walked.path)
+            scan.files.update(walked.files)
+        else:
+            scan.skipped_dirs += 1
+            scan.skipped_files += walked.record.files
+
+        if on_dir is not None:
+            on_dir(walked)
+
+    if previous is not None:
+        roots = [Path(root).resolve().as_posix() for root in roots if root]
+        scan.vanished = {
+            path
+            for path in previous.dirs
+            if path not in scan.manifest.dirs and is_within(path, roots)
+        }
+
+    return scan
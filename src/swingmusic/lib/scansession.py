@@ -0,0 +1,158 @@
+"""
+Contains the scan session used to resume a scan that was interrupted.
+"""
+
+import json
+import os
+from dataclasses import dataclass, field
+from logging import getLogger
+from pathlib import Path
+
+from swingmusic import settings
+from swingmusic.lib.scanmanifest import ScanManifest, is_within
+
+log = getLogger(__name__)
+
+SESSION_VERSION = 1
+
+
+class ScanCancelledError(Exception):
+    """
+    Raised in the scan thread when the scan is cancelled.
+    """
+
+
+@dataclass
+class ScanSession:
+    """
+    The files a scan has left to tag.
+
+    The file list is written once, before tagging starts. The files of each
+    batch committed to the database are then appended to a checkpoint log.
+    If the server stops or the scan is cancelled, the next scan tags the
+    files that are not in the log, instead of walking and diffing the
+    root directories again.
+    """
+
+    files: list[str] = field(default_factory=list)
+    overwrite_thumbs: set[str] = field(default_factory=set)
+    """
+    Modified files, whose thumbnails are rewritten when tagged.
+    """
+    reindexing: set[str] = field(default_factory=set)
+    """
+    Modified files, which were removed from the database to be tagged again.
+    """
+    manifest: ScanManifest | None = None
+    """
+    The directory manifest to save once the scan is done.
+    """
+
+    @staticmethod
+    def path() -> Path:
+        return settings.Paths().scan_session_path
+
+    @classmethod
+    def checkpoint_path(cls) -> Path:
+        return cls.path().with_suffix(".log")
+
+    @classmethod
+    def exists(cls):
+        return cls.path().exists()
+
+    @classmethod
+    def load(cls, roots: list[str]) -> "ScanSession | None":
+        """
+        Reads the session of an interrupted scan, without the files that
+        were checkpointed or are no longer in the root directories.
+
+        Returns None if there is no usable session.
+        """
+        try:
+            with open(cls.path(), "r") as f:
+                data = json.load(f)
+
+            if data.get("version") != SESSION_VERSION:
+                return None
+
+            done: set[str] = set()
+
+            try:
+                with open(cls.checkpoint_path(), "r") as f:
+                    for line in f:
+                        # INFO: The last line is partial if the server stopped mid-write
+                        try:
+                            done.add(json.loads(line))
+                        except ValueError:
+                            continue
+            except FileNotFoundError:
+                pass
+
+            roots = [Path(root).resolve().as_posix() for root in roots if root]
+            files = [
+                file
+                for file in data["files"]
+                if file not in done and is_within(file, roots)
+            ]
+            remaining = set(files)
+
+            return cls(
+                files=files,
+                overwrite_thumbs=remaining.intersection(data["overwrite_thumbs"]),
+                reindexing=remaining.intersection(data["reindexing"]),
+                manifest=(
+                    ScanManifest.from_dict(data["manifest"])
+                    if data["manifest"]
+                    else None
+                ),
+            )
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            log.warning(f"Ignoring unreadable scan session: {e}")
+            return None
+
+    def save(self):
+        """
+        Writes the session and starts a new checkpoint log.
+        """
+        path = self.path()
+        temp = path.with_suffix(".tmp")
+
+        with open(temp, "w") as f:
+            json.dump(
+                {
+                    "version": SESSION_VERSION,
+                    "files": self.files,
+                    "overwrite_thumbs": list(self.overwrite_thumbs),
+                    "reindexing": list(self.reindexing),
+                    "manifest": self.manifest.to_dict() if self.manifest else None,
+                },
+                f,
+            )
+
+        open(self.checkpoint_path(), "w").close()
+        os.replace(temp, path)
+
+    def checkpoint(self, filepaths: list[str]):
+        """
+        Records files as done. Called once their batch is committed.
+        """
+        if not filepaths:
+            return
+
+        with open(self.checkpoint_path(), "a") as f:
+            f.writelines(json.dumps(filepath) + "\n" for filepath in filepaths)
+            f.flush()
+            os.fsync(f.fileno())
+
+    @classmethod
+    def clear(cls):
+        """
+        Removes the session once the scan is done.
+        """
+        for path in (cls.path(), cls.checkpoint_path()):
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
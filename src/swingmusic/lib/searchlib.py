@@ -2,10 +2,15 @@
 This library contains all the functions related to the search functionality.
 """
 
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from typing import Callable
+
 from rapidfuzz import process, utils, fuzz
-from unidecode import unidecode
 
 from swingmusic import models
+from swingmusic.config import UserConfig
 
 from swingmusic.models.album import Album
 from swingmusic.models.artist import Artist
@@ -18,9 +23,12 @@ from swingmusic.serializers.track import serialize_track, serialize_tracks
 
 from swingmusic.store.albums import AlbumStore
 from swingmusic.store.artists import ArtistStore
+from swingmusic.store.searchcorpus import Match, SearchCorpus, normalize
 from swingmusic.store.tracks import TrackStore
 
 from swingmusic.utils.remove_duplicates import remove_duplicates
+from swingmusic.utils.threading import CoreBudget
+from swingmusic.utils.workers import available_cpus
 
 # ratio = fuzz.ratio
 # wratio = fuzz.WRatio
@@ -48,93 +56,237 @@ class Limit:
     playlists: int = 150
 
 
+class SearchBudget:
+    """
+    Holds the core budget shared by all searches, so that a burst
+    of search requests cannot take over every core.
+
+    The budget is read from `UserConfig.searchCoreBudget`.
+    """
+
+    _budget: CoreBudget | None = None
+    executor = ThreadPoolExecutor(thread_name_prefix="search")
+
+    @classmethod
+    def get(cls) -> CoreBudget:
+        cores = UserConfig().searchCoreBudget
+
+        if cores <= 0:
+            cores = max(1, available_cpus() // 2)
+
+        if cls._budget is None or cls._budget.cores != cores:
+            cls._budget = CoreBudget(cores)
+
+        return cls._budget
+
+
+class SearchCache:
+    """
+    LRU cache of search results, for repeated searches.
+    eg. going back to a search, or loading more results.
+
+    Entries are keyed by the search type, the store version, the
+    normalized query and the limit, so they expire as soon as the
+    library changes.
+
+    Only exact repeats are served from the cache. The matches of a shorter
+    query can't be narrowed down for a longer one: fuzzy scores can go up
+    as the query grows, so items that did not match the shorter query
+    may match the longer one.
+    """
+
+    maxsize: int = 256
+
+    entries: OrderedDict[tuple[str, int, str, int], list[Match]] = OrderedDict()
+    hits: int = 0
+    misses: int = 0
+    _lock = Lock()
+
+    @classmethod
+    def get(
+        cls, itemtype: str, version: int, query: str, limit: int
+    ) -> list[Match] | None:
+        """
+        Returns the cached matches for the query, if any.
+        """
+        key = (itemtype, version, query, limit)
+
+        with cls._lock:
+            matches = cls.entries.get(key)
+
+            if matches is None:
+                cls.misses += 1
+            else:
+                cls.hits += 1
+                cls.entries.move_to_end(key)
+
+            return matches
+
+    @classmethod
+    def put(
+        cls, itemtype: str, version: int, query: str, limit: int, matches: list[Match]
+    ):
+        key = (itemtype, version, query, limit)
+
+        with cls._lock:
+            cls.entries[key] = matches
+            cls.entries.move_to_end(key)
+
+            while len(cls.entries) > cls.maxsize:
+                cls.entries.popitem(last=False)
+
+    @classmethod
+    def clear(cls):
+        with cls._lock:
+            cls.entries.clear()
+            cls.hits = cls.misses = 0
+
+    @classmethod
+    def stats(cls):
+        """
+        Returns the cache counters. Useful to size the cache.
+        """
+        with cls._lock:
+            total = cls.hits + cls.misses
+
+            return {
+                "size": len(cls.entries),
+                "maxsize": cls.maxsize,
+                "hits": cls.hits,
+                "misses": cls.misses,
+                "hit_rate": cls.hits / total if total else 0,
+            }
+
+
+def search_corpus(
+    itemtype: str,
+    corpus: SearchCorpus,
+    version: int,
+    query: str,
+    scorer: Callable,
+    score_cutoff: float,
+    limit: int | None,
+    cores: int | None = None,
+) -> list[Match]:
+    """
+    Searches a store corpus, going through the `SearchCache`.
+
+    :param version: The version of the store the corpus belongs to.
+    :param cores: The max cores to score with. Defaults to the whole search budget.
+    """
+    query = normalize(query)
+
+    # INFO: Unlimited searches can match most of the library, don't keep them
+    if limit is not None:
+        matches = SearchCache.get(itemtype, version, query, limit)
+
+        # INFO: Copy, so that callers can't change the cached entry
+        if matches is not None:
+            return list(matches)
+
+    budget = SearchBudget.get()
+
+    with budget.reserve(cores or budget.cores) as workers:
+        matches = corpus.extract(query, scorer, score_cutoff, limit, workers=workers)
+
+    if limit is not None:
+        SearchCache.put(itemtype, version, query, limit, list(matches))
+
+    return matches
+
+
 class SearchTracks:
-    def __init__(self, query: str) -> None:
+    def __init__(self, query: str, cores: int | None = None) -> None:
+        """
+        :param cores: The max cores to score with. Defaults to the whole search budget.
+        """
         self.query = query
-        self.tracks = TrackStore.get_flat_list()
+        self.cores = cores
 
     def __call__(self, limit: int = Limit.tracks) -> list[models.Track]:
         """
         Gets all songs with a given title.
         """
-
-        track_titles = [unidecode(track.title).lower() for track in self.tracks]
-        results = process.extract(
+        results = search_corpus(
+            "tracks",
+            TrackStore.corpus,
+            TrackStore.version,
             self.query,
-            track_titles,
+            scorer=fuzz.WRatio,
             score_cutoff=Cutoff.tracks,
             limit=limit,
-            processor=utils.default_process,
-            scorer=fuzz.WRatio,
+            cores=self.cores,
         )
 
         tracks: list[Track] = []
 
-        for item in results:
-            track = self.tracks[item[2]]
-            track._score = item[1]
-            tracks.append(track)
+        for result in results:
+            result.item._score = result.score
+            tracks.append(result.item)
 
         return remove_duplicates(tracks)
 
 
 class SearchArtists:
-    def __init__(self, query: str) -> None:
+    def __init__(self, query: str, cores: int | None = None) -> None:
+        """
+        :param cores: The max cores to score with. Defaults to the whole search budget.
+        """
         self.query = query
-        self.artists = ArtistStore.get_flat_list()
+        self.cores = cores
 
     def __call__(self, limit: int = Limit.artists):
         """
         Gets all artists with a given name.
         """
-        choices = [unidecode(a.name).lower() for a in self.artists]
-
-        results = process.extract(
+        results = search_corpus(
+            "artists",
+            ArtistStore.corpus,
+            ArtistStore.version,
             self.query,
-            choices,
+            scorer=fuzz.WRatio,
             score_cutoff=Cutoff.artists,
             limit=limit,
-            processor=utils.default_process,
-            scorer=fuzz.WRatio,
+            cores=self.cores,
         )
 
         artists: list[Artist] = []
 
-        for item in results:
-            artist = self.artists[item[2]]
-            artist._score = item[1]
-            artists.append(artist)
+        for result in results:
+            result.item._score = result.score
+            artists.append(result.item)
 
         return artists
 
 
 class SearchAlbums:
-    def __init__(self, query: str) -> None:
+    def __init__(self, query: str, cores: int | None = None) -> None:
+        """
+        :param cores: The max cores to score with. Defaults to the whole search budget.
+        """
         self.query = query
-        self.albums = AlbumStore.get_flat_list()
+        self.cores = cores
 
     def __call__(self, limit: int = Limit.albums):
         """
         Gets all albums with a given title.
         """
-
-        choices = [unidecode(a.title).lower() for a in self.albums]
-
-        results = process.extract(
+        results = search_corpus(
+            "albums",
+            AlbumStore.corpus,
+            AlbumStore.version,
             self.query,
-            choices,
+            scorer=fuzz.token_sort_ratio,
             score_cutoff=Cutoff.albums,
             limit=limit,
-            processor=utils.default_process,
-            scorer=fuzz.token_sort_ratio,
+            cores=self.cores,
         )
 
         albums: list[Album] = []
 
-        for item in results:
-            album = self.albums[item[2]]
-            album._score = item[1]
-            albums.append(album)
+        for result in results:
+            result.item._score = result.score
+            albums.append(result.item)
 
         return albums
 
@@ -168,20 +320,6 @@ class SearchPlaylists:
 _type = models.Track | models.Album | models.Artist
 
 
-def get_titles(items: list[_type]):
-    for item in items:
-        if isinstance(item, models.Track):
-            text = item.og_title
-        elif isinstance(item, models.Album):
-            text = item.title
-        elif isinstance(item, models.Artist):
-            text = item.name
-        else:
-            text = None
-
-        yield text
-
-
 class TopResults:
     """
     Joins all tracks, albums and artists
@@ -190,13 +328,19 @@ class TopResults:
 
     @staticmethod
     def collect_all():
+        """
+        Returns all artists, tracks and albums and their
+        pre-normalized search choices, aligned by index.
+        """
         all_items: list[_type] = []
+        all_choices: list[str] = []
 
-        all_items.extend(ArtistStore.get_flat_list())
-        all_items.extend(TrackStore.get_flat_list())
-        all_items.extend(AlbumStore.get_flat_list())
+        for corpus in (ArtistStore.corpus, TrackStore.corpus, AlbumStore.corpus):
+            items, choices = corpus.view()
+            all_items.extend(items)
+            all_choices.extend(choices)
 
-        return all_items, get_titles(all_items)
+        return all_items, all_choices
 
     @staticmethod
     def get_track_items(item: Track | Album | Artist, limit=5):
@@ -234,6 +378,47 @@ class TopResults:
 
         return albums
 
+    @staticmethod
+    def search_categories(
+        query: str,
+        tracks_limit: int | None,
+        albums_limit: int | None,
+        artists_limit: int | None,
+    ):
+        """
+        Searches tracks, albums and artists.
+
+        When the search budget allows more than one core, the three
+        searches run concurrently and share the budget between them.
+        Pass `tracks_limit=None` to skip searching tracks.
+        """
+        budget = SearchBudget.get()
+
+        if budget.cores == 1:
+            tracks = SearchTracks(query)(limit=tracks_limit) if tracks_limit else []
+            albums = SearchAlbums(query)(limit=albums_limit)
+            artists = SearchArtists(query)(limit=artists_limit)
+
+            return tracks, albums, artists
+
+        # INFO: Split the budget between the categories
+        cores = max(1, budget.cores // 3)
+        executor = SearchBudget.executor
+
+        tracks = (
+            executor.submit(SearchTracks(query, cores), limit=tracks_limit)
+            if tracks_limit
+            else None
+        )
+        albums = executor.submit(SearchAlbums(query, cores), limit=albums_limit)
+        artists = executor.submit(SearchArtists(query, cores), limit=artists_limit)
+
+        return (
+            tracks.result() if tracks else [],
+            albums.result(),
+            artists.result(),
+        )
+
     @staticmethod
     def search(
         query: str,
@@ -246,9 +431,12 @@ class TopResults:
         artists_limit = limit
 
         # INFO: Individually search all stores as each type has a different scorer
-        tracks = SearchTracks(query)(limit=tracks_limit) if not albums_only else []
-        albums = SearchAlbums(query)(limit=albums_limit)
-        artists = SearchArtists(query)(limit=artists_limit)
+        tracks, albums, artists = TopResults.search_categories(
+            query,
+            tracks_limit=tracks_limit if not albums_only else None,
+            albums_limit=albums_limit,
+            artists_limit=artists_limit,
+        )
 
         # INFO: Combine all results and sort them by score
         all_results = artists + tracks + albums
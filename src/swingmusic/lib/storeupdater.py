@@ -0,0 +1,167 @@
+"""
+Applies track additions and removals to the in-memory stores,
+rebuilding only the albums and artists they belong to.
+"""
+
+from typing import Iterable
+
+from swingmusic.lib.aggregate import aggregate_library
+from swingmusic.lib.mapstuff import (
+    map_album_colors,
+    map_artist_colors,
+    map_favorites,
+    map_scrobble_delta,
+)
+from swingmusic.models import Album, Artist, Track
+from swingmusic.store.albums import AlbumStore
+from swingmusic.store.artists import ArtistStore
+from swingmusic.store.folder import FolderStore
+from swingmusic.store.tracks import TrackStore
+
+
+def copy_track_data(source: Track, track: Track):
+    """
+    Copies the data mapped onto the tracks of a trackhash group.
+    """
+    track.playcount = source.playcount
+    track.playduration = source.playduration
+    track.lastplayed = source.lastplayed
+    track.fav_userids = [*source.fav_userids]
+    track.color = source.color
+    track.blurhash = source.blurhash
+
+
+def get_track_artisthashes(track: Track):
+    return {*track.artisthashes, *(a["artisthash"] for a in track.albumartists)}
+
+
+def load_albums_and_artists(instance_key: str):
+    """
+    Builds all the albums and artists from the track store, in one pass
+    over the tracks, and loads them into their stores.
+    """
+    albums, artists = aggregate_library(TrackStore.get_flat_list())
+
+    AlbumStore.load_albums(instance_key, albums)
+    ArtistStore.load_artists(instance_key, artists=artists)
+
+
+def apply_moves(moves: dict[str, str]):
+    """
+    Moves tracks to their new filepaths in the stores.
+
+    The tracks, and so their albums and artists, are unchanged,
+    so nothing is rebuilt.
+    """
+    for filepath, new_filepath in moves.items():
+        if TrackStore.move_track(filepath, new_filepath) is None:
+            continue
+
+        FolderStore.filepaths.discard(filepath)
+        FolderStore.filepaths.add(new_filepath)
+
+
+def apply_track_changes(
+    added: Iterable[Track], removed: Iterable[str] = ()
+) -> tuple[list[Album], list[Artist]]:
+    """
+    Adds tracks to and removes tracks (by filepath) from the stores.
+
+    Tracks already in the store with the same filepath as an added track
+    are replaced. The albums and artists of all the changed tracks are
+    rebuilt from their tracks, removed if they no longer have any,
+    and left untouched otherwise.
+
+    Scrobbles, favorites and colors are mapped onto the rebuilt items
+    from the database, so the stores end up as after a full reload.
+
+    Returns the albums and artists that were not in the stores before.
+    """
+    added = list(added)
+    stale = {*removed, *(track.filepath for track in added)}
+
+    albumhashes: set[str] = set()
+    artisthashes: set[str] = set()
+
+    for track in [*TrackStore.get_tracks_by_filepaths(stale), *added]:
+        albumhashes.add(track.albumhash)
+        artisthashes.update(get_track_artisthashes(track))
+
+    TrackStore.remove_tracks_by_filepaths(stale)
+    FolderStore.filepaths.difference_update(stale)
+
+    new_groups: set[str] = set()
+
+    for track in added:
+        group = TrackStore.trackhashmap.get(track.trackhash)
+
+        if group is None:
+            new_groups.add(track.trackhash)
+        elif track.trackhash not in new_groups:
+            copy_track_data(group.tracks[0], track)
+
+        TrackStore.add_track(track)
+        FolderStore.filepaths.add(track.filepath)
+
+    # INFO: Album artists are not in the track artist index,
+    # so the tracks of their albums are included as well.
+    artist_albums = set(albumhashes)
+
+    for artisthash in artisthashes:
+        entry = ArtistStore.artistmap.get(artisthash)
+
+        if entry is not None:
+            artist_albums.update(entry.albumhashes)
+
+    changed_tracks = {
+        track.filepath: track
+        for albumhash in artist_albums
+        for track in TrackStore.get_tracks_by_albumhash(albumhash)
+    }
+
+    for artisthash in artisthashes:
+        for track in TrackStore.get_tracks_by_artisthash(artisthash):
+            changed_tracks[track.filepath] = track
+
+    # INFO: The changed albums and artists are built in one pass over their tracks
+    albums, artists = aggregate_library(
+        changed_tracks.values(), albumhashes=albumhashes, artisthashes=artisthashes
+    )
+
+    # SECTION: Albums
+    new_albums = [a for a, _ in albums if a.albumhash not in AlbumStore.albummap]
+
+    AlbumStore.update_albums(
+        albums, removed=albumhashes - {a.albumhash for a, _ in albums}
+    )
+
+    # SECTION: Artists
+    new_artists = [
+        a for a, _, _ in artists if a.artisthash not in ArtistStore.artistmap
+    ]
+
+    ArtistStore.update_artists(
+        artists, removed=artisthashes - {a.artisthash for a, _, _ in artists}
+    )
+
+    # SECTION: Mapped data
+    rebuilt_albums = {a.albumhash for a, _ in albums}
+    rebuilt_artists = {a.artisthash for a, _, _ in artists}
+    new_albumhashes = {a.albumhash for a in new_albums}
+    new_artisthashes = {a.artisthash for a in new_artists}
+
+    map_scrobble_delta(new_groups, rebuilt_albums, rebuilt_artists)
+    map_favorites(tracks=new_groups, albums=new_albumhashes, artists=new_artisthashes)
+
+    # INFO: New track groups take their colors from their album
+    map_album_colors(
+        new_albumhashes
+        | {
+            TrackStore.trackhashmap[h].tracks[0].albumhash
+            for h in new_groups
+            if h in TrackStore.trackhashmap
+        }
+    )
+    map_artist_colors(new_artisthashes)
+
+    return new_albums, new_artists
@@ -1,25 +1,32 @@
 import os
+import time
 from functools import partial
-from multiprocessing import Pool, cpu_count
 import math
-
-from natsort import natsorted
+from dataclasses import dataclass, field
+from queue import Queue
+from threading import Thread
+from typing import Callable, Iterable
 
 from swingmusic import settings
 from swingmusic.config import UserConfig
 from swingmusic.db.libdata import TrackTable
 from swingmusic.events import events
 
-from swingmusic.lib.taglib import extract_thumb, get_tags
+from swingmusic.lib.aggregate import aggregate_library
+from swingmusic.lib.filemoves import IndexedFile, match_moves
+from swingmusic.lib.scanmanifest import ScanManifest, scan_dirs
+from swingmusic.lib.scansession import ScanCancelledError, ScanSession
+from swingmusic.lib.taglib import get_tags_and_art, save_thumb, thumb_exists
 from swingmusic.models.artist import Artist
 from swingmusic.models.track import Track
 from swingmusic.store.folder import FolderStore
 from swingmusic.store.general import GeneralStore
+from swingmusic.store.scanstatus import ScanStatus
 from swingmusic.store.tracks import TrackStore
 from swingmusic.utils import flatten
-from swingmusic.utils.filesystem import run_fast_scandir
+from swingmusic.utils.batching import AdaptiveBatchSize
 from swingmusic.utils.progressbar import tqdm
-from swingmusic.utils.remove_duplicates import remove_duplicates
+from swingmusic.utils.workers import TaskGroup, WorkerPool
 
 
 from logging import getLogger
@@ -27,23 +34,105 @@ from logging import getLogger
 log = getLogger(__name__)
 
 
-def parse_file_tags(file: str, config: UserConfig) -> dict | None:
-    """Worker function to process individual files"""
+def parse_file_tags(
+    task: tuple[str, bool], config: UserConfig, paths: settings.Paths
+) -> dict | None:
+    """
+    Worker function to process individual files.
+
+    Reads the tags and, if the album has no thumbnail yet, the album art
+    in the same pass, and writes the thumbnail.
+    The task is a tuple of the filepath and whether to overwrite
+    an existing thumbnail (for modified files).
+    """
+    file, overwrite_thumb = task
+
+    def needs_art(tags: dict):
+        return overwrite_thumb or not thumb_exists(tags["albumhash"] + ".webp", paths)
+
     try:
-        return get_tags(file, config=config)
+        tags, album_art = get_tags_and_art(file, config, needs_art)
     except Exception as e:
         log.warning(f"Failed to process file {file}: {e}")
         return None
 
+    if album_art is not None:
+        save_thumb(album_art, tags["albumhash"] + ".webp", paths)
+
+    return tags
+
+
+@dataclass
+class ChangeSet:
+    """
+    The filepaths changed by a scan.
+    """
+
+    added: set[str] = field(default_factory=set)
+    """
+    Files that were not indexed before.
+    """
+    modified: set[str] = field(default_factory=set)
+    """
+    Indexed files that were modified and indexed again.
+    """
+    removed: set[str] = field(default_factory=set)
+    """
+    Indexed files that were deleted, or could not be indexed again.
+    """
+    moved: dict[str, str] = field(default_factory=dict)
+    """
+    Indexed files that were moved or renamed, as old to new filepaths.
+    """
+
+    def __len__(self):
+        return (
+            len(self.added) + len(self.modified) + len(self.removed) + len(self.moved)
+        )
+
+    def update(self, other: "ChangeSet"):
+        self.added.update(other.added)
+        self.modified.update(other.modified)
+        self.removed.update(other.removed)
+        self.moved.update(other.moved)
+
+
+Publisher = Callable[[ChangeSet], None]
+"""
+Called with the changes of each batch committed to the database.
+"""
+
 
 class IndexTracks:
-    def __init__(self) -> None:
+    def __init__(self, quick: bool = False, publish: Publisher | None = None) -> None:
         """
         Indexes all tracks in the database.
 
         An instance key is used to prevent multiple instances of the
         same class from running at the same time.
+
+        A quick scan only lists folders whose mtime changed since the last
+        scan, and only checks the tracks in those folders for modifications.
+        Files edited in place (eg. retagged) in an otherwise unchanged
+        folder are picked up by the next full scan.
+
+        When `publish` is given, removed tracks and each committed batch
+        of new tracks are passed to it while the scan is running.
+
+        The files left to tag are checkpointed in a `ScanSession`. If the
+        previous scan was interrupted, its remaining files are tagged
+        instead of walking the root directories.
+        """
+        self.total_indexed = 0
+        self.reindexing: set[str] = set()
+        self.publish_failed = False
+        self.cancelled = False
+        self.session = ScanSession()
+        self.changes = ChangeSet()
+        """
+        All the changes made by this scan.
         """
+
         dirs_to_scan = UserConfig().rootDirs
 
         if len(dirs_to_scan) == 0:
@@ -61,68 +150,154 @@ class IndexTracks:
         except IndexError:
             pass
 
-        files = set()
+        session = ScanSession.load(dirs_to_scan)
 
-        for _dir in dirs_to_scan:
-            files = files.union(run_fast_scandir(_dir, full=True)[1])
+        if session is not None:
+            log.info(f"Resuming the interrupted scan: {len(session.files)} files left")
+            self.reindexing = session.reindexing
+            self.tag_session(session, publish)
+            return
 
-        unmodified, modified_tracks = self.filter_modded()
-        untagged = files - unmodified
+        previous = None
 
-        self.tag_untagged(untagged)
-        self.extract_thumb_with_overwrite(modified_tracks)
+        # INFO: Without indexed tracks, skipped folders would never be indexed
+        if quick and TrackTable.count() > 0:
+            previous = ScanManifest.load()
 
-    @staticmethod
-    def extract_thumb_with_overwrite(tracks: list[dict[str, str]]):
+        with ScanStatus.stage("walk") as stage:
+            scan = scan_dirs(
+                dirs_to_scan,
+                previous,
+                on_dir=lambda _: ScanStatus.update(stage, done=1),
+            )
+            ScanStatus.update(stage, total=len(scan.manifest.dirs))
+
+        with ScanStatus.stage("diff") as stage:
+            if previous is None:
+                unmodified, modified_tracks, moves = self.filter_modded(
+                    files=scan.files
+                )
+            else:
+                log.info(
+                    f"Quick scan: {len(scan.listed)} changed folders, "
+                    f"{scan.skipped_dirs} unchanged folders ({scan.skipped_files} files) skipped"
+                )
+                unmodified, modified_tracks, moves = self.filter_modded(
+                    folders=scan.listed | scan.vanished, files=scan.files
+                )
+
+            checked = len(unmodified) + len(modified_tracks)
+            ScanStatus.update(stage, done=checked, total=checked)
+
+        untagged = scan.files - unmodified
+
+        # INFO: Modified files were removed from the database, and are re-added
+        # when tagged. Deleted files are in this set too.
+        removed = {t["filepath"] for t in modified_tracks}
+        self.reindexing = removed & untagged
+        deleted = ChangeSet(removed=removed - untagged, moved=moves)
+
+        if publish is not None and deleted:
+            self.try_publish(publish, deleted)
+
+        self.changes.update(deleted)
+
+        # INFO: Thumbnails of modified files are rewritten while tagging
+        session = ScanSession(
+            files=list(untagged),
+            overwrite_thumbs=removed & untagged,
+            reindexing=self.reindexing,
+            manifest=scan.manifest,
+        )
+        self.tag_session(session, publish)
+
+    def tag_session(self, session: ScanSession, publish: Publisher | None):
         """
-        Extracts the thumbnail from a list of filepaths,
-        overwriting the existing thumbnail if it exists,
-        for modified files.
+        Tags the files of a scan session, then saves its directory manifest
+        and removes it. A cancelled session is kept, to be resumed.
         """
-        for track in tracks:
-            try:
-                extract_thumb(
-                    track["filepath"],
-                    track["albumhash"] + ".webp",
-                    overwrite=True,
-                    paths=settings.Paths(),
-                )
-            except FileNotFoundError:
-                continue
+        self.session = session
+
+        if session.files:
+            session.save()
+
+        try:
+            self.tag_untagged(set(session.files), session.overwrite_thumbs, publish)
+        except ScanCancelledError:
+            self.cancelled = True
+            log.warning("Scan cancelled. The remaining files are tagged on the next scan")
+
+        # INFO: Modified files that failed to be tagged again are gone
+        failed = ChangeSet(removed=self.reindexing - self.changes.modified)
+
+        if publish is not None and failed:
+            self.try_publish(publish, failed)
+
+        self.changes.update(failed)
+
+        if self.cancelled:
+            return
+
+        # INFO: Saved last, so an interrupted scan is redone from the old manifest
+        if session.manifest is not None:
+            session.manifest.save()
+
+        ScanSession.clear()
 
     @staticmethod
-    def filter_modded():
+    def filter_modded(folders: set[str] | None = None, files: set[str] | None = None):
         """
         Removes tracks from the database that have been modified
         since they were indexed.
 
-        Returns a tuple of unmodified paths and modified tracks.
+        Returns a tuple of unmodified paths, modified tracks and moved files.
         Unmodified paths are indexed and the modified tracks are
 
+        When `folders` is given, only the tracks in those folders are checked.
+
+        When `files` (the files found on disk) is given, tracks whose file no
+        longer exists are matched to new files with the same identity (see
+        `lib.filemoves`). Those are moved in the database instead of being
+        removed, and their new paths are returned as unmodified.
         """
 
         unmodified_paths = set()
         modified_tracks: list[dict[str, str]] = []
 
         to_remove = set()
+        indexed = set()
+
+        for filepath, last_mod, albumhash in TrackTable.get_file_stats(folders):
+            indexed.add(filepath)
 
-        for track in TrackTable.get_all():
             try:
-                if track.last_mod == round(os.path.getmtime(track.filepath)):
-                    unmodified_paths.add(track.filepath)
+                if last_mod == round(os.path.getmtime(filepath)):
+                    unmodified_paths.add(filepath)
                     continue
             except (FileNotFoundError, OSError) as e:
                 log.warning(e)  # REVIEW More informations = good
-                to_remove.add(track.filepath)
+                to_remove.add(filepath)
 
             modified_tracks.append(
                 {
-                    "filepath": track.filepath,
-                    "albumhash": track.albumhash,
+                    "filepath": filepath,
+                    "albumhash": albumhash,
                 }
             )
 
-        to_remove = to_remove.union(set(t["filepath"] for t in modified_tracks))
+        moves: dict[str, str] = {}
+
+        if files and to_remove:
+            missing = (IndexedFile(*row) for row in TrackTable.get_move_info(to_remove))
+            moves = match_moves(missing, files - indexed)
+
+        if moves:
+            log.info(f"{len(moves)} moved files detected")
+            TrackTable.move_tracks(moves)
+            unmodified_paths.update(moves.values())
+            modified_tracks = [t for t in modified_tracks if t["filepath"] not in moves]
+
+        to_remove = set(t["filepath"] for t in modified_tracks)
         TrackTable.remove_tracks_by_filepaths(to_remove)
 
         # REVIEW: Remove after testing!
@@ -130,9 +305,26 @@ class IndexTracks:
         if track:
             raise Exception("Track not removed")
 
-        return unmodified_paths, modified_tracks
+        return unmodified_paths, modified_tracks, moves
 
-    def tag_untagged(self, files: set[str]):
+    def tag_untagged(
+        self,
+        files: set[str],
+        overwrite_thumbs: set[str] = set(),
+        publish: Publisher | None = None,
+    ):
+        """
+        Tags the given files and writes them to the database.
+
+        Tag workers, the database writer and the publisher run as separate
+        stages connected by bounded queues, so a slow stage holds back the
+        ones before it instead of buffering the whole library in memory.
+        When `publish` is given, it is called with the filepaths of each
+        committed batch.
+
+        Raises `ScanCancelledError` if the scan is cancelled. The batches
+        committed until then are kept.
+        """
         if not files:
             print("No files to process")
             return
@@ -145,8 +337,27 @@ class IndexTracks:
         total_files = len(files_list)
         batches = math.ceil(total_files / batch_size)
 
-        # Create process pool with worker function
-        total_processed = 0
+        write_queue: Queue[tuple[list[dict], list[str]] | None] = Queue(maxsize=4)
+        publish_queue = Queue(maxsize=4) if publish is not None else None
+        stages = [
+            Thread(
+                target=self.write_tracks,
+                args=(write_queue, publish_queue),
+                name="scan-writer",
+            )
+        ]
+
+        if publish is not None:
+            stages.append(
+                Thread(
+                    target=self.publish_tracks,
+                    args=(publish_queue, publish),
+                    name="scan-publisher",
+                )
+            )
+
+        for stage in stages:
+            stage.start()
 
         events.dispatch(
             "scan_batch_cleared",
@@ -156,51 +367,232 @@ class IndexTracks:
         )
         GeneralStore.scan_message = "scan_batch_cleared: " + f"0/{batches}"
 
-        with Pool(processes=max(1, cpu_count() // 2)) as pool:
-            worker = partial(parse_file_tags, config=config)
+        worker = partial(parse_file_tags, config=config, paths=settings.Paths())
 
-            for batch_num in range(batches):
-                start_idx = batch_num * batch_size
-                end_idx = min(start_idx + batch_size, total_files)
-                batch_files = files_list[start_idx:end_idx]
+        def get_batch(batch_num: int):
+            start_idx = batch_num * batch_size
+            end_idx = min(start_idx + batch_size, total_files)
+            return files_list[start_idx:end_idx]
 
-                if not batch_files:
-                    break
+        def submit(batch_num: int):
+            tasks = [(file, file in overwrite_thumbs) for file in get_batch(batch_num)]
+            return WorkerPool.map(worker, tasks, queue="tagging")
+
+        group = submit(0)
+        next_group = None
+
+        try:
+            with ScanStatus.stage("tagging", total=total_files) as stage:
+                for batch_num in range(batches):
+                    # INFO: Queue the next batch before draining this one,
+                    # so that workers don't idle at the tail of each batch.
+                    next_group = (
+                        submit(batch_num + 1) if batch_num + 1 < batches else None
+                    )
+
+                    # Process current batch
+                    batch_results = []
+                    for result in self.follow_batch(group, batch_num, batches):
+                        if result is None:
+                            ScanStatus.update(stage, failed=1)
+                            continue
 
-                # Process current batch
-                batch_results = []
-                for result in tqdm(
-                    pool.imap_unordered(worker, batch_files),
-                    total=len(batch_files),
-                    desc=f"Batch {batch_num + 1}/{batches}",
-                ):
-                    if result is not None:
                         batch_results.append(result)
+                        ScanStatus.update(
+                            stage,
+                            done=1,
+                            bytes_read=result["extra"].get("filesize", 0),
+                            queues=self.get_queue_depths(write_queue, publish_queue),
+                        )
+
+                    ScanStatus.update(stage, cpu_seconds=group.cpu_seconds)
+                    write_queue.put((batch_results, get_batch(batch_num)))
+
+                    # Dispatch event for batch completion
+                    events.dispatch(
+                        "scan_batch_cleared",
+                        {
+                            "batch": f"{batch_num + 1}/{batches}",
+                        },
+                    )
+                    GeneralStore.scan_message = (
+                        "scan_batch_cleared: " + f"{batch_num + 1}/{batches}"
+                    )
+
+                    print(
+                        f"Completed batch {batch_num + 1}/{batches}: {len(batch_results)} files indexed"
+                    )
+
+                    group = next_group
+        finally:
+            # INFO: Drops queued tasks if parsing was interrupted
+            for pending in (group, next_group):
+                if pending is not None:
+                    pending.cancel()
+
+            write_queue.put(None)
+
+            for thread in stages:
+                thread.join()
+
+        print(f"{self.total_indexed} new files indexed")
+        print("Done")
+
+    @staticmethod
+    def follow_batch(group: TaskGroup, batch_num: int, batches: int):
+        """
+        Yields the results of a tagging batch.
 
-                # Bulk insert batch results
-                for tags in batch_results:
-                    TrackTable.insert_one(tags)
-                    FolderStore.filepaths.add(tags["filepath"])
+        Raises `ScanCancelledError` once the scan is cancelled. Cancelling
+        kills the workers, so their running tasks fail as well.
+        """
+        try:
+            for result in tqdm(group, desc=f"Batch {batch_num + 1}/{batches}"):
+                if ScanStatus.cancelled.is_set():
+                    raise ScanCancelledError()
 
-                total_processed += len(batch_results)
+                yield result
+        except Exception as e:
+            if ScanStatus.cancelled.is_set() and not isinstance(e, ScanCancelledError):
+                raise ScanCancelledError() from e
 
-                # Dispatch event for batch completion
-                events.dispatch(
-                    "scan_batch_cleared",
-                    {
-                        "batch": f"{batch_num + 1}/{batches}",
-                    },
-                )
-                GeneralStore.scan_message = (
-                    "scan_batch_cleared: " + f"{batch_num + 1}/{batches}"
-                )
+            raise
+
+        if ScanStatus.cancelled.is_set():
+            raise ScanCancelledError()
+
+    @staticmethod
+    def get_queue_depths(write_queue: Queue, publish_queue: Queue | None):
+        return {
+            "workers": WorkerPool.queue_depth("tagging"),
+            "write": write_queue.qsize(),
+            "publish": publish_queue.qsize() if publish_queue is not None else 0,
+        }
+
+    def write_tracks(
+        self,
+        source: Queue[tuple[list[dict], list[str]] | None],
+        sink: Queue[ChangeSet | None] | None,
+    ):
+        """
+        The database writer stage.
+
+        Buffers parsed tags and writes them in batches sized by the measured
+        insert time, independently of the parse batches. The filepaths of
+        each committed batch are recorded as added or modified, and passed
+        on to the sink.
+
+        Each batch is a tuple of the parsed tags and all the files that were
+        parsed, including those that failed. The files are checkpointed in
+        the scan session once their tags are committed.
+        """
+        inserts = AdaptiveBatchSize(initial=150)
+        pending: list[dict] = []
+        pending_files: list[str] = []
 
-                print(
-                    f"Completed batch {batch_num + 1}/{batches}: {len(batch_results)} files indexed"
+        try:
+            with ScanStatus.stage("database") as stage:
+                while True:
+                    batch = source.get()
+
+                    # INFO: Keep draining the source after an error, so that the
+                    # tagging stage never blocks on a full queue. A hung scan
+                    # would keep the scan lock and block all later scans.
+                    try:
+                        if batch is not None:
+                            pending.extend(batch[0])
+                            pending_files.extend(batch[1])
+
+                        if pending_files and not pending:
+                            # INFO: Batches where every file failed to parse
+                            self.session.checkpoint(pending_files)
+                            pending_files = []
+
+                        if pending and (batch is None or len(pending) >= inserts.size):
+                            try:
+                                inserted = self.insert_tracks(pending, inserts)
+                                self.session.checkpoint(pending_files)
+                            except Exception as e:
+                                log.error(f"Failed to write {len(pending)} tracks: {e}")
+                                inserted = []
+
+                            ScanStatus.update(
+                                stage,
+                                done=len(inserted),
+                                failed=len(pending) - len(inserted),
+                                queues={"write": source.qsize()},
+                            )
+                            pending = []
+                            pending_files = []
+                            self.total_indexed += len(inserted)
+
+                            filepaths = {tags["filepath"] for tags in inserted}
+                            changes = ChangeSet(
+                                added=filepaths - self.reindexing,
+                                modified=filepaths & self.reindexing,
+                            )
+                            self.changes.update(changes)
+
+                            if sink is not None and changes:
+                                sink.put(changes)
+                    except Exception as e:
+                        log.error(f"Failed to write {len(pending_files)} files: {e}")
+                        ScanStatus.fail(stage, str(e), failed=len(pending))
+                        pending = []
+                        pending_files = []
+
+                    if batch is None:
+                        break
+        finally:
+            if sink is not None:
+                sink.put(None)
+
+    def publish_tracks(self, source: Queue[ChangeSet | None], publish: Publisher):
+        """
+        The publisher stage. Passes each committed batch to `publish`.
+        """
+        with ScanStatus.stage("stores") as stage:
+            while True:
+                changes = source.get()
+
+                if changes is None:
+                    break
+
+                self.try_publish(publish, changes)
+                ScanStatus.update(
+                    stage, done=len(changes), queues={"publish": source.qsize()}
                 )
 
-        print(f"{total_processed} new files indexed")
-        print("Done")
+    def try_publish(self, publish: Publisher, changes: ChangeSet):
+        """
+        Calls `publish`, and records whether it failed so that
+        the caller can fall back to a full reload.
+        """
+        try:
+            publish(changes)
+        except Exception as e:
+            log.error(f"Failed to publish {len(changes)} changes: {e}")
+            self.publish_failed = True
+
+    @staticmethod
+    def insert_tracks(tracks: list[dict], inserts: AdaptiveBatchSize) -> list[dict]:
+        """
+        Writes parsed tracks to the database in one transaction,
+        and records the time taken to adjust the next batch size.
+
+        Returns the tracks that were inserted.
+        """
+        if not tracks:
+            return []
+
+        start = time.perf_counter()
+        inserted = TrackTable.insert_batch(tracks)
+        inserts.record(len(tracks), time.perf_counter() - start)
+
+        for tags in inserted:
+            FolderStore.filepaths.add(tags["filepath"])
+
+        return inserted
 
 
 #
@@ -226,82 +618,19 @@ def create_artists(artisthashes: list[str]) -> list[tuple[Artist, set[str], set[
             [TrackStore.get_tracks_by_artisthash(hash) for hash in artisthashes]
         )
     else:
-        all_tracks: list[Track] = TrackStore.get_flat_list()
-
-    all_tracks = remove_duplicates(all_tracks)
-    artists = dict()
-
-    for track in all_tracks:
-        this_artists = [*track.artists]
-
-        for a in track.albumartists:
-            if a not in this_artists:
-                a["in_track"] = False
-                this_artists.append(a)
-
-        for thisartist in this_artists:
-            if thisartist["artisthash"] not in artists:
-                artists[thisartist["artisthash"]] = {
-                    "albumcount": None,
-                    "albums": {track.albumhash},
-                    "artisthash": thisartist["artisthash"],
-                    "created_date": track.last_mod,
-                    "date": track.date,
-                    "duration": track.duration,
-                    "genres": track.genres if track.genres else [],
-                    "name": None,
-                    "names": {thisartist["name"]},
-                    "lastplayed": track.lastplayed,
-                    "playcount": track.playcount,
-                    "playduration": track.playduration,
-                    "trackcount": None,
-                    "tracks": (
-                        {track.trackhash} if thisartist.get("in_track", True) else set()
-                    ),
-                    "extra": {},
-                }
-            else:
-                artist: dict = artists[thisartist["artisthash"]]
-                artist["duration"] += track.duration
-                artist["playcount"] += track.playcount
-                artist["playduration"] += track.playduration
-                artist["albums"].add(track.albumhash)
-                artist["date"] = min(artist["date"], track.date)
-                artist["lastplayed"] = max(artist["lastplayed"], track.lastplayed)
-                artist["created_date"] = min(artist["created_date"], track.last_mod)
-                artist["names"].add(thisartist["name"])
-
-                artist.setdefault("albums", set())
-
-                if thisartist.get("in_track", True):
-                    artist["tracks"].add(track.trackhash)
-
-                if track.genres:
-                    artist["genres"].extend(track.genres)
+        all_tracks = TrackStore.get_flat_list()
 
-    for artist in artists.values():
-        artist["albumcount"] = len(artist["albums"])
-        artist["trackcount"] = len(artist["tracks"])
+    return aggregate_artists(all_tracks)
 
-        genres = []
 
-        for genre in artist["genres"]:
-            if genre not in genres:
-                genres.append(genre)
-
-        artist["genres"] = genres
-        artist["genrehashes"] = " ".join([g["genrehash"] for g in genres])
-        artist["name"] = natsorted(artist["names"])[0]
-
-        # INFO: Delete temporary keys
-        del artist["names"]
-
-        tracks = artist.pop("tracks")
-        albums = artist.pop("albums")
-
-        # INFO: Delete local variables
-        del genres
-
-        artists[artist["artisthash"]] = (Artist(**artist), tracks, albums)
+def aggregate_artists(
+    all_tracks: Iterable[Track],
+) -> list[tuple[Artist, set[str], set[str]]]:
+    """
+    Creates artist objects from the given tracks, including album artists.
 
-    return list(artists.values())
+    Each artist is only built from the tracks passed in,
+    so all the tracks of an artist should be included.
+    """
+    _, artists = aggregate_library(all_tracks, albumhashes=set())
+    return artists
@@ -4,7 +4,7 @@ import os
 from io import BytesIO
 from pathlib import Path
 import re
-from typing import Any
+from typing import Any, Callable
 
 import pendulum
 from PIL import Image, UnidentifiedImageError
@@ -32,31 +32,33 @@ def parse_album_art(filepath: str):
     return None
 
 
-def extract_thumb(
-    filepath: str, webp_path: str, overwrite=False, paths: Paths = None
-) -> bool:
+def thumb_exists(webp_path: str, paths: Paths) -> bool:
     """
-    Extracts the thumbnail from an audio file.
-    Returns the path to the thumbnail.
+    Checks whether a non-empty thumbnail has already been extracted.
+    """
+    og_img_path = paths.og_thumb_path / webp_path
+    sm_img_path = paths.sm_thumb_path / webp_path
+
+    try:
+        return sm_img_path.exists() and os.path.getsize(og_img_path) > 0
+    except OSError:
+        return False
+
+
+def save_thumb(album_art: bytes, webp_path: str, paths: Paths = None) -> bool:
+    """
+    Saves the album art in all thumbnail sizes.
+    Returns True if the thumbnails were saved.
     """
-    # this function will be run multithreaded.
-    # Modules are not cached in concurrent runs.
-    # If Paths is tried to be imported
     if paths is None:
         paths = Paths()
 
-    lg_img_path = paths.lg_thumb_path / webp_path
-    sm_img_path = paths.sm_thumb_path / webp_path
-    xms_img_path = paths.xsm_thumb_path / webp_path
-    md_img_path = paths.md_thumb_path / webp_path
-    og_img_path = paths.og_thumb_path / webp_path
-
     images = [
-        (lg_img_path, Defaults.LG_THUMB_SIZE),
-        (sm_img_path, Defaults.SM_THUMB_SIZE),
-        (xms_img_path, Defaults.XSM_THUMB_SIZE),
-        (md_img_path, Defaults.MD_THUMB_SIZE),
-        (og_img_path, Defaults.OG_THUMB_SIZE),
+        (paths.lg_thumb_path / webp_path, Defaults.LG_THUMB_SIZE),
+        (paths.sm_thumb_path / webp_path, Defaults.SM_THUMB_SIZE),
+        (paths.xsm_thumb_path / webp_path, Defaults.XSM_THUMB_SIZE),
+        (paths.md_thumb_path / webp_path, Defaults.MD_THUMB_SIZE),
+        (paths.og_thumb_path / webp_path, Defaults.OG_THUMB_SIZE),
     ]
 
     def save_image(img: Image.Image):
@@ -64,38 +66,60 @@ def extract_thumb(
         ratio = width / height
 
         for path, size in images:
+            # INFO: Write to a temporary file first, as tracks from the same
+            # album can be processed by multiple workers at the same time.
+            temp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+
             # prevent resizing if the image is already smaller than $size
             if width <= size:
-                img.save(path, "webp")
+                img.save(temp_path, "webp")
             else:
-                img.resize((size, int(size / ratio)), Image.LANCZOS).save(path, "webp")
-
-        del img
+                img.resize((size, int(size / ratio)), Image.LANCZOS).save(
+                    temp_path, "webp"
+                )
 
-    if not overwrite and (og_img_path.exists() and sm_img_path.exists()):
-        img_size = os.path.getsize(og_img_path)
+            os.replace(temp_path, path)
 
-        if img_size > 0:
-            return True
+        del img
 
-    album_art = parse_album_art(filepath)
+    try:
+        img = Image.open(BytesIO(album_art))
+    except (UnidentifiedImageError, OSError):
+        return False
 
-    if album_art is not None:
+    try:
+        save_image(img)
+    except OSError:
         try:
-            img = Image.open(BytesIO(album_art))
-        except (UnidentifiedImageError, OSError):
+            png = img.convert("RGB")
+            save_image(png)
+        except:  # pylint: disable=bare-except  # noqa: E722
             return False
 
-        try:
-            save_image(img)
-        except OSError:
-            try:
-                png = img.convert("RGB")
-                save_image(png)
-            except:  # pylint: disable=bare-except  # noqa: E722
-                return False
+    return True
+
+
+def extract_thumb(
+    filepath: str, webp_path: str, overwrite=False, paths: Paths = None
+) -> bool:
+    """
+    Extracts the thumbnail from an audio file.
+    Returns the path to the thumbnail.
+    """
+    # this function will be run multithreaded.
+    # Modules are not cached in concurrent runs.
+    # If Paths is tried to be imported
+    if paths is None:
+        paths = Paths()
 
+    if not overwrite and thumb_exists(webp_path, paths):
         return True
+
+    album_art = parse_album_art(filepath)
+
+    if album_art is not None:
+        return save_thumb(album_art, webp_path, paths)
+
     return False
 
 
@@ -177,7 +201,6 @@ def get_tags(filepath: str, config: UserConfig) -> dict:
     """
 
     filepath = pathlib.Path(filepath)
-    filename = filepath.stem
 
     if not filepath.exists():
         raise FileNotFoundError(filepath)
@@ -185,6 +208,49 @@ def get_tags(filepath: str, config: UserConfig) -> dict:
     last_mod = round(filepath.stat().st_mtime)
     tags = TinyTag.get(filepath)
 
+    return parse_tags(tags, filepath, last_mod, config)
+
+
+def get_tags_and_art(
+    filepath: str, config: UserConfig, needs_art: Callable[[dict], bool]
+) -> tuple[dict, bytes | None]:
+    """
+    Parses tags and the embedded album art from an audio file,
+    opening it only once.
+
+    The album art is only read when `needs_art` returns True
+    for the parsed tags. eg. when the album has no thumbnail yet.
+
+    :return: A tuple of the metadata dict and the album art bytes, if any.
+    :raise FileNotFoundError: If filepath is invalid
+    """
+    filepath = pathlib.Path(filepath)
+
+    with open(filepath, "rb") as file:
+        last_mod = round(os.fstat(file.fileno()).st_mtime)
+        tags = TinyTag.get(filepath, file_obj=file)
+        metadata = parse_tags(tags, filepath, last_mod, config)
+
+        if not needs_art(metadata):
+            return metadata, None
+
+        # INFO: The tag header is already in the page cache from the first read
+        file.seek(0)
+        image = TinyTag.get(
+            filepath, file_obj=file, duration=False, image=True
+        ).images.any
+
+    return metadata, image.data if image else None
+
+
+def parse_tags(
+    tags: TinyTag, filepath: pathlib.Path, last_mod: int, config: UserConfig
+) -> dict:
+    """
+    Builds the metadata dict for a track from its parsed tags.
+    """
+    filename = filepath.stem
+
     if hasattr(tags, "other"):
         other = tags.other
     else:
@@ -5,15 +5,18 @@ This library contains all the functions related to tracks.
 import os
 import pathlib
 
-from swingmusic.lib.pydub.pydub import AudioSegment
-from swingmusic.lib.pydub.pydub.silence import detect_leading_silence, detect_silence
 from swingmusic.utils.threading import ProcessWithReturnValue
 
+# INFO: pydub is imported on first use, as silence detection is rarely used.
+
 
 def get_leading_silence_end(filepath: pathlib.Path):
     """
     Returns the leading silence of a track.
     """
+    from swingmusic.lib.pydub.pydub import AudioSegment
+    from swingmusic.lib.pydub.pydub.silence import detect_leading_silence
+
     format = filepath.suffix.replace(".", "")
     try:
         audio = AudioSegment.from_file(filepath, format=format)
@@ -28,6 +31,9 @@ def get_trailing_silence_start(filepath: str):
     """
     Returns the trailing silence of a track.
     """
+    from swingmusic.lib.pydub.pydub import AudioSegment
+    from swingmusic.lib.pydub.pydub.silence import detect_silence
+
     format = filepath.suffix.replace(".", "")
 
     try:
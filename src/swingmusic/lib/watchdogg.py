@@ -14,14 +14,13 @@ from swingmusic import settings
 from swingmusic.config import UserConfig
 from swingmusic.db.libdata import TrackTable
 from swingmusic.db.userdata import LibDataTable
-from swingmusic.lib.albumslib import create_albums
 from swingmusic.lib.colorlib import process_color
-from swingmusic.lib.tagger import create_artists
-from swingmusic.lib.taglib import extract_thumb, get_tags
+from swingmusic.lib.filemoves import IndexedFile, uses_filename
+from swingmusic.lib.storeupdater import apply_moves, apply_track_changes
+from swingmusic.lib.taglib import get_tags_and_art, save_thumb
 from swingmusic.logger import log
-from swingmusic.models import Artist, Track
+from swingmusic.models import Track
 from swingmusic.store.albums import AlbumStore
-from swingmusic.store.artists import ArtistMapEntry, ArtistStore
 from swingmusic.store.tracks import TrackStore
 
 
@@ -132,7 +131,7 @@ class Watcher:
 def handle_color(albumhash: str):
     entry = LibDataTable.find_one(albumhash, "album")
 
-    if entry and entry.color:
+    if entry and entry["color"]:
         return
 
     colors = process_color(albumhash, is_album=True)
@@ -154,74 +153,62 @@ def add_track(filepath: str) -> None:
     """
     Processes the audio tags for a given file ands add them to the database and store.
 
-    Then creates the folder, album and artist objects for the added track and adds them to the store.
+    Then rebuilds the album and artists of the added track in the store.
     """
-
-    TrackStore.remove_track_by_filepath(filepath)
-
     config = UserConfig()
-    tags = get_tags(filepath, config)
+    tags, album_art = get_tags_and_art(filepath, config, needs_art=lambda _: True)
 
     # if the track is somehow invalid, return
     if tags is None or tags["bitrate"] == 0 or tags["duration"] == 0:
         return
 
+    TrackTable.remove_tracks_by_filepaths({filepath})
     TrackTable.insert_one(tags)
-    extract_thumb(filepath, tags["albumhash"] + ".webp", overwrite=True)
-
-    colors = handle_color(tags["albumhash"])
-    track = Track(**tags)
-    TrackStore.add_track(track)
-
-    # SECTION: Index album
-    albumentry = AlbumStore.albummap.get(track.albumhash)
 
-    if albumentry is None:
-        album, trackhashes = create_albums([track.trackhash])[0]
-        AlbumStore.index_new_album(album, trackhashes)
-    else:
-        trackhash_exists = track.trackhash in albumentry.trackhashes
+    if album_art is not None:
+        save_thumb(album_art, tags["albumhash"] + ".webp")
 
-        if not trackhash_exists:
-            albumentry.trackhashes.add(track.trackhash)
-            albumentry.album.trackcount += 1
-            albumentry.update_color_info(colors[0]) if colors else None
+    colors = handle_color(tags["albumhash"])
+    apply_track_changes([Track(**tags)])
 
-    # SECTION: Index artist
-    artists = create_artists(track.artisthashes)
+    albumentry = AlbumStore.albummap.get(tags["albumhash"])
 
-    for artist in artists:
-        ArtistStore.artistmap[artist[0].artisthash] = ArtistMapEntry(
-            artist=artist[0],
-            albumhashes=artist[1],
-            trackhashes=artist[2],
-        )
+    if albumentry is not None and colors:
+        albumentry.update_color_info(colors[0])
 
 
 def remove_track(filepath: str) -> None:
     """
-    Removes a track from the music dict.
+    Removes a track from the database and store.
     """
-    try:
-        track = TrackStore.get_tracks_by_filepaths([filepath])[0]
-    except IndexError:
+    if not TrackStore.get_tracks_by_filepaths([filepath]):
         return
 
-    db.remove_tracks_by_filepaths(filepath)
-    TrackStore.remove_track_by_filepath(filepath)
+    TrackTable.remove_tracks_by_filepaths({filepath})
+    apply_track_changes([], removed={filepath})
+
 
-    empty_album = TrackStore.count_tracks_by_trackhash(track.albumhash) > 0
+def move_track(src_path: str, dest_path: str) -> None:
+    """
+    Moves an indexed track to its new path in the database and store,
+    without reading its tags again.
+    """
+    info = list(TrackTable.get_move_info([src_path]))
 
-    if empty_album:
-        AlbumStore.remove_album_by_hash(track.albumhash)
+    if not info:
+        return add_track(dest_path)
 
-    artists: list[Artist] = track.artists + track.albumartists  # type: ignore
+    file = IndexedFile(*info[0])
+    renamed = os.path.basename(src_path) != os.path.basename(dest_path)
 
-    for artist in artists:
-        empty_artist = not ArtistStore.artist_has_tracks(artist.artisthash)
+    # INFO: The title or album came from the old filename, so tag it again
+    if renamed and uses_filename(file, UserConfig()):
+        remove_track(src_path)
+        return add_track(dest_path)
 
-        if empty_artist:
-            ArtistStore.remove_artist_by_hash(artist.artisthash)
+    moves = {src_path: dest_path}
+    TrackTable.move_tracks(moves)
+    apply_moves(moves)
 
 
 class Handler(PatternMatchingEventHandler):
@@ -290,8 +277,7 @@ class Handler(PatternMatchingEventHandler):
             dest_path = self.get_abs_path(event.dest_path)
             src_path = self.get_abs_path(event.src_path)
 
-            add_track(dest_path)
-            remove_track(src_path)
+            move_track(src_path, dest_path)
 
     def on_closed(self, event):
         """
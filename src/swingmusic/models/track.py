@@ -1,16 +1,61 @@
+import hashlib
+import json
+import sys
 from dataclasses import asdict, dataclass, field
+from functools import lru_cache
+from typing import Any
 
 from swingmusic.config import UserConfig
 from swingmusic.utils.auth import get_current_userid
 from swingmusic.utils.hashing import create_hash
+from swingmusic.utils.interning import InternRegistry
 from swingmusic.utils.parsers import (
     clean_title,
     get_base_title_and_versions,
     parse_feat_from_title,
     remove_prod,
-    split_artists,
 )
 
+DERIVED_VERSION = 1
+"""
+Bump when `Track.__post_init__` changes, so that derived values
+saved by older versions are derived again.
+"""
+
+DERIVED_CONFIG_KEYS = (
+    "artistSeparators",
+    "artistSplitIgnoreList",
+    "genreSeparators",
+    "extractFeaturedArtists",
+    "removeProdBy",
+    "removeRemasterInfo",
+    "mergeAlbums",
+    "cleanAlbumTitle",
+)
+"""
+The settings read by `Track.__post_init__`.
+"""
+
+
+def get_derived_fingerprint(config: UserConfig) -> str:
+    """
+    Returns a fingerprint of the settings that derived track values depend on.
+    """
+    values: dict[str, Any] = {"version": DERIVED_VERSION}
+
+    for key in DERIVED_CONFIG_KEYS:
+        value = getattr(config, key)
+        values[key] = sorted(value) if isinstance(value, (set, list)) else value
+
+    data = json.dumps(values, sort_keys=True)
+    return hashlib.sha1(data.encode()).hexdigest()
+
+
+@lru_cache(maxsize=4096)
+def get_pathhash(folder: str):
+    # INFO: Cached, as folders repeat across all tracks in a folder
+    return create_hash(folder)
+
 
 @dataclass(slots=True)
 class Track:
@@ -64,6 +109,75 @@ class Track:
     def pathhash(self):
         return create_hash(self.folder)
 
+    @classmethod
+    def from_derived(cls, row: dict[str, Any], derived: dict[str, Any]) -> "Track":
+        """
+        Creates a track from a database row and the values saved from a
+        previous `get_derived` call, without running `__post_init__`.
+        """
+        track = cls.__new__(cls)
+
+        for name, value in row.items():
+            setattr(track, name, value)
+
+        track.og_title = row["title"]
+        track.og_album = row["album"]
+        track.folder = sys.intern(row["folder"] + "/")
+
+        track.title = derived["title"]
+        track.album = sys.intern(derived["album"])
+        track.albumhash = sys.intern(derived["albumhash"])
+        track.trackhash = derived["trackhash"]
+        track.weakhash = derived["weakhash"]
+        track.explicit = derived["explicit"]
+
+        track.artists = [InternRegistry.artist(name) for name in derived["artists"]]
+        track.albumartists = [
+            InternRegistry.artist(name) for name in derived["albumartists"]
+        ]
+        track.artisthashes = derived["artisthashes"]
+
+        if derived["genres"] is None:
+            track.genrehashes = []
+        else:
+            track.genres = [InternRegistry.genre(name) for name in derived["genres"]]
+            track.genrehashes = [g["genrehash"] for g in track.genres]
+
+        track.image = sys.intern(
+            track.albumhash + ".webp" + "?pathhash=" + get_pathhash(track.folder)
+        )
+
+        track.color = ""
+        track.blurhash = ""
+        track._pos = 0
+        track._ati = ""
+        track._score = 0
+        track.fav_userids = []
+        track.config = None
+
+        return track
+
+    def get_derived(self) -> dict[str, Any]:
+        """
+        Returns the values computed by `__post_init__` that are not in the
+        database row, for `from_derived`. Artist and genre records are
+        saved by name, as their hashes are computed from the name.
+        """
+        genres = self.genres if isinstance(self.genres, list) else None
+
+        return {
+            "title": self.title,
+            "album": self.album,
+            "albumhash": self.albumhash,
+            "trackhash": self.trackhash,
+            "weakhash": self.weakhash,
+            "explicit": self.explicit,
+            "artists": [a["name"] for a in self.artists],
+            "albumartists": [a["name"] for a in self.albumartists],
+            "artisthashes": self.artisthashes,
+            "genres": [g["name"] for g in genres] if genres is not None else None,
+        }
+
     def toggle_favorite_user(self, userid: int):
         """
         Toggles the favorite status of the track for a given user.
@@ -84,7 +198,8 @@ class Track:
         """
         self.og_title = self.title
         self.og_album = self.album
-        self.folder = self.folder + "/"
+        # INFO: Folder paths repeat across all tracks in a folder
+        self.folder = sys.intern(self.folder + "/")
         self.weakhash = create_hash(self.title, self.artists)
 
         explicit_tag = self.extra.get("explicit", ["0"])
@@ -96,7 +211,9 @@ class Track:
         else:
             self.explicit = bool(explicit_tag)
 
-        self.image = self.albumhash + ".webp" + "?pathhash=" + self.pathhash
+        self.image = sys.intern(
+            self.albumhash + ".webp" + "?pathhash=" + self.pathhash
+        )
         # self.extra = {
         #     "disc_total": self.extra.get("disc_total", 0),
         #     "track_total": self.extra.get("track_total", 0),
@@ -124,6 +241,9 @@ class Track:
             and not seen_albumartists.add(tuple(d.items()))
         ]
 
+        self.album = sys.intern(self.album)
+        self.albumhash = sys.intern(self.albumhash)
+
         self.recreate_trackhash()
         self.config = None
 
@@ -133,14 +253,10 @@ class Track:
         and updates the artisthashes.
         """
 
-        def split(artists: str):
-            return [
-                {"name": a, "artisthash": create_hash(a, decode=True)}
-                for a in split_artists(artists, config=self.config)
-            ]
-
-        self.artists = split(self.artists)
-        self.albumartists = split(self.albumartists)
+        self.artists = InternRegistry.split_artists(self.artists, self.config)
+        self.albumartists = InternRegistry.split_artists(
+            self.albumartists, self.config
+        )
         self.artisthashes = [a["artisthash"] for a in self.artists]
 
     def map_with_config(self):
@@ -153,9 +269,7 @@ class Track:
         # Extract featured artists
         if self.config.extractFeaturedArtists:
             feat, new_title = parse_feat_from_title(self.title, self.config)
-            feat = [
-                {"name": f, "artisthash": create_hash(f, decode=True)} for f in feat
-            ]
+            feat = [InternRegistry.artist(f) for f in feat]
             feat = [f for f in feat if f["artisthash"] not in self.artisthashes]
             self.artists.extend(feat)
             self.artisthashes.extend([f["artisthash"] for f in feat])
@@ -212,10 +326,7 @@ class Track:
                 src_genres = src_genres.replace(s, ",")
 
             genres_list: list[str] = src_genres.split(",")
-            self.genres = [
-                {"name": g.strip(), "genrehash": create_hash(g.strip())}
-                for g in genres_list
-            ]
+            self.genres = [InternRegistry.genre(g.strip()) for g in genres_list]
             self.genrehashes = [g["genrehash"] for g in self.genres]
 
     def recreate_trackhash(self):
@@ -528,6 +528,18 @@ class Paths(metaclass=Singleton):
     def config_file_path(self) -> pathlib.Path:
         return self.config_dir / "settings.json"
 
+    @property
+    def scan_manifest_path(self) -> pathlib.Path:
+        return self.config_dir / "scan_manifest.json"
+
+    @property
+    def scan_session_path(self) -> pathlib.Path:
+        return self.config_dir / "scan_session.json"
+
+    @property
+    def store_snapshot_path(self) -> pathlib.Path:
+        return self.config_dir / "store_snapshot.pickle"
+
     @property
     def mixes_img_path(self) -> pathlib.Path:
         return self.img_path / "mixes"
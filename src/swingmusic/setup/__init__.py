@@ -15,13 +15,14 @@ from swingmusic.lib.mapstuff import (
     map_favorites,
     map_scrobble_data,
 )
+from swingmusic.lib.storeupdater import load_albums_and_artists
 from swingmusic.setup.sqlite import setup_sqlite
-from swingmusic.store.albums import AlbumStore
-from swingmusic.store.artists import ArtistStore
 from swingmusic.store.folder import FolderStore
 from swingmusic.store.general import GeneralStore
+from swingmusic.store.snapshot import StoreSnapshot
 from swingmusic.store.tracks import TrackStore
 from swingmusic.utils.generators import get_random_str
+from swingmusic.utils.profiler import StartupProfiler
 
 
 def _validate_license():
@@ -88,9 +89,12 @@ def run_setup():
         config.serverId = crypto.public_key
         config.write_to_file(asdict(config))
 
-    setup_sqlite()
+    with StartupProfiler.phase("migrations"):
+        setup_sqlite()
+
     # Validate license on startup
-    _validate_license()
+    with StartupProfiler.phase("license"):
+        _validate_license()
 
 
 def load_into_mem():
@@ -100,12 +104,25 @@ def load_into_mem():
     # INFO: Load all tracks, albums, and artists data into memory
     key = str(time())
     GeneralStore.load_onboarding_data(list(UserTable.get_all()))
-    TrackStore.load_all_tracks(get_random_str())
-    AlbumStore.load_albums(key)
-    ArtistStore.load_artists(key)
-    FolderStore.load_filepaths()
-
-    map_scrobble_data()
-    map_favorites()
-    map_artist_colors()
-    map_album_colors()
+
+    with StartupProfiler.phase("snapshot"):
+        loaded = StoreSnapshot.load()
+
+    if not loaded:
+        with StartupProfiler.phase("tracks"):
+            TrackStore.load_all_tracks(get_random_str())
+
+        with StartupProfiler.phase("albums and artists"):
+            load_albums_and_artists(key)
+
+        FolderStore.load_filepaths()
+
+        # INFO: Saved before the user data is mapped onto the stores
+        with StartupProfiler.phase("save snapshot"):
+            StoreSnapshot.save()
+
+    with StartupProfiler.phase("user data"):
+        map_scrobble_data()
+        map_favorites()
+        map_artist_colors()
+        map_album_colors()
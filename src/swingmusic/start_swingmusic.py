@@ -4,6 +4,7 @@ import mimetypes
 import setproctitle
 
 from swingmusic.start_info_logger import log_startup_info
+from swingmusic.utils.profiler import StartupProfiler
 
 
 def config_mimetypes():
@@ -61,17 +62,24 @@ def wsgi_loader(target: str):
     :return: The WSGI application callable
     """
     import os
-    from swingmusic import app_builder, settings
-    from swingmusic.crons import start_cron_jobs
-    from swingmusic.logger import setup_logger
-    from swingmusic.plugins.register import register_plugins
-    from swingmusic.setup import load_into_mem, run_setup
+
+    # INFO: Started before the imports below, so that they are timed
+    StartupProfiler.start()
+
+    with StartupProfiler.phase("imports"):
+        from swingmusic import app_builder, settings
+        from swingmusic.crons import start_cron_jobs
+        from swingmusic.lib.index import resume_scan
+        from swingmusic.logger import setup_logger
+        from swingmusic.plugins.register import register_plugins
+        from swingmusic.setup import load_into_mem, run_setup
 
     # Configure mimetypes for static file serving
     config_mimetypes()
 
     # Setup config files and database
-    run_setup()
+    with StartupProfiler.phase("run_setup"):
+        run_setup()
 
     setup_logger(
         app_dir=settings.Paths().config_dir,
@@ -79,20 +87,28 @@ def wsgi_loader(target: str):
     )
 
     # Build the Flask/OpenAPI application
-    app = app_builder.build()
+    with StartupProfiler.phase("app_builder.build"):
+        app = app_builder.build()
 
     # Load all data into memory stores
-    load_into_mem()
+    with StartupProfiler.phase("load_into_mem"):
+        load_into_mem()
 
     # Get host:port from environment for process title
     proc_title = os.environ.get("SWINGMUSIC_PROC_TITLE", "swingmusic")
 
     # Start background tasks in a daemon thread
     def background_tasks():
-        register_plugins()
+        with StartupProfiler.phase("register_plugins"):
+            register_plugins()
+
         setproctitle.setproctitle(proc_title)
         start_cron_jobs()
 
+        # INFO: The cron jobs run their first pass in their own thread
+        StartupProfiler.stop(wait_for=("start_cron_jobs",))
+        resume_scan()
+
     background_thread = threading.Thread(target=background_tasks, daemon=True)
     background_thread.start()
 
@@ -3,6 +3,8 @@ from typing import Iterable
 from swingmusic.lib.albumslib import create_albums
 from swingmusic.models import Album, Track
 from swingmusic.store.artists import ArtistStore
+from swingmusic.store.searchcorpus import SearchCorpus
+from swingmusic.store.sortorders import SortOrders
 from swingmusic.store.tracks import TrackStore
 from swingmusic.utils.auth import get_current_userid
 
@@ -22,6 +24,7 @@ class AlbumMapEntry:
         self.album.lastplayed = timestamp
         self.album.playduration += duration
         self.album.playcount += playcount
+        AlbumStore.stats_version += 1
 
     def toggle_favorite_user(self, userid: int | None = None):
         if userid is None:
@@ -37,10 +40,37 @@ class AlbumMapEntry:
 class AlbumStore:
     albummap: dict[str, AlbumMapEntry] = {}
 
+    # INFO: Incremented whenever albums are added or removed.
+    # Invalidates the flat list snapshot and can be used as a cache key.
+    version: int = 0
+    _flat_list: tuple[Album, ...] | None = None
+
+    # INFO: Incremented whenever play data changes.
+    # Invalidates the cached sort orders on play data.
+    stats_version: int = 0
+
+    # INFO: Cached sort orders for paginating all albums
+    sortorders = SortOrders(key=lambda a: a.albumhash, article_keys={"albumartists"})
+
+    # INFO: Pre-normalized album titles for the fuzzy search
+    corpus = SearchCorpus(key=lambda a: a.albumhash, text=lambda a: a.title)
+
+    @classmethod
+    def invalidate(cls):
+        """
+        Bumps the store version and drops the cached flat list.
+        """
+        cls.version += 1
+        cls._flat_list = None
+
     @classmethod
-    def load_albums(cls, instance_key: str):
+    def load_albums(
+        cls, instance_key: str, albums: list[tuple[Album, set[str]]] | None = None
+    ):
         """
         Loads all albums from the database into the store.
+
+        Pass `albums` if they were already built, eg. by `aggregate_library`.
         """
         global ALBUM_LOAD_KEY
         ALBUM_LOAD_KEY = instance_key
@@ -49,22 +79,106 @@ class AlbumStore:
 
         cls.albummap = {
             album.albumhash: AlbumMapEntry(album=album, trackhashes=trackhashes)
-            for album, trackhashes in create_albums()
+            for album, trackhashes in (create_albums() if albums is None else albums)
         }
+        cls.corpus.load(entry.album for entry in cls.albummap.values())
+        cls.sortorders.clear()
+        cls.invalidate()
         print("Done!")
 
+    @classmethod
+    def dump_state(cls) -> dict:
+        """
+        Returns the store contents, for a snapshot.
+        """
+        return {"albummap": cls.albummap, "corpus": cls.corpus.dump_state()}
+
+    @classmethod
+    def load_state(cls, state: dict):
+        """
+        Replaces the store contents with a state from `dump_state`.
+        """
+        cls.albummap = state["albummap"]
+        cls.corpus.load_state(state["corpus"])
+        cls.sortorders.clear()
+        cls.invalidate()
+
     @classmethod
     def index_new_album(cls, album: Album, trackhashes: set[str]):
         cls.albummap[album.albumhash] = AlbumMapEntry(
             album=album, trackhashes=trackhashes
         )
+        cls.corpus.add(album)
+        cls.invalidate()
+
+    @classmethod
+    def update_albums(
+        cls, albums: Iterable[tuple[Album, set[str]]], removed: Iterable[str] = ()
+    ):
+        """
+        Replaces or adds the given albums, and removes albums by hash.
+
+        Colors and favorites are kept from the replaced albums, as they
+        only depend on the albumhash. Play data depends on the tracks,
+        so it is reset for `map_scrobble_delta` to fill in.
+        """
+        for album, trackhashes in albums:
+            entry = cls.albummap.get(album.albumhash)
+
+            album.playcount = 0
+            album.playduration = 0
+            album.lastplayed = 0
+
+            if entry is not None:
+                old = entry.album
+                album.color = old.color
+                album.blurhash = old.blurhash
+                album.fav_userids = old.fav_userids
+
+            cls.albummap[album.albumhash] = AlbumMapEntry(
+                album=album, trackhashes=trackhashes
+            )
+            cls.corpus.add(album)
+
+        for albumhash in removed:
+            entry = cls.albummap.pop(albumhash, None)
+
+            if entry is not None:
+                cls.corpus.remove(entry.album)
+
+        cls.invalidate()
 
     @classmethod
-    def get_flat_list(cls):
+    def get_flat_list(cls) -> tuple[Album, ...]:
         """
         Returns a flat list of all albums.
+
+        The list is built once per store version and shared between callers,
+        so it is returned as an immutable tuple.
+        """
+        snapshot = cls._flat_list
+
+        if snapshot is None:
+            version = cls.version
+            snapshot = tuple(a.album for a in cls.albummap.values())
+
+            # INFO: Only cache if the store did not change while building
+            if version == cls.version:
+                cls._flat_list = snapshot
+
+        return snapshot
+
+    @classmethod
+    def get_sorted(cls, sortkey: str, reverse: bool = False) -> tuple[Album, ...]:
         """
-        return [a.album for a in cls.albummap.values()]
+        Returns all albums sorted by the given key.
+
+        The order is cached until the albums or their play data change.
+        """
+        version, stats_version = cls.version, cls.stats_version
+        return cls.sortorders.get(
+            cls.get_flat_list(), sortkey, reverse, version, stats_version
+        )
 
     @classmethod
     def get_album_by_hash(cls, albumhash: str) -> Album | None:
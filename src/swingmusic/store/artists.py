@@ -3,6 +3,8 @@ from typing import Iterable
 
 from swingmusic.lib.tagger import create_artists
 from swingmusic.models import Artist
+from swingmusic.store.searchcorpus import SearchCorpus
+from swingmusic.store.sortorders import SortOrders
 from swingmusic.store.tracks import TrackStore
 from swingmusic.utils.auth import get_current_userid
 
@@ -21,6 +23,7 @@ class ArtistMapEntry:
         self.artist.lastplayed = timestamp
         self.artist.playduration += duration
         self.artist.playcount += playcount
+        ArtistStore.stats_version += 1
 
     def toggle_favorite_user(self, userid: int | None = None):
         if userid is None:
@@ -36,10 +39,40 @@ class ArtistMapEntry:
 class ArtistStore:
     artistmap: dict[str, ArtistMapEntry] = {}
 
+    # INFO: Incremented whenever artists are added or removed.
+    # Invalidates the flat list snapshot and can be used as a cache key.
+    version: int = 0
+    _flat_list: tuple[Artist, ...] | None = None
+
+    # INFO: Incremented whenever play data changes.
+    # Invalidates the cached sort orders on play data.
+    stats_version: int = 0
+
+    # INFO: Cached sort orders for paginating all artists
+    sortorders = SortOrders(key=lambda a: a.artisthash, article_keys={"name"})
+
+    # INFO: Pre-normalized artist names for the fuzzy search
+    corpus = SearchCorpus(key=lambda a: a.artisthash, text=lambda a: a.name)
+
     @classmethod
-    def load_artists(cls, instance_key: str, _trackhashes: list[str] = []):
+    def invalidate(cls):
+        """
+        Bumps the store version and drops the cached flat list.
+        """
+        cls.version += 1
+        cls._flat_list = None
+
+    @classmethod
+    def load_artists(
+        cls,
+        instance_key: str,
+        _trackhashes: list[str] = [],
+        artists: list[tuple[Artist, set[str], set[str]]] | None = None,
+    ):
         """
         Loads all artists from the database into the store.
+
+        Pass `artists` if they were already built, eg. by `aggregate_library`.
         """
         global ARTIST_LOAD_KEY
         ARTIST_LOAD_KEY = instance_key
@@ -47,12 +80,18 @@ class ArtistStore:
         print("Loading artists... ", end="")
         cls.artistmap.clear()
 
+        if artists is None:
+            artists = create_artists(_trackhashes)
+
         cls.artistmap = {
             artist.artisthash: ArtistMapEntry(
                 artist=artist, albumhashes=albumhashes, trackhashes=trackhashes
             )
-            for artist, trackhashes, albumhashes in create_artists(_trackhashes)
+            for artist, trackhashes, albumhashes in artists
         }
+        cls.corpus.load(entry.artist for entry in cls.artistmap.values())
+        cls.sortorders.clear()
+        cls.invalidate()
 
         # for track in TrackStore.get_flat_list():
         #     if instance_key != ARTIST_LOAD_KEY:
@@ -70,11 +109,102 @@ class ArtistStore:
         #     cls.map_artist_color(artist)
 
     @classmethod
-    def get_flat_list(cls):
+    def dump_state(cls) -> dict:
+        """
+        Returns the store contents, for a snapshot.
+        """
+        return {"artistmap": cls.artistmap, "corpus": cls.corpus.dump_state()}
+
+    @classmethod
+    def load_state(cls, state: dict):
+        """
+        Replaces the store contents with a state from `dump_state`.
+        """
+        cls.artistmap = state["artistmap"]
+        cls.corpus.load_state(state["corpus"])
+        cls.sortorders.clear()
+        cls.invalidate()
+
+    @classmethod
+    def index_new_artist(
+        cls, artist: Artist, albumhashes: set[str], trackhashes: set[str]
+    ):
+        cls.artistmap[artist.artisthash] = ArtistMapEntry(
+            artist=artist, albumhashes=albumhashes, trackhashes=trackhashes
+        )
+        cls.corpus.add(artist)
+        cls.invalidate()
+
+    @classmethod
+    def update_artists(
+        cls,
+        artists: Iterable[tuple[Artist, set[str], set[str]]],
+        removed: Iterable[str] = (),
+    ):
+        """
+        Replaces or adds the given artists, and removes artists by hash.
+
+        Colors and favorites are kept from the replaced artists, as they
+        only depend on the artisthash. Play data depends on the tracks,
+        so it is reset for `map_scrobble_delta` to fill in.
+        """
+        for artist, trackhashes, albumhashes in artists:
+            entry = cls.artistmap.get(artist.artisthash)
+
+            artist.playcount = 0
+            artist.playduration = 0
+            artist.lastplayed = 0
+
+            if entry is not None:
+                old = entry.artist
+                artist.color = old.color
+                artist.blurhash = old.blurhash
+                artist.fav_userids = old.fav_userids
+
+            cls.artistmap[artist.artisthash] = ArtistMapEntry(
+                artist=artist, albumhashes=albumhashes, trackhashes=trackhashes
+            )
+            cls.corpus.add(artist)
+
+        for artisthash in removed:
+            entry = cls.artistmap.pop(artisthash, None)
+
+            if entry is not None:
+                cls.corpus.remove(entry.artist)
+
+        cls.invalidate()
+
+    @classmethod
+    def get_flat_list(cls) -> tuple[Artist, ...]:
         """
         Returns a flat list of all artists.
+
+        The list is built once per store version and shared between callers,
+        so it is returned as an immutable tuple.
+        """
+        snapshot = cls._flat_list
+
+        if snapshot is None:
+            version = cls.version
+            snapshot = tuple(a.artist for a in cls.artistmap.values())
+
+            # INFO: Only cache if the store did not change while building
+            if version == cls.version:
+                cls._flat_list = snapshot
+
+        return snapshot
+
+    @classmethod
+    def get_sorted(cls, sortkey: str, reverse: bool = False) -> tuple[Artist, ...]:
+        """
+        Returns all artists sorted by the given key.
+
+        The order is cached until the artists or their play data change.
         """
-        return [a.artist for a in cls.artistmap.values()]
+        version, stats_version = cls.version, cls.stats_version
+        return cls.sortorders.get(
+            cls.get_flat_list(), sortkey, reverse, version, stats_version
+        )
 
     # @classmethod
     # def map_artist_color(cls, artist_tuple: tuple):
@@ -3,7 +3,6 @@ import pathlib
 from sortedcontainers import SortedSet
 from concurrent.futures import ThreadPoolExecutor
 
-from swingmusic.db.libdata import TrackTable
 from swingmusic.store.tracks import TrackStore
 
 
@@ -18,45 +17,29 @@ class FolderStore:
     """
 
     filepaths: SortedSet = SortedSet()
-    map: dict[str, str] = {}
-    """
-    The map above is a dictionary that maps the folder path to the track hash, which can be used to fetch the track from the track store (a dict of track hashes to track objects).
-    """
-
 
     @classmethod
     def load_filepaths(cls):
         """
-        Load all the filepaths from the database into memory.
+        Load all the filepaths of the indexed tracks into memory.
 
         This is needed to speed up the process of counting the number of tracks in the folder page.
+        The filepaths are read from the TrackStore filepath map, so the track store
+        needs to be loaded first.
         """
-        cls.filepaths.clear()
-
-        tracks = TrackTable.get_all()
-        for track in tracks:
-            cls.filepaths.add(track.filepath)
-            cls.map[track.filepath] = track.trackhash
-
+        cls.filepaths = SortedSet(TrackStore.filepathmap.keys())
 
     @classmethod
     def get_tracks_by_filepaths(cls, filepaths: list[str]):
         """
-        Generator which tries to match TrackStore with track hash
+        Generator which matches the given filepaths against the TrackStore filepath map.
         """
         for filepath in filepaths:
             filepath = pathlib.Path(filepath).as_posix()
+            track = TrackStore.filepathmap.get(filepath)
 
-            if filepath in cls.map:
-                trackhash = cls.map[filepath]
-                trackgroup = TrackStore.trackhashmap.get(trackhash)
-
-                if trackgroup is None:
-                    continue
-
-                for track in trackgroup.tracks:
-                    if track.filepath == filepath:
-                        yield track
+            if track is not None:
+                yield track
 
 
     @classmethod
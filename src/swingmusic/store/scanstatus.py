@@ -0,0 +1,210 @@
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Iterator
+
+from swingmusic.events import events
+from swingmusic.utils.workers import TaskGroup, WorkerPool
+
+
+@dataclass
+class StageStats:
+    """
+    Counters for one stage of a library scan.
+    """
+
+    name: str
+    total: int = 0
+    done: int = 0
+    failed: int = 0
+    bytes_read: int = 0
+    cpu_seconds: float = 0.0
+    """
+    CPU time used by the stage thread and the workers it submitted to.
+    """
+    started: float = 0.0
+    finished: float | None = None
+    queues: dict[str, int] = field(default_factory=dict)
+    """
+    The depth of the queues feeding this stage, as last sampled.
+    """
+    last_dispatch: float = 0.0
+    error: str | None = None
+    """
+    The last error the stage recovered from, if any.
+    """
+
+    @property
+    def wall_seconds(self):
+        return (self.finished or time.time()) - self.started
+
+    def to_dict(self) -> dict[str, Any]:
+        wall = self.wall_seconds
+
+        return {
+            "name": self.name,
+            "total": self.total,
+            "done": self.done,
+            "failed": self.failed,
+            "bytes_read": self.bytes_read,
+            "per_second": round(self.done / wall, 2) if wall > 0 else 0,
+            "bytes_per_second": round(self.bytes_read / wall) if wall > 0 else 0,
+            "wall_seconds": round(wall, 2),
+            "cpu_seconds": round(self.cpu_seconds, 2),
+            "queues": self.queues,
+            "running": self.finished is None,
+            "error": self.error,
+        }
+
+
+class ScanStatus:
+    """
+    Holds the progress of the stages of the current (or last) library scan.
+
+    Stage updates are sent as `scan_stage_progress` events, at most every
+    `dispatch_interval` seconds per stage, so that a fast stage does not
+    flood the clients.
+    """
+
+    started: float | None = None
+    finished: float | None = None
+    stages: dict[str, StageStats] = {}
+    dispatch_interval: float = 0.5
+    lock = threading.Lock()
+    cancelled = threading.Event()
+
+    @classmethod
+    def begin(cls):
+        with cls.lock:
+            cls.started = time.time()
+            cls.finished = None
+            cls.stages = {}
+            cls.cancelled.clear()
+
+        events.dispatch("scan_started", {"started": cls.started})
+
+    @classmethod
+    def end(cls):
+        with cls.lock:
+            cls.finished = time.time()
+
+        events.dispatch("scan_finished", cls.to_dict())
+
+    @classmethod
+    def is_running(cls):
+        return cls.started is not None and cls.finished is None
+
+    @classmethod
+    def cancel(cls) -> bool:
+        """
+        Asks the running scan to stop. Returns False if no scan is running.
+        """
+        if not cls.is_running():
+            return False
+
+        cls.cancelled.set()
+        events.dispatch("scan_cancelled", {"started": cls.started})
+        return True
+
+    @classmethod
+    @contextmanager
+    def stage(cls, name: str, total: int = 0):
+        """
+        Records a stage running in the current thread.
+
+        The CPU time of the thread while in the stage is added to the stage.
+        """
+        stats = StageStats(name=name, total=total, started=time.time())
+
+        with cls.lock:
+            cls.stages[name] = stats
+
+        cpu = time.thread_time()
+
+        try:
+            yield stats
+        finally:
+            with cls.lock:
+                stats.cpu_seconds += time.thread_time() - cpu
+                stats.finished = time.time()
+
+            cls.dispatch(stats, force=True)
+
+    @classmethod
+    def update(
+        cls,
+        stats: StageStats,
+        done: int = 0,
+        failed: int = 0,
+        bytes_read: int = 0,
+        cpu_seconds: float = 0.0,
+        total: int | None = None,
+        queues: dict[str, int] | None = None,
+    ):
+        """
+        Adds to the counters of a stage.
+        """
+        with cls.lock:
+            stats.done += done
+            stats.failed += failed
+            stats.bytes_read += bytes_read
+            stats.cpu_seconds += cpu_seconds
+
+            if total is not None:
+                stats.total = total
+
+            if queues is not None:
+                stats.queues = queues
+
+        cls.dispatch(stats)
+
+    @classmethod
+    def fail(cls, stats: StageStats, error: str, failed: int = 0):
+        """
+        Records an error the stage recovered from.
+
+        Does not dispatch, so that it can be called from error handlers.
+        The error is sent with the next update of the stage.
+        """
+        with cls.lock:
+            stats.failed += failed
+            stats.error = error
+
+    @classmethod
+    def follow(cls, stats: StageStats, tasks: TaskGroup) -> Iterator[Any]:
+        """
+        Yields the results of worker tasks, counting them towards a stage.
+        """
+        cls.update(stats, total=stats.total or len(tasks))
+
+        try:
+            for result in tasks:
+                depth = WorkerPool.queue_depth(tasks.queue.name)
+                cls.update(stats, done=1, queues={"workers": depth})
+                yield result
+        finally:
+            cls.update(stats, cpu_seconds=tasks.cpu_seconds)
+
+    @classmethod
+    def dispatch(cls, stats: StageStats, force: bool = False):
+        now = time.monotonic()
+
+        if not force and now - stats.last_dispatch < cls.dispatch_interval:
+            return
+
+        stats.last_dispatch = now
+        events.dispatch("scan_stage_progress", stats.to_dict())
+
+    @classmethod
+    def to_dict(cls) -> dict[str, Any]:
+        with cls.lock:
+            stages = [stats.to_dict() for stats in cls.stages.values()]
+
+        return {
+            "running": cls.is_running(),
+            "cancelled": cls.cancelled.is_set(),
+            "started": cls.started,
+            "finished": cls.finished,
+            "stages": stages,
+        }
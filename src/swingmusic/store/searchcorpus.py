@@ -0,0 +1,366 @@
+import heapq
+from collections import Counter
+from threading import Lock
+from typing import Any, Callable, Iterable, NamedTuple, Sequence
+
+import numpy as np
+from rapidfuzz import process, utils
+from unidecode import unidecode
+
+PARALLEL_SCORING_THRESHOLD = 10_000
+"""
+The minimum number of choices before scoring is spread over multiple workers.
+"""
+
+
+def normalize(text: str) -> str:
+    """
+    Normalizes a string for fuzzy matching.
+
+    Transliterates to ASCII, then lowercases and strips
+    non-alphanumeric characters using the rapidfuzz default processor.
+    """
+    return utils.default_process(unidecode(text))
+
+
+def trigrams(text: str) -> set[str]:
+    """
+    Returns the set of 3 character substrings of the given text.
+
+    The text is padded with spaces so that the start and end
+    of the string also produce trigrams.
+    """
+    text = f" {text} "
+    return {text[i : i + 3] for i in range(len(text) - 2)}
+
+
+class Match(NamedTuple):
+    """
+    A search result: the matched item, its normalized text and its score.
+    """
+
+    item: Any
+    choice: str
+    score: float
+
+
+def score_choices(
+    query: str,
+    choices: Sequence[str],
+    scorer: Callable,
+    score_cutoff: float,
+    limit: int | None,
+    workers: int = 1,
+) -> list[tuple[int, float]]:
+    """
+    Scores the query against pre-normalized choices.
+
+    Returns a list of `(index, score)` tuples sorted by score, then index.
+
+    When more than one worker is available, large choice lists are scored
+    with `process.cdist`, which spreads the work over multiple threads
+    outside the GIL. Otherwise, `process.extract` is used, which holds
+    the GIL while scoring.
+    """
+    if workers <= 1 or len(choices) < PARALLEL_SCORING_THRESHOLD:
+        results = process.extract(
+            query,
+            choices,
+            scorer=scorer,
+            score_cutoff=score_cutoff,
+            limit=limit,
+            processor=None,
+        )
+
+        return [(index, score) for _, score, index in results]
+
+    scores = process.cdist(
+        [query],
+        choices,
+        scorer=scorer,
+        processor=None,
+        score_cutoff=score_cutoff,
+        dtype=np.float64,
+        workers=workers,
+    )[0]
+
+    indices = np.flatnonzero(scores >= score_cutoff)
+
+    # INFO: Match process.extract ordering: highest score first, then lowest index
+    indices = indices[np.lexsort((indices, -scores[indices]))][:limit]
+    return [(int(index), float(scores[index])) for index in indices]
+
+
+class SearchCorpus:
+    """
+    Holds the pre-normalized search choices for a store.
+
+    `items` and `choices` are aligned: `choices[i]` is the normalized
+    text of `items[i]`. The corpus is filled when the store is loaded
+    and updated incrementally as items are added or removed,
+    so searching does not need to normalize the whole library per query.
+
+    Once the corpus grows past `prefilter_threshold` items, an inverted
+    trigram index is built and used to pick a bounded set of candidates
+    before scoring, instead of scoring every choice.
+    """
+
+    prefilter_threshold: int = 20_000
+    """
+    The minimum corpus size before the trigram prefilter is used.
+    Smaller corpora are always scored exhaustively.
+    """
+    max_candidates: int = 2_000
+    """
+    The maximum number of candidates passed to the scorer.
+    """
+    common_gram_ratio: float = 0.1
+    """
+    Trigrams found in more than this share of the corpus are only counted
+    when the query has fewer than 3 rarer trigrams.
+    """
+    min_candidates: int = 10
+    """
+    Fall back to a full scan when the prefilter finds fewer candidates than this.
+    """
+
+    def __init__(self, key: Callable[[Any], str], text: Callable[[Any], str]):
+        """
+        :param key: Returns the unique key of an item. eg. the trackhash
+        :param text: Returns the text to search an item by. eg. the title
+        """
+        self.key = key
+        self.text = text
+
+        self.items: list[Any] = []
+        self.choices: list[str] = []
+        # {key: position in items}
+        self.positions: dict[str, int] = {}
+        # {trigram: {position, ...}}, None until the prefilter is first needed
+        self.grams: dict[str, set[int]] | None = None
+
+        self._view: tuple[tuple[Any, ...], tuple[str, ...]] | None = None
+        self._lock = Lock()
+
+    def __len__(self):
+        return len(self.items)
+
+    def clear(self):
+        """
+        Removes all items from the corpus.
+        """
+        with self._lock:
+            self.items = []
+            self.choices = []
+            self.positions = {}
+            self.grams = None
+            self._view = None
+
+    def load(self, items: Iterable[Any]):
+        """
+        Replaces the corpus contents with the given items.
+        """
+        self.clear()
+
+        for item in items:
+            self.add(item)
+
+    def dump_state(self) -> tuple[list[Any], list[str]]:
+        """
+        Returns the items and their normalized choices, for a snapshot.
+        """
+        with self._lock:
+            return list(self.items), list(self.choices)
+
+    def load_state(self, state: tuple[list[Any], list[str]]):
+        """
+        Replaces the corpus contents with a state from `dump_state`,
+        without normalizing the items again.
+        """
+        items, choices = state
+
+        with self._lock:
+            self.items = items
+            self.choices = choices
+            self.positions = {self.key(item): pos for pos, item in enumerate(items)}
+            self.grams = None
+            self._view = None
+
+    def add(self, item: Any):
+        """
+        Adds an item to the corpus. If an item with the same key exists,
+        it is replaced.
+        """
+        key = self.key(item)
+        choice = normalize(self.text(item))
+
+        with self._lock:
+            pos = self.positions.get(key)
+
+            if pos is not None:
+                self._unindex_grams(self.choices[pos], pos)
+                self.items[pos] = item
+                self.choices[pos] = choice
+            else:
+                pos = len(self.items)
+                self.positions[key] = pos
+                self.items.append(item)
+                self.choices.append(choice)
+
+            self._index_grams(choice, pos)
+            self._view = None
+
+    def remove(self, item: Any):
+        """
+        Removes an item from the corpus.
+
+        The last item is moved into the freed slot,
+        so removals do not shift the rest of the corpus.
+        """
+        with self._lock:
+            pos = self.positions.pop(self.key(item), None)
+
+            if pos is None:
+                return
+
+            self._unindex_grams(self.choices[pos], pos)
+
+            last_pos = len(self.items) - 1
+            last_item = self.items.pop()
+            last_choice = self.choices.pop()
+
+            if pos < last_pos:
+                self._unindex_grams(last_choice, last_pos)
+                self.items[pos] = last_item
+                self.choices[pos] = last_choice
+                self.positions[self.key(last_item)] = pos
+                self._index_grams(last_choice, pos)
+
+            self._view = None
+
+    def view(self) -> tuple[tuple[Any, ...], tuple[str, ...]]:
+        """
+        Returns an immutable `(items, choices)` pair that is safe
+        to search while the corpus is being updated.
+
+        The pair is cached until the next change to the corpus.
+        """
+        with self._lock:
+            if self._view is None:
+                self._view = (tuple(self.items), tuple(self.choices))
+
+            return self._view
+
+    def extract(
+        self,
+        query: str,
+        scorer: Callable,
+        score_cutoff: float,
+        limit: int | None,
+        prefilter: bool = True,
+        workers: int = 1,
+    ) -> list[Match]:
+        """
+        Fuzzy matches the query against the corpus.
+
+        Returns a list of matches sorted by score.
+        Set `prefilter` to False to always score every choice.
+        `workers` is the number of threads used to score large choice lists.
+        """
+        query = normalize(query)
+        items = None
+
+        if prefilter:
+            min_candidates = min(limit or self.min_candidates, self.min_candidates)
+
+            with self._lock:
+                positions = self._get_candidates(query)
+
+                if positions is not None and len(positions) >= min_candidates:
+                    items = [self.items[pos] for pos in positions]
+                    choices = [self.choices[pos] for pos in positions]
+
+        if items is None:
+            items, choices = self.view()
+
+        results = score_choices(
+            query,
+            choices,
+            scorer=scorer,
+            score_cutoff=score_cutoff,
+            limit=limit,
+            workers=workers,
+        )
+
+        return [Match(items[index], choices[index], score) for index, score in results]
+
+    def _get_candidates(self, query: str) -> list[int] | None:
+        """
+        Returns the positions of the choices sharing the most trigrams
+        with the query, or None if the prefilter should not be used.
+
+        Should be called with the lock held.
+        """
+        if len(self.items) < self.prefilter_threshold or len(query) < 3:
+            return None
+
+        if self.grams is None:
+            self.grams = {}
+
+            for pos, choice in enumerate(self.choices):
+                self._index_grams(choice, pos)
+
+        query_grams = trigrams(query)
+        postings = sorted(
+            (self.grams[gram] for gram in query_grams if gram in self.grams), key=len
+        )
+
+        # INFO: Skip very common trigrams once enough rarer ones have been counted.
+        # They add little to the ranking but dominate the counting cost.
+        common = len(self.items) * self.common_gram_ratio
+        counts: Counter[int] = Counter()
+
+        for index, posting in enumerate(postings):
+            if index >= 3 and len(posting) > common:
+                break
+
+            counts.update(posting)
+
+        # INFO: Rank by how much of the shorter string is covered by shared
+        # trigrams. Scorers like WRatio match substrings, so a short choice
+        # contained in the query should rank as high as a long choice
+        # containing the query.
+        qlen = len(query_grams)
+        choices = self.choices
+
+        def overlap(pos: int):
+            return counts[pos] / min(qlen, len(choices[pos]) + 1)
+
+        return heapq.nlargest(self.max_candidates, counts, key=overlap)
+
+    def _index_grams(self, choice: str, pos: int):
+        if self.grams is None:
+            return
+
+        for gram in trigrams(choice):
+            postings = self.grams.get(gram)
+
+            if postings is None:
+                self.grams[gram] = {pos}
+            else:
+                postings.add(pos)
+
+    def _unindex_grams(self, choice: str, pos: int):
+        if self.grams is None:
+            return
+
+        for gram in trigrams(choice):
+            postings = self.grams.get(gram)
+
+            if postings is None:
+                continue
+
+            postings.discard(pos)
+
+            if not postings:
+                del self.grams[gram]
@@ -0,0 +1,219 @@
+"""
+Contains the snapshot of the in-memory stores, loaded on startup
+instead of rebuilding the stores from the database.
+"""
+
+import hashlib
+import json
+import os
+import pickle
+from dataclasses import fields
+from logging import getLogger
+from pathlib import Path
+from typing import Any
+
+from swingmusic import settings
+from swingmusic.config import UserConfig
+from swingmusic.db.libdata import LibraryVersionTable
+from swingmusic.models import Album, Artist, Track
+from swingmusic.store.albums import AlbumStore
+from swingmusic.store.artists import ArtistStore
+from swingmusic.store.folder import FolderStore
+from swingmusic.store.tracks import TrackStore
+from swingmusic.utils.interning import InternRegistry
+
+log = getLogger(__name__)
+
+SNAPSHOT_VERSION = 2
+
+PARSING_CONFIG_KEYS = (
+    "artistSeparators",
+    "artistSplitIgnoreList",
+    "genreSeparators",
+    "extractFeaturedArtists",
+    "removeProdBy",
+    "removeRemasterInfo",
+    "mergeAlbums",
+    "cleanAlbumTitle",
+    "showAlbumsAsSingles",
+)
+"""
+The settings that change how tracks, albums and artists are built.
+"""
+
+MAPPED_FIELDS = {
+    "playcount": 0,
+    "playduration": 0,
+    "lastplayed": 0,
+    "fav_userids": None,
+}
+"""
+Fields that scrobbles and favorites are added to after the stores are built,
+with the values they have before mapping. None stands for an empty list.
+Colors are set rather than added to, so they are kept.
+"""
+
+MODELS = (Track, Album, Artist)
+SLOTS = {model: [f.name for f in fields(model)] for model in MODELS}
+
+
+def restore_slots(model: type, state: dict[str, Any]):
+    item = model.__new__(model)
+
+    for name, value in state.items():
+        setattr(item, name, value)
+
+    return item
+
+
+class SnapshotPickler(pickle.Pickler):
+    """
+    Pickles tracks, albums and artists without their play data and
+    favorites, as they are mapped again after loading.
+    """
+
+    def reducer_override(self, obj):
+        names = SLOTS.get(type(obj))
+
+        if names is None:
+            return NotImplemented
+
+        state = {name: getattr(obj, name) for name in names}
+
+        for name, value in MAPPED_FIELDS.items():
+            if name in state:
+                state[name] = [] if value is None else value
+
+        return restore_slots, (type(obj), state)
+
+
+class StoreSnapshot:
+    """
+    A versioned binary snapshot of the built track, album and artist stores.
+
+    Building the stores parses every track (artist splitting, featured
+    artists, hashing) and aggregates the albums and artists, which takes
+    minutes on large libraries. The snapshot is valid as long as the
+    track table, the parsing settings and the models are unchanged.
+    """
+
+    @staticmethod
+    def path() -> Path:
+        return settings.Paths().store_snapshot_path
+
+    @staticmethod
+    def get_key() -> str:
+        """
+        Returns the key of the current database state, parsing settings
+        and models. A snapshot is only loaded if its key matches.
+        """
+        config = UserConfig()
+        parsing: dict[str, Any] = {}
+
+        for key in PARSING_CONFIG_KEYS:
+            value = getattr(config, key)
+            parsing[key] = sorted(value) if isinstance(value, (set, list)) else value
+
+        parts = {
+            "version": SNAPSHOT_VERSION,
+            "library": LibraryVersionTable.get_version(),
+            "config": parsing,
+            "models": {model.__name__: names for model, names in SLOTS.items()},
+        }
+
+        try:
+            parts["app"] = settings.Metadata.version
+        except Exception:
+            parts["app"] = ""
+
+        data = json.dumps(parts, sort_keys=True, default=str)
+        return hashlib.sha256(data.encode()).hexdigest()
+
+    @classmethod
+    def save(cls):
+        """
+        Writes the stores to the snapshot file.
+
+        The snapshot is dropped if the database changes while writing,
+        as the stores may not match the recorded key.
+        """
+        print("Saving store snapshot... ", end="")
+        key = cls.get_key()
+        path = cls.path()
+        temp = path.with_suffix(".tmp")
+
+        try:
+            with open(temp, "wb") as f:
+                # INFO: The header is read on its own to check the key
+                pickle.dump(
+                    {"version": SNAPSHOT_VERSION, "key": key},
+                    f,
+                    protocol=pickle.HIGHEST_PROTOCOL,
+                )
+                SnapshotPickler(f, protocol=pickle.HIGHEST_PROTOCOL).dump(
+                    {
+                        "tracks": TrackStore.dump_state(),
+                        "albums": AlbumStore.dump_state(),
+                        "artists": ArtistStore.dump_state(),
+                        "artist_records": InternRegistry.artists,
+                        "genre_records": InternRegistry.genres,
+                    }
+                )
+
+            if cls.get_key() != key:
+                log.info("Library changed while saving the store snapshot, dropping it")
+                os.remove(temp)
+                return
+
+            os.replace(temp, path)
+        except (OSError, pickle.PicklingError, RuntimeError) as e:
+            # INFO: RuntimeError: a store changed size while being pickled
+            log.warning(f"Failed to save the store snapshot: {e}")
+
+            try:
+                os.remove(temp)
+            except OSError:
+                pass
+
+            return
+
+        print("Done!")
+
+    @classmethod
+    def load(cls) -> bool:
+        """
+        Loads the stores from the snapshot, if it is up to date.
+
+        Returns False if there is no usable snapshot, in which case
+        the stores need to be built from the database.
+        """
+        try:
+            with open(cls.path(), "rb") as f:
+                header = pickle.load(f)
+
+                if header.get("version") != SNAPSHOT_VERSION:
+                    return False
+
+                if header.get("key") != cls.get_key():
+                    log.info("Store snapshot is out of date, rebuilding the stores")
+                    return False
+
+                print("Loading store snapshot... ", end="")
+                state = pickle.load(f)
+        except FileNotFoundError:
+            return False
+        except Exception as e:
+            log.warning(f"Ignoring unreadable store snapshot: {e}")
+            return False
+
+        InternRegistry.clear()
+        InternRegistry.artists = state["artist_records"]
+        InternRegistry.genres = state["genre_records"]
+
+        TrackStore.load_state(state["tracks"])
+        AlbumStore.load_state(state["albums"])
+        ArtistStore.load_state(state["artists"])
+        FolderStore.load_filepaths()
+
+        print("Done!")
+        return True
@@ -0,0 +1,122 @@
+from typing import Any, Callable, Sequence
+
+from natsort import natsort_keygen
+
+from swingmusic.config import UserConfig
+from swingmusic.utils.parsers import get_sort_name
+
+natural_key = natsort_keygen()
+
+PLAY_SORT_KEYS = {"playcount", "playduration", "lastplayed"}
+"""
+Sort keys whose values change when a track is played.
+"""
+
+
+class SortOrders:
+    """
+    Caches sorted views of a store's flat list, one per sort key and direction.
+
+    A cached order is reused until the store version changes. Orders on
+    play data (see `PLAY_SORT_KEYS`) are also rebuilt when the store's
+    play stats change. Paging through a cached order is then just a slice.
+
+    Natural sort keys for string fields are computed once per item
+    and kept across rebuilds, so adding a single album or artist
+    does not recompute the keys of the whole library.
+    """
+
+    def __init__(self, key: Callable[[Any], str], article_keys: set[str] = set()):
+        """
+        :param key: Returns the unique key of an item. eg. the albumhash
+        :param article_keys: Sort keys holding artist names, which should
+            respect the article aware sorting setting.
+        """
+        self.key = key
+        self.article_keys = article_keys
+
+        # {(sortkey, reverse): (state, sorted items)}
+        self.orders: dict[tuple[str, bool], tuple[tuple, tuple[Any, ...]]] = {}
+        # {(sortkey, articles): {item key: (value, natural sort key)}}
+        self.natkeys: dict[tuple[str, frozenset | None], dict[str, tuple]] = {}
+
+    def clear(self):
+        """
+        Drops all cached orders and sort keys.
+        """
+        self.orders = {}
+        self.natkeys = {}
+
+    def get(
+        self,
+        items: Sequence[Any],
+        sortkey: str,
+        reverse: bool,
+        version: int,
+        stats_version: int,
+    ) -> tuple[Any, ...]:
+        """
+        Returns the items sorted by the given key.
+
+        `version` and `stats_version` should be read from the store
+        before `items`, so that a change while sorting is never cached
+        under the new version.
+        """
+        articles = None
+
+        if sortkey in self.article_keys:
+            config = UserConfig()
+
+            if config.artistArticleAwareSorting:
+                articles = frozenset(config.artistSortingArticles)
+
+        state = (
+            version,
+            stats_version if sortkey in PLAY_SORT_KEYS else None,
+            articles,
+        )
+
+        cached = self.orders.get((sortkey, reverse))
+        if cached is not None and cached[0] == state:
+            return cached[1]
+
+        keys = self.get_keys(items, sortkey, articles)
+        indices = sorted(range(len(items)), key=keys.__getitem__, reverse=reverse)
+        order = tuple(items[index] for index in indices)
+
+        self.orders[(sortkey, reverse)] = (state, order)
+        return order
+
+    def get_keys(
+        self, items: Sequence[Any], sortkey: str, articles: frozenset | None
+    ) -> list:
+        """
+        Returns the sort key of each item.
+
+        Strings are compared naturally and case-insensitively.
+        Other values (numbers and dates) are compared as they are.
+        """
+        cache = self.natkeys.setdefault((sortkey, articles), {})
+        keys = []
+
+        for item in items:
+            value = getattr(item, sortkey)
+
+            if sortkey == "albumartists":
+                value = value[0]["name"] if value else ""
+
+            if not isinstance(value, str):
+                keys.append(value)
+                continue
+
+            itemkey = self.key(item)
+            entry = cache.get(itemkey)
+
+            if entry is None or entry[0] != value:
+                name = get_sort_name(value, articles) if articles else value
+                entry = (value, natural_key(name.casefold()))
+                cache[itemkey] = entry
+
+            keys.append(entry[1])
+
+        return keys
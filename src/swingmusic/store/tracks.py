@@ -2,12 +2,19 @@
 
 import itertools
 import json
+import sys
+from pathlib import Path
 from typing import Callable, Iterable
+
+from sortedcontainers import SortedDict
+
 from swingmusic.db.libdata import TrackTable
 
 from swingmusic.models import Track
+from swingmusic.store.searchcorpus import SearchCorpus
 from swingmusic.utils import classproperty
 from swingmusic.utils.auth import get_current_userid
+from swingmusic.utils.interning import InternRegistry
 from swingmusic.utils.remove_duplicates import remove_duplicates
 
 TRACKS_LOAD_KEY = ""
@@ -71,20 +78,62 @@ class TrackStore:
     # {'trackhash': Track[]}
     trackhashmap: dict[str, TrackGroup] = dict()
 
+    # INFO: Secondary indexes used to avoid scanning the whole library
+    # when looking up tracks by album, artist or folder.
+    # The trackhashes are dict keys, an ordered set, so that lookups
+    # return tracks in the order they were added.
+    # {'albumhash': {'trackhash': None, ...}}
+    albumindex: dict[str, dict[str, None]] = dict()
+    # {'artisthash': {'trackhash': None, ...}}
+    artistindex: dict[str, dict[str, None]] = dict()
+    # {'folder': {'trackhash': None, ...}}, sorted to allow prefix lookups
+    folderindex: SortedDict = SortedDict()
+    # {'filepath': Track}
+    filepathmap: dict[str, Track] = dict()
+
+    # INFO: Pre-normalized track titles for the fuzzy search
+    corpus = SearchCorpus(key=lambda t: t.filepath, text=lambda t: t.title)
+
+    # INFO: Incremented whenever tracks are added or removed.
+    # Invalidates the flat list snapshot and can be used as a cache key.
+    version: int = 0
+    _flat_list: tuple[Track, ...] | None = None
+
     @classproperty
-    def tracks(cls) -> list[Track]:
+    def tracks(cls) -> tuple[Track, ...]:
         return cls.get_flat_list()
 
     @classmethod
-    def get_flat_list(cls):
+    def invalidate(cls):
+        """
+        Bumps the store version and drops the cached flat list.
+        """
+        cls.version += 1
+        cls._flat_list = None
+
+    @classmethod
+    def get_flat_list(cls) -> tuple[Track, ...]:
         """
         Returns a flat list of all tracks.
+
+        The list is built once per store version and shared between callers,
+        so it is returned as an immutable tuple.
         """
-        return list(
-            itertools.chain.from_iterable(
-                [group.tracks for group in cls.trackhashmap.values()]
+        snapshot = cls._flat_list
+
+        if snapshot is None:
+            version = cls.version
+            snapshot = tuple(
+                itertools.chain.from_iterable(
+                    [group.tracks for group in cls.trackhashmap.values()]
+                )
             )
-        )
+
+            # INFO: Only cache if the store did not change while building
+            if version == cls.version:
+                cls._flat_list = snapshot
+
+        return snapshot
 
     @classmethod
     def load_all_tracks(cls, instance_key: str):
@@ -96,7 +145,15 @@ class TrackStore:
         global TRACKS_LOAD_KEY
         TRACKS_LOAD_KEY = instance_key
 
+        cls.invalidate()
         cls.trackhashmap = dict()
+        cls.albumindex = dict()
+        cls.artistindex = dict()
+        cls.folderindex = SortedDict()
+        cls.filepathmap = dict()
+        cls.corpus.clear()
+        # INFO: Drop records of artists and genres no longer in the library
+        InternRegistry.clear()
         tracks = TrackTable.get_all()
 
         # INFO: Load all tracks into the dict store
@@ -110,8 +167,96 @@ class TrackStore:
             else:
                 cls.trackhashmap[track.trackhash].append(track)
 
+            cls.index_track(track)
+
+        cls.invalidate()
         print("Done!")
 
+    @classmethod
+    def dump_state(cls) -> dict:
+        """
+        Returns the store contents, for a snapshot.
+        """
+        return {
+            "trackhashmap": cls.trackhashmap,
+            "albumindex": cls.albumindex,
+            "artistindex": cls.artistindex,
+            "folderindex": cls.folderindex,
+            "filepathmap": cls.filepathmap,
+            "corpus": cls.corpus.dump_state(),
+        }
+
+    @classmethod
+    def load_state(cls, state: dict):
+        """
+        Replaces the store contents with a state from `dump_state`.
+        """
+        cls.trackhashmap = state["trackhashmap"]
+        cls.albumindex = state["albumindex"]
+        cls.artistindex = state["artistindex"]
+        cls.folderindex = state["folderindex"]
+        cls.filepathmap = state["filepathmap"]
+        cls.corpus.load_state(state["corpus"])
+        cls.invalidate()
+
+    @classmethod
+    def index_track(cls, track: Track):
+        """
+        Adds a track to the filepath, album, artist and folder indexes
+        and the search corpus.
+        """
+        cls.filepathmap[track.filepath] = track
+        cls.corpus.add(track)
+        cls.albumindex.setdefault(track.albumhash, {})[track.trackhash] = None
+
+        for artisthash in track.artisthashes:
+            cls.artistindex.setdefault(artisthash, {})[track.trackhash] = None
+
+        entry = cls.folderindex.get(track.folder)
+        if entry is None:
+            cls.folderindex[track.folder] = {track.trackhash: None}
+        else:
+            entry[track.trackhash] = None
+
+    @classmethod
+    def unindex_track(cls, track: Track):
+        """
+        Removes a track from the filepath, album, artist and folder indexes
+        and the search corpus.
+
+        Should be called after the track has been removed from its group.
+        A trackhash is only dropped from an index entry if no other track
+        in the same group still matches that entry.
+        """
+        # INFO: A re-tagged file may already be indexed under the same path
+        # (and trackhash) by a fresh track object, so compare identity.
+        existing = cls.filepathmap.get(track.filepath, None)
+        if existing is track:
+            del cls.filepathmap[track.filepath]
+            cls.corpus.remove(track)
+
+        group = cls.trackhashmap.get(track.trackhash, None)
+        siblings = group.tracks if group else []
+
+        def discard(index: dict[str, dict[str, None]], key: str):
+            entry = index.get(key)
+            if entry is None:
+                return
+
+            entry.pop(track.trackhash, None)
+            if not entry:
+                del index[key]
+
+        if not any(t.albumhash == track.albumhash for t in siblings):
+            discard(cls.albumindex, track.albumhash)
+
+        for artisthash in track.artisthashes:
+            if not any(artisthash in t.artisthashes for t in siblings):
+                discard(cls.artistindex, artisthash)
+
+        if not any(t.folder == track.folder for t in siblings):
+            discard(cls.folderindex, track.folder)
+
     @classmethod
     def add_track(cls, track: Track):
         """
@@ -120,9 +265,12 @@ class TrackStore:
         group = cls.trackhashmap.get(track.trackhash, None)
 
         if group:
-            return group.append(track)
+            group.append(track)
+        else:
+            cls.trackhashmap[track.trackhash] = TrackGroup([track])
 
-        cls.trackhashmap[track.trackhash] = TrackGroup([track])
+        cls.index_track(track)
+        cls.invalidate()
 
     @classmethod
     def add_tracks(cls, tracks: list[Track]):
@@ -146,6 +294,9 @@ class TrackStore:
             if len(group) == 0:
                 del cls.trackhashmap[track.trackhash]
 
+            cls.unindex_track(track)
+            cls.invalidate()
+
     @classmethod
     def remove_track_by_filepath(cls, filepath: str):
         """
@@ -155,30 +306,37 @@ class TrackStore:
         return cls.remove_tracks_by_filepaths({filepath})
 
     @classmethod
-    def remove_tracks_by_filepaths(cls, filepaths: set[str]):
+    def remove_tracks_by_filepaths(cls, filepaths: Iterable[str]):
         """
         Removes multiple tracks from the store by their filepaths.
         """
+        for filepath in filepaths:
+            track = cls.filepathmap.get(filepath, None)
 
-        filecount = len(filepaths)
+            if track is not None:
+                cls.remove_track(track)
 
-        try:
-            for trackhash in cls.trackhashmap:
-                group = cls.trackhashmap[trackhash]
+    @classmethod
+    def move_track(cls, filepath: str, new_filepath: str) -> Track | None:
+        """
+        Moves a track to a new filepath, keeping its play data,
+        favorites and colors.
+        """
+        track = cls.filepathmap.get(filepath, None)
 
-                for track in group.tracks:
-                    if track.filepath in filepaths:
-                        group.remove(track)
+        if track is None:
+            return None
 
-                        if len(group) == 0:
-                            del cls.trackhashmap[trackhash]
+        cls.remove_track(track)
 
-                        filecount -= 1
+        track.filepath = new_filepath
+        track.folder = sys.intern(Path(new_filepath).parent.as_posix() + "/")
+        track.image = sys.intern(
+            track.albumhash + ".webp" + "?pathhash=" + track.pathhash
+        )
 
-                    if filecount == 0:
-                        break
-        except RuntimeError:
-            return
+        cls.add_track(track)
+        return track
 
     @classmethod
     def count_tracks_by_trackhash(cls, trackhash: str) -> int:
@@ -188,50 +346,50 @@ class TrackStore:
         return len(cls.trackhashmap.get(trackhash, []))
 
     @classmethod
-    def get_tracks_by_trackhashes(cls, trackhashes: Iterable[str]) -> list[Track]:
+    def get_tracks_by_trackhashes(
+        cls, trackhashes: Iterable[str], start: int = 0, limit: int | None = None
+    ) -> list[Track]:
         """
-        Returns a list of tracks by their hashes.
+        Returns a list of tracks by their hashes, in the order of the given trackhashes.
+
+        Duplicate trackhashes are only returned once, at their first position.
+        Trackhashes not found in the store are skipped.
+
+        `start` and `limit` slice the given trackhashes before any track
+        is resolved, so paginating a long list only touches the requested page.
         """
-        hash_set = set(trackhashes)
+        if start or limit is not None:
+            stop = None if limit is None else start + limit
+            trackhashes = itertools.islice(trackhashes, start, stop)
+
+        seen: set[str] = set()
         tracks: list[Track] = []
 
-        for trackhash in hash_set:
+        for trackhash in trackhashes:
+            if trackhash in seen:
+                continue
+
+            seen.add(trackhash)
             group = cls.trackhashmap.get(trackhash, None)
 
             if group:
-                track = group.get_best()
-                tracks.append(track)
-
-        # sort the tracks in the order of the given trackhashes
-        if type(trackhashes) is list:
-            tracks.sort(key=lambda t: trackhashes.index(t.trackhash))
+                tracks.append(group.get_best())
 
         return tracks
 
     @classmethod
-    def get_tracks_by_filepaths(cls, paths: list[str]) -> list[Track]:
+    def get_tracks_by_filepaths(cls, paths: Iterable[str]) -> list[Track]:
         """
-        Returns all tracks matching the given paths.
+        Returns all tracks matching the given paths,
+        in the order of the given paths.
         """
-        # tracks = sorted(cls.trackhashmap, key=lambda x: x.filepath)
-        # tracks = use_bisection(tracks, "filepath", paths)
-        # return [track for track in tracks if track is not None]
-        # return cls.find_tracks_by(key="filepath", value=paths)
-
         tracks: list[Track] = []
 
-        try:
-            for trackhash in cls.trackhashmap:
-                group = cls.trackhashmap.get(trackhash)
+        for path in paths:
+            track = cls.filepathmap.get(path, None)
 
-                if not group:
-                    continue
-
-                for track in group.tracks:
-                    if track.filepath in paths:
-                        tracks.append(track)
-        except RuntimeError:
-            return []
+            if track is not None:
+                tracks.append(track)
 
         return tracks
 
@@ -267,21 +425,57 @@ class TrackStore:
 
         return remove_duplicates(tracks)
 
+    @classmethod
+    def find_indexed_tracks(
+        cls,
+        trackhashes: Iterable[str],
+        predicate: Callable[[Track], bool],
+        including_duplicates: bool = False,
+    ):
+        """
+        Returns the tracks in the given trackhash groups that match the predicate.
+
+        Used together with the secondary indexes so that lookups
+        only touch the matching groups instead of the whole library.
+        """
+        tracks: list[Track] = []
+
+        for trackhash in tuple(trackhashes):
+            group = cls.trackhashmap.get(trackhash, None)
+
+            if not group:
+                continue
+
+            matches = [t for t in group.tracks if predicate(t)]
+
+            if not matches:
+                continue
+
+            if including_duplicates:
+                tracks.extend(matches)
+            else:
+                tracks.append(max(matches, key=lambda x: x.bitrate))
+
+        return tracks
+
     @classmethod
     def get_tracks_by_albumhash(cls, album_hash: str) -> list[Track]:
         """
         Returns all tracks matching the given album hash.
         """
-        return cls.find_tracks_by(key="albumhash", value=album_hash)
+        return cls.find_indexed_tracks(
+            cls.albumindex.get(album_hash, ()),
+            lambda t: t.albumhash == album_hash,
+        )
 
     @classmethod
     def get_tracks_by_artisthash(cls, artisthash: str):
         """
         Returns all tracks matching the given artist. Duplicate tracks are removed.
         """
-        predicate = lambda artisthashes, artisthash: artisthash in artisthashes
-        return cls.find_tracks_by(
-            key="artisthashes", value=artisthash, predicate=predicate
+        return cls.find_indexed_tracks(
+            cls.artistindex.get(artisthash, ()),
+            lambda t: artisthash in t.artisthashes,
         )
 
     @classmethod
@@ -289,16 +483,23 @@ class TrackStore:
         """
         Returns all tracks in the given path.
         """
-        predicate: Callable[[str, str], bool] = lambda track_folder, path: (
-            track_folder.startswith(path)
-        )
+        tracks: list[Track] = []
 
-        return cls.find_tracks_by(
-            key="folder",
-            value=path,
-            predicate=predicate,
-            including_duplicates=True,
-        )
+        # INFO: The folder index is sorted, so all folders starting
+        # with the given path are next to each other.
+        for folder in cls.folderindex.irange(minimum=path):
+            if not folder.startswith(path):
+                break
+
+            tracks.extend(
+                cls.find_indexed_tracks(
+                    cls.folderindex[folder],
+                    lambda t: t.folder == folder,
+                    including_duplicates=True,
+                )
+            )
+
+        return tracks
 
     @classmethod
     def get_recently_added(cls, start: int, limit: int | None):
@@ -0,0 +1,36 @@
+class AdaptiveBatchSize:
+    """
+    Picks a batch size from the measured time taken by previous batches.
+
+    Each write transaction has a fixed cost (eg. an fsync on commit) and a
+    per-row cost. The batch size is adjusted so that a batch takes about
+    `target` seconds: large enough to amortize the fixed cost, small enough
+    not to hold the database write lock for long.
+    """
+
+    def __init__(
+        self,
+        initial: int = 150,
+        minimum: int = 50,
+        maximum: int = 5000,
+        target: float = 0.25,
+    ):
+        self.size = initial
+        self.minimum = minimum
+        self.maximum = maximum
+        self.target = target
+
+    def record(self, rows: int, seconds: float):
+        """
+        Updates the batch size from a batch of `rows` that took `seconds`.
+        """
+        if rows <= 0:
+            return
+
+        # INFO: Avoid dividing by zero on very fast batches
+        per_row = max(seconds, 1e-6) / rows
+        ideal = self.target / per_row
+
+        # INFO: Move halfway towards the ideal size to smooth out noisy timings
+        size = int((self.size + ideal) / 2)
+        self.size = max(self.minimum, min(self.maximum, size))
@@ -0,0 +1,153 @@
+"""
+Sends byte ranges of files, as specified by RFC 9110.
+"""
+
+import os
+from datetime import datetime, timezone
+from typing import BinaryIO
+
+from flask import Response, request
+from werkzeug.datastructures import ContentRange
+from werkzeug.http import is_resource_modified
+
+BLOCK_SIZE = 256 * 1024
+
+
+class FileRange:
+    """
+    Iterates over `length` bytes of a file, from its current position,
+    reading a block at a time. The file is closed once done.
+    """
+
+    def __init__(self, file: BinaryIO, length: int, block_size: int = BLOCK_SIZE):
+        self.file = file
+        self.remaining = length
+        self.block_size = block_size
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> bytes:
+        if self.remaining <= 0:
+            self.close()
+            raise StopIteration
+
+        data = self.file.read(min(self.block_size, self.remaining))
+
+        # INFO: The file was truncated while streaming
+        if not data:
+            self.close()
+            raise StopIteration
+
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+def get_file_etag(stat: os.stat_result) -> str:
+    """
+    Returns a validator that changes whenever the file is modified.
+    """
+    return f"{stat.st_size:x}-{stat.st_mtime_ns:x}"
+
+
+def range_applies(etag: str, modified: datetime) -> bool:
+    """
+    Checks the If-Range header. The range is only sent if the client's copy
+    is still current, otherwise the whole file is sent.
+    """
+    if_range = request.if_range
+
+    if if_range.etag is not None:
+        # INFO: If-Range requires a strong comparison
+        return if_range.etag == etag
+
+    if if_range.date is not None:
+        # INFO: HTTP dates have no fractions of seconds
+        return if_range.date == modified.replace(microsecond=0)
+
+    return True
+
+
+def open_body(file: BinaryIO, start: int, length: int, size: int):
+    """
+    Returns the response body for a byte range of an open file.
+
+    Ranges that run to the end of the file are handed to the server's
+    `wsgi.file_wrapper` if it has one, which can send the file with
+    `sendfile`, without reading it into Python. File wrappers send until
+    the end of the file, so other ranges are read in blocks.
+    """
+    file.seek(start)
+    wrapper = request.environ.get("wsgi.file_wrapper")
+
+    if wrapper is not None and start + length == size:
+        return wrapper(file, BLOCK_SIZE)
+
+    return FileRange(file, length)
+
+
+def send_file_range(filepath: str, mimetype: str) -> Response:
+    """
+    Sends a file, or the byte range of it in the Range header.
+
+    - Conditional requests (If-None-Match, If-Modified-Since) get a 304.
+    - A range is only sent if If-Range matches, if present.
+    - Multiple ranges, and ranges outside the file, get a 416.
+    - Range headers that can't be parsed are ignored.
+    """
+    file = open(filepath, "rb")
+
+    try:
+        stat = os.fstat(file.fileno())
+        size = stat.st_size
+        etag = get_file_etag(stat)
+        modified = datetime.fromtimestamp(stat.st_mtime, tz=timezone.utc)
+
+        response = Response(mimetype=mimetype, direct_passthrough=True)
+        response.set_etag(etag)
+        response.last_modified = modified
+        response.headers["Accept-Ranges"] = "bytes"
+        response.headers["Access-Control-Expose-Headers"] = (
+            "Accept-Ranges, Content-Length, Content-Range, ETag"
+        )
+
+        if not is_resource_modified(
+            request.environ, etag=etag, last_modified=modified
+        ):
+            response.status_code = 304
+            file.close()
+            return response
+
+        start, length = 0, size
+        byte_range = request.range
+
+        if byte_range is not None and byte_range.units == "bytes":
+            if range_applies(etag, modified):
+                bounds = byte_range.range_for_length(size)
+
+                # INFO: range_for_length returns None for multiple ranges too
+                if bounds is None:
+                    file.close()
+                    response.status_code = 416
+                    response.content_range = ContentRange("bytes", None, None, size)
+                    return response
+
+                start, stop = bounds
+                length = stop - start
+                response.status_code = 206
+                response.content_range = ContentRange("bytes", start, stop, size)
+
+        response.content_length = length
+
+        if request.method == "HEAD":
+            file.close()
+            return response
+
+        response.response = open_body(file, start, length, size)
+        return response
+    except BaseException:
+        file.close()
+        raise
@@ -1,4 +1,5 @@
 import os
+from functools import lru_cache
 from pathlib import Path
 
 
@@ -27,12 +28,48 @@ IGNORE_PATH_CONTAINS = {
 }
 
 
-def run_fast_scandir(path: str, full=False) -> tuple[list[str], list[str]]:
+@lru_cache(maxsize=1)
+def get_library_path() -> Path:
+    return (Path.home() / "Library").resolve()
+
+
+def is_ignored_path(path: Path) -> bool:
+    """
+    Checks whether a resolved directory path should be skipped when scanning.
+    """
+    if any(
+        path.as_posix().endswith(ignore_path) for ignore_path in IGNORE_PATH_ENDSWITH
+    ):
+        return True
+
+    if any(ignore_path in path.as_posix() for ignore_path in IGNORE_PATH_CONTAINS):
+        return True
+
+    # if on mac, ignore Library folder and its children
+    if os.name == "posix":
+        library_path = get_library_path()
+        if path == library_path or str(path).startswith(str(library_path)):
+            return True
+
+    return False
+
+
+def is_hidden_dir(name: str) -> bool:
+    """
+    Checks whether a directory name is a system or hidden directory.
+    """
+    return name.startswith(".") or name.startswith("$")
+
+
+def run_fast_scandir(
+    path: str, full=False, _seen: set[str] | None = None
+) -> tuple[list[str], list[str]]:
     """
     Scans a directory for files with a specific extension.
     Returns a list of files and folders in the directory.
 
-    TODO: possible recursion error on link inside link: ``dir/folder1/subfolder1/<link-to-folder1>/subfolder1/...``
+    Each resolved directory is only scanned once, so links inside links
+    (``dir/folder1/subfolder1/<link-to-folder1>/...``) are not followed forever.
 
     :param path: folder to scan
     :param full: will call recursively until end of path.
@@ -46,27 +83,22 @@ def run_fast_scandir(path: str, full=False) -> tuple[list[str], list[str]]:
 
     path: Path = Path(path).resolve()
 
-    if any(
-        path.as_posix().endswith(ignore_path) for ignore_path in IGNORE_PATH_ENDSWITH
-    ):
+    if is_ignored_path(path):
         return [], []
 
-    if any(ignore_path in path.as_posix() for ignore_path in IGNORE_PATH_CONTAINS):
-        return [], []
+    seen = set() if _seen is None else _seen
 
-    # if on mac, ignore Library folder and its children
-    if os.name == "posix":
-        library_path = (Path.home() / "Library").resolve()
-        if path == library_path or str(path).startswith(str(library_path)):
-            return [], []
+    if path.as_posix() in seen:
+        return [], []
 
+    seen.add(path.as_posix())
     subfolders = []
     files = []
 
     try:
         for entry in path.iterdir():
             if entry.is_dir():
-                if entry.name.startswith(".") or entry.name.startswith("$"):
+                if is_hidden_dir(entry.name):
                     continue  # filter out system / hidden files
                 else:
                     subfolders.append(entry)
@@ -78,7 +110,7 @@ def run_fast_scandir(path: str, full=False) -> tuple[list[str], list[str]]:
 
         if full or len(files) == 0:
             for folder in subfolders:
-                sub_dirs, subfiles = run_fast_scandir(folder, full=True)
+                sub_dirs, subfiles = run_fast_scandir(folder, full=True, _seen=seen)
                 subfolders.extend(sub_dirs)
                 files.extend(subfiles)
 
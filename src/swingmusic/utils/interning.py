@@ -0,0 +1,87 @@
+import sys
+
+from swingmusic.config import UserConfig
+from swingmusic.utils.hashing import create_hash
+from swingmusic.utils.parsers import split_artists
+
+
+class InternRegistry:
+    """
+    Holds one shared record per artist and genre name.
+
+    Tracks, albums and artists reference these records instead of
+    holding their own copies, so a library with many tracks per artist
+    keeps a single `{"name", "artisthash"}` dict per artist.
+
+    The records are shared, so they should never be modified in place.
+    Serializers work on `dataclasses.asdict` copies, so they can.
+    """
+
+    artists: dict[str, dict[str, str]] = {}
+    genres: dict[str, dict[str, str]] = {}
+
+    # INFO: {(separators, ignore list): {source string: artist records}}
+    splits: dict[tuple[frozenset, frozenset], dict[str, tuple[dict, ...]]] = {}
+
+    @classmethod
+    def clear(cls):
+        """
+        Drops all records. Records held by existing items stay valid,
+        they just won't be shared with new ones.
+        """
+        cls.artists = {}
+        cls.genres = {}
+        cls.splits = {}
+
+    @classmethod
+    def artist(cls, name: str) -> dict[str, str]:
+        """
+        Returns the shared record for the given artist name.
+        """
+        record = cls.artists.get(name)
+
+        if record is None:
+            name = sys.intern(name)
+            record = {"name": name, "artisthash": create_hash(name, decode=True)}
+            record = cls.artists.setdefault(name, record)
+
+        return record
+
+    @classmethod
+    def genre(cls, name: str) -> dict[str, str]:
+        """
+        Returns the shared record for the given genre name.
+        """
+        record = cls.genres.get(name)
+
+        if record is None:
+            name = sys.intern(name)
+            record = {"name": name, "genrehash": create_hash(name)}
+            record = cls.genres.setdefault(name, record)
+
+        return record
+
+    @classmethod
+    def split_artists(cls, src: str, config: UserConfig) -> list[dict[str, str]]:
+        """
+        Splits a string of artists and returns their shared records.
+
+        Splitting is done once per distinct string and config,
+        as most artist strings repeat across many tracks.
+        """
+        key = (
+            frozenset(config.artistSeparators),
+            frozenset(config.artistSplitIgnoreList),
+        )
+        cache = cls.splits.get(key)
+
+        if cache is None:
+            cache = cls.splits.setdefault(key, {})
+
+        records = cache.get(src)
+
+        if records is None:
+            records = tuple(cls.artist(a) for a in split_artists(src, config=config))
+            cache[src] = records
+
+        return list(records)
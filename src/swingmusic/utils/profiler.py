@@ -0,0 +1,292 @@
+"""
+An opt-in profiler for the server startup.
+
+Set `SWINGMUSIC_PROFILE_STARTUP=1` (or pass `--profile-startup`) to record
+the wall time of each startup phase and the import time of each module.
+"""
+
+import importlib.abc
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Iterator
+
+ENV_KEY = "SWINGMUSIC_PROFILE_STARTUP"
+
+
+@dataclass
+class PhaseTiming:
+    name: str
+    depth: int
+    thread: str
+    started: float
+    """
+    Seconds since the profiler started.
+    """
+    seconds: float | None = None
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "name": self.name,
+            "depth": self.depth,
+            "thread": self.thread,
+            "started": round(self.started, 4),
+            "seconds": None if self.seconds is None else round(self.seconds, 4),
+        }
+
+
+@dataclass
+class ImportTiming:
+    name: str
+    seconds: float
+    """
+    Time spent running the module, including the modules it imported.
+    """
+    self_seconds: float
+    phase: str | None
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "name": self.name,
+            "seconds": round(self.seconds, 4),
+            "self_seconds": round(self.self_seconds, 4),
+            "phase": self.phase,
+        }
+
+
+class TimedLoader(importlib.abc.Loader):
+    """
+    Wraps a module loader to time the execution of the module.
+    """
+
+    def __init__(self, loader, finder: "ImportTimer"):
+        self.loader = loader
+        self.finder = finder
+
+    def __getattr__(self, name: str):
+        return getattr(self.loader, name)
+
+    def create_module(self, spec):
+        return self.loader.create_module(spec)
+
+    def exec_module(self, module):
+        # INFO: Hand the real loader back to the module, for resource lookups
+        module.__loader__ = self.loader
+
+        if module.__spec__ is not None:
+            module.__spec__.loader = self.loader
+
+        with self.finder.timed(module.__name__):
+            self.loader.exec_module(module)
+
+
+class ImportTimer(importlib.abc.MetaPathFinder):
+    """
+    A meta path finder that times the modules found by the other finders.
+    """
+
+    def __init__(self):
+        self.local = threading.local()
+
+    def find_spec(self, fullname, path, target=None):
+        if getattr(self.local, "finding", False):
+            return None
+
+        self.local.finding = True
+
+        try:
+            for finder in sys.meta_path:
+                if finder is self or not hasattr(finder, "find_spec"):
+                    continue
+
+                spec = finder.find_spec(fullname, path, target)
+
+                if spec is not None:
+                    break
+            else:
+                return None
+        finally:
+            self.local.finding = False
+
+        if spec.loader is None or not hasattr(spec.loader, "exec_module"):
+            return spec
+
+        spec.loader = TimedLoader(spec.loader, self)
+        return spec
+
+    @contextmanager
+    def timed(self, name: str):
+        stack: list[list[float]] = self.local.__dict__.setdefault("stack", [])
+        frame = [time.perf_counter(), 0.0]
+        stack.append(frame)
+
+        try:
+            yield
+        finally:
+            stack.pop()
+            elapsed = time.perf_counter() - frame[0]
+
+            if stack:
+                stack[-1][1] += elapsed
+
+            StartupProfiler.record_import(name, elapsed, elapsed - frame[1])
+
+
+class StartupProfiler:
+    """
+    Records the startup timeline: the wall time of each phase,
+    and the time taken to import each module during startup.
+
+    Does nothing unless enabled through the environment, so the
+    phases can be marked unconditionally.
+    """
+
+    enabled: bool = os.environ.get(ENV_KEY) == "1"
+    started: float | None = None
+    finished: float | None = None
+    phases: list[PhaseTiming] = []
+    imports: list[ImportTiming] = []
+    preloaded: int = 0
+    """
+    The number of modules imported before the profiler started,
+    which are not timed.
+    """
+    timer: ImportTimer | None = None
+    local = threading.local()
+    lock = threading.Lock()
+    changed = threading.Condition(lock)
+
+    @classmethod
+    def start(cls):
+        """
+        Starts timing imports. Call as early as possible.
+        """
+        cls.enabled = os.environ.get(ENV_KEY) == "1"
+
+        if not cls.enabled or cls.started is not None:
+            return
+
+        cls.started = time.perf_counter()
+        cls.preloaded = len(sys.modules)
+        cls.timer = ImportTimer()
+        sys.meta_path.insert(0, cls.timer)
+
+    @classmethod
+    def stop(cls, wait_for: tuple[str, ...] = (), timeout: float = 60):
+        """
+        Stops timing imports and prints the timeline.
+
+        Waits for the phases in `wait_for` to finish first, for phases
+        running in threads started during startup (eg. the cron jobs).
+        """
+        if cls.started is None or cls.finished is not None:
+            return
+
+        def waited_phases_done():
+            done = {p.name for p in cls.phases if p.seconds is not None}
+            return done.issuperset(wait_for)
+
+        with cls.changed:
+            cls.changed.wait_for(waited_phases_done, timeout=timeout)
+
+        try:
+            sys.meta_path.remove(cls.timer)
+        except ValueError:
+            pass
+
+        cls.finished = time.perf_counter()
+        cls.print_report()
+
+    @classmethod
+    def elapsed(cls) -> float:
+        return time.perf_counter() - (cls.started or 0)
+
+    @classmethod
+    @contextmanager
+    def phase(cls, name: str) -> Iterator[None]:
+        """
+        Records the wall time of a startup phase. Phases can be nested.
+        """
+        if cls.started is None or cls.finished is not None:
+            yield
+            return
+
+        stack: list[str] = cls.local.__dict__.setdefault("stack", [])
+        timing = PhaseTiming(
+            name=name,
+            depth=len(stack),
+            thread=threading.current_thread().name,
+            started=cls.elapsed(),
+        )
+
+        with cls.lock:
+            cls.phases.append(timing)
+
+        stack.append(name)
+
+        try:
+            yield
+        finally:
+            stack.pop()
+
+            with cls.changed:
+                timing.seconds = cls.elapsed() - timing.started
+                cls.changed.notify_all()
+
+    @classmethod
+    def record_import(cls, name: str, seconds: float, self_seconds: float):
+        stack: list[str] = cls.local.__dict__.get("stack", [])
+
+        with cls.lock:
+            cls.imports.append(
+                ImportTiming(name, seconds, self_seconds, stack[-1] if stack else None)
+            )
+
+    @classmethod
+    def to_dict(cls, limit: int = 50) -> dict[str, Any]:
+        with cls.lock:
+            phases = [phase.to_dict() for phase in cls.phases]
+            imports = sorted(cls.imports, key=lambda i: i.self_seconds, reverse=True)
+
+        return {
+            "enabled": cls.enabled,
+            "running": cls.started is not None and cls.finished is None,
+            "seconds": (
+                round(cls.finished - cls.started, 4)
+                if cls.started is not None and cls.finished is not None
+                else None
+            ),
+            "preloaded_modules": cls.preloaded,
+            "imported_modules": len(imports),
+            "import_seconds": round(sum(i.self_seconds for i in imports), 4),
+            "phases": phases,
+            "imports": [i.to_dict() for i in imports[:limit]],
+        }
+
+    @classmethod
+    def print_report(cls, limit: int = 20):
+        report = cls.to_dict(limit)
+
+        print(f"\nStartup profile ({report['seconds']}s)")
+
+        for phase in report["phases"]:
+            name = "  " * phase["depth"] + phase["name"]
+            seconds = phase["seconds"]
+            seconds = "running" if seconds is None else f"{seconds:.3f}s"
+            print(f"  {name:<40} {seconds:>9}  [{phase['thread']}]")
+
+        print(
+            f"\n{report['imported_modules']} modules imported in "
+            f"{report['import_seconds']:.3f}s, slowest:"
+        )
+
+        for item in report["imports"]:
+            print(
+                f"  {item['name']:<50} {item['self_seconds']:.3f}s "
+                f"(with imports {item['seconds']:.3f}s) in {item['phase']}"
+            )
+
+        print("", end="", flush=True)
@@ -1,4 +1,5 @@
 import threading
+from contextlib import contextmanager
 from multiprocessing import Process, Pipe
 
 
@@ -13,6 +14,35 @@ def background(func):
     return background_func
 
 
+class CoreBudget:
+    """
+    Caps the number of CPU cores used by concurrent CPU-heavy work.
+
+    Each caller reserves at least one core, blocking until one is free,
+    and takes more if they are available. The total never exceeds `cores`.
+    """
+
+    def __init__(self, cores: int):
+        self.cores = max(1, cores)
+        self._semaphore = threading.BoundedSemaphore(self.cores)
+
+    @contextmanager
+    def reserve(self, wanted: int = 1):
+        """
+        Reserves up to `wanted` cores and yields the number reserved.
+        """
+        self._semaphore.acquire()
+        reserved = 1
+
+        while reserved < wanted and self._semaphore.acquire(blocking=False):
+            reserved += 1
+
+        try:
+            yield reserved
+        finally:
+            for _ in range(reserved):
+                self._semaphore.release()
+
 
 class ProcessWithReturnValue(Process):
     """
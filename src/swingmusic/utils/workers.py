@@ -0,0 +1,492 @@
+"""
+A process-wide worker service shared by the background stages
+(tagging, thumbnails, colors, artist images and similar artists).
+"""
+
+import itertools
+import math
+import os
+import threading
+import time
+import weakref
+from collections import deque
+from concurrent.futures import (
+    Executor,
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+)
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from logging import getLogger
+from queue import PriorityQueue, Queue
+from typing import Any, Callable, Iterable, Iterator
+
+from swingmusic.config import UserConfig
+
+log = getLogger(__name__)
+
+
+def available_cpus() -> int:
+    """
+    Returns the number of CPUs this process can use.
+
+    Takes the CPU affinity mask and the cgroup CPU quota into account,
+    so that a container limited to 2 CPUs on a 32 core host gets 2.
+    """
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except (AttributeError, OSError):
+        cpus = os.cpu_count() or 1
+
+    quota = None
+
+    try:
+        # INFO: cgroup v2, eg. "200000 100000" or "max 100000"
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            limit, period = f.read().split()[:2]
+
+        if limit != "max":
+            quota = int(limit) / int(period)
+    except (OSError, ValueError):
+        try:
+            # INFO: cgroup v1
+            with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as f:
+                limit = int(f.read())
+
+            with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as f:
+                period = int(f.read())
+
+            if limit > 0 and period > 0:
+                quota = limit / period
+        except (OSError, ValueError):
+            pass
+
+    if quota is not None:
+        cpus = min(cpus, max(1, math.ceil(quota)))
+
+    return max(1, cpus)
+
+
+@dataclass(frozen=True)
+class WorkerQueue:
+    """
+    A named queue of the worker service.
+    """
+
+    name: str
+    priority: int
+    """
+    Queued tasks with a lower priority are started first.
+    """
+    threaded: bool = False
+    """
+    Whether tasks run on threads instead of processes. For I/O bound work.
+    """
+
+
+QUEUES = {
+    q.name: q
+    for q in [
+        WorkerQueue("tagging", priority=0),
+        WorkerQueue("thumbnails", priority=1),
+        WorkerQueue("colors", priority=2),
+        WorkerQueue("network", priority=3, threaded=True),
+    ]
+}
+
+
+@dataclass
+class QueueStats:
+    queued: int = 0
+    running: int = 0
+    completed: int = 0
+    failed: int = 0
+    cancelled: int = 0
+    cpu_seconds: float = 0.0
+    finished: deque = field(default_factory=lambda: deque(maxlen=1000))
+    """
+    Timestamps of the last finished tasks, used to compute the throughput.
+    """
+
+    def to_dict(self, window: float = 10.0):
+        since = time.monotonic() - window
+        recent = sum(1 for t in self.finished if t >= since)
+
+        return {
+            "queued": self.queued,
+            "running": self.running,
+            "completed": self.completed,
+            "failed": self.failed,
+            "cancelled": self.cancelled,
+            "cpu_seconds": round(self.cpu_seconds, 2),
+            "per_second": round(recent / window, 2),
+        }
+
+
+def run_timed(fn: Callable, item: Any) -> tuple[Any, float]:
+    """
+    Runs a task on a worker, and returns its result with the CPU time it used.
+    """
+    start = time.thread_time()
+    result = fn(item)
+
+    return result, time.thread_time() - start
+
+
+@dataclass(order=True)
+class Task:
+    priority: int
+    seq: int
+    fn: Callable = field(compare=False)
+    item: Any = field(compare=False)
+    group: "TaskGroup" = field(compare=False)
+
+
+class TaskGroup:
+    """
+    The tasks submitted by one call to `WorkerPool.map`.
+
+    Iterating a group yields the results as the tasks complete.
+    """
+
+    def __init__(self, queue: WorkerQueue, total: int):
+        self.queue = queue
+        self.total = total
+        self.cancelled = False
+        self._done: Queue[tuple[Any, Future | None]] = Queue()
+        self._futures: set[Future] = set()
+        self._lock = threading.Lock()
+        self.cpu_seconds = 0.0
+        """
+        The CPU time used by the completed tasks.
+        """
+
+    def __len__(self):
+        return self.total
+
+    def __iter__(self) -> Iterator[Any]:
+        """
+        Yields the results in completion order. If a task raised,
+        the rest of the group is cancelled and the error is re-raised.
+        """
+        for _, future in self.as_completed():
+            try:
+                yield future.result()
+            except BaseException:
+                self.cancel()
+                raise
+
+    def as_completed(self) -> Iterator[tuple[Any, Future]]:
+        """
+        Yields `(item, future)` pairs as the tasks complete.
+        Cancelled tasks are skipped.
+        """
+        for _ in range(self.total):
+            item, future = self._done.get()
+
+            if future is not None and not future.cancelled():
+                yield item, future
+
+    def cancel(self):
+        """
+        Drops the queued tasks and cancels the ones that have not started.
+        Tasks that are already running finish, and are still yielded.
+        """
+        with self._lock:
+            self.cancelled = True
+            futures = list(self._futures)
+
+        for future in futures:
+            future.cancel()
+
+    def _started(self, future: Future):
+        with self._lock:
+            self._futures.add(future)
+
+            if self.cancelled:
+                future.cancel()
+
+    def _finished(
+        self,
+        item: Any,
+        started: Future | None,
+        result: Future | None,
+        cpu: float = 0.0,
+    ):
+        with self._lock:
+            self._futures.discard(started)
+            self.cpu_seconds += cpu
+
+        self._done.put((item, result))
+
+
+class Lane:
+    """
+    An executor fed from a priority queue, with at most `workers`
+    tasks submitted at a time so that queued tasks stay reorderable.
+    """
+
+    def __init__(self, name: str, workers: int, threaded: bool):
+        self.name = name
+        self.workers = workers
+        self.threaded = threaded
+        self.tasks: PriorityQueue[Task] = PriorityQueue()
+        self.slots = threading.Semaphore(workers)
+        self.executor: Executor | None = None
+        self.dispatcher = threading.Thread(
+            target=self.dispatch, name=f"workers-{name}", daemon=True
+        )
+        self.dispatcher.start()
+
+    def get_executor(self) -> Executor:
+        if self.executor is None:
+            if self.threaded:
+                self.executor = ThreadPoolExecutor(
+                    max_workers=self.workers, thread_name_prefix=f"workers-{self.name}"
+                )
+            else:
+                self.executor = ProcessPoolExecutor(max_workers=self.workers)
+
+        return self.executor
+
+    def dispatch(self):
+        while True:
+            self.slots.acquire()
+            task = self.tasks.get()
+            stats = WorkerPool.stats_for(task.group.queue)
+
+            with WorkerPool.lock:
+                stats.queued -= 1
+
+            if task.group.cancelled:
+                self.slots.release()
+                WorkerPool.record(stats, "cancelled")
+                task.group._finished(task.item, None, None)
+                continue
+
+            try:
+                future = self.submit(task)
+            except Exception as e:
+                # INFO: Fail the task instead of the dispatcher,
+                # which would leave every group on this lane waiting
+                log.error(f"Failed to start a task on worker pool '{self.name}': {e}")
+                self.slots.release()
+                WorkerPool.record(stats, "failed")
+
+                failed: Future = Future()
+                failed.set_exception(e)
+                task.group._finished(task.item, None, failed)
+                continue
+
+            with WorkerPool.lock:
+                stats.running += 1
+
+            task.group._started(future)
+            future.add_done_callback(
+                lambda f, task=task, stats=stats: self.done(task, stats, f)
+            )
+
+    def submit(self, task: Task) -> Future:
+        """
+        Submits a task to the executor, restarting it once if it is broken.
+        """
+        try:
+            return self.get_executor().submit(run_timed, task.fn, task.item)
+        except (BrokenProcessPool, RuntimeError) as e:
+            # INFO: A crashed worker breaks the whole process pool. Start a new one.
+            log.error(f"Worker pool '{self.name}' is broken, restarting: {e}")
+            self.shutdown(terminate=isinstance(e, BrokenProcessPool))
+
+            return self.get_executor().submit(run_timed, task.fn, task.item)
+
+    def done(self, task: Task, stats: QueueStats, future: Future):
+        self.slots.release()
+
+        # INFO: Unwraps the result of `run_timed` for the caller
+        outer: Future = Future()
+        cpu = 0.0
+
+        if future.cancelled():
+            outer.cancel()
+            outcome = "cancelled"
+        elif future.exception() is not None:
+            outer.set_exception(future.exception())
+            outcome = "failed"
+        else:
+            result, cpu = future.result()
+            outer.set_result(result)
+            outcome = "completed"
+
+        with WorkerPool.lock:
+            stats.running -= 1
+            stats.cpu_seconds += cpu
+
+        WorkerPool.record(stats, outcome)
+        task.group._finished(task.item, future, outer, cpu)
+
+    def shutdown(self, terminate: bool = False):
+        """
+        Stops the executor. Running tasks finish unless `terminate` is set,
+        in which case the worker processes are killed and their tasks fail.
+        """
+        executor = self.executor
+
+        if executor is None:
+            return
+
+        self.executor = None
+        # INFO: ProcessPoolExecutor has no public way to stop running workers
+        processes = list((getattr(executor, "_processes", None) or {}).values())
+        executor.shutdown(wait=False, cancel_futures=True)
+
+        if terminate:
+            for process in processes:
+                process.terminate()
+
+
+class WorkerPool:
+    """
+    Runs CPU heavy background work on a single, lazily started pool of
+    worker processes shared by all stages, instead of each stage forking
+    its own pool.
+
+    Work is submitted to a named queue (see `QUEUES`). When more work is
+    queued than there are workers, tasks from higher priority queues start
+    first. I/O bound queues run on a separate thread pool.
+
+    The number of workers is read from `UserConfig.workerCount` when the
+    pool starts. 0 means half the CPUs available to the process.
+    """
+
+    lanes: dict[bool, Lane] = {}
+    stats: dict[str, QueueStats] = {}
+    groups: dict[str, "weakref.WeakSet[TaskGroup]"] = {}
+    """
+    The task groups submitted to each queue, so that they can be cancelled.
+    """
+    seq = itertools.count()
+    lock = threading.Lock()
+
+    @classmethod
+    def get_worker_count(cls) -> int:
+        workers = UserConfig().workerCount
+
+        if workers <= 0:
+            workers = max(1, available_cpus() // 2)
+
+        return workers
+
+    @classmethod
+    def get_lane(cls, queue: WorkerQueue) -> Lane:
+        with cls.lock:
+            lane = cls.lanes.get(queue.threaded)
+
+            if lane is None:
+                workers = cls.get_worker_count()
+                name = "process"
+
+                if queue.threaded:
+                    # INFO: I/O bound tasks mostly wait, so more of them can run
+                    workers *= 2
+                    name = "thread"
+
+                lane = Lane(name, workers, threaded=queue.threaded)
+                cls.lanes[queue.threaded] = lane
+
+            return lane
+
+    @classmethod
+    def stats_for(cls, queue: WorkerQueue) -> QueueStats:
+        with cls.lock:
+            return cls.stats.setdefault(queue.name, QueueStats())
+
+    @classmethod
+    def record(cls, stats: QueueStats, outcome: str):
+        with cls.lock:
+            setattr(stats, outcome, getattr(stats, outcome) + 1)
+            stats.finished.append(time.monotonic())
+
+    @classmethod
+    def map(cls, fn: Callable, items: Iterable[Any], queue: str) -> TaskGroup:
+        """
+        Queues `fn(item)` for each item on the named queue.
+
+        For process queues, `fn` and the items must be picklable.
+        Returns a `TaskGroup` that yields the results as they complete.
+        """
+        workerqueue = QUEUES[queue]
+        lane = cls.get_lane(workerqueue)
+        stats = cls.stats_for(workerqueue)
+        items = list(items)
+        group = TaskGroup(workerqueue, len(items))
+
+        with cls.lock:
+            stats.queued += len(items)
+            cls.groups.setdefault(queue, weakref.WeakSet()).add(group)
+
+        for item in items:
+            lane.tasks.put(
+                Task(workerqueue.priority, next(cls.seq), fn, item, group)
+            )
+
+        return group
+
+    @classmethod
+    def queue_depth(cls, queue: str) -> int:
+        """
+        Returns the number of tasks waiting on the named queue.
+        """
+        return cls.stats_for(QUEUES[queue]).queued
+
+    @classmethod
+    def get_stats(cls) -> dict[str, Any]:
+        """
+        Returns the queue depth and throughput of each queue.
+        """
+        with cls.lock:
+            lanes = {
+                lane.name: {"workers": lane.workers, "started": lane.executor is not None}
+                for lane in cls.lanes.values()
+            }
+
+        return {
+            "cpus": available_cpus(),
+            "lanes": lanes,
+            "queues": {
+                name: cls.stats_for(queue).to_dict() for name, queue in QUEUES.items()
+            },
+        }
+
+    @classmethod
+    def cancel(cls, queue: str, terminate: bool = False):
+        """
+        Cancels the tasks queued on the named queue.
+
+        With `terminate`, the workers running its tasks are killed as well.
+        Worker processes are shared by all process queues, so running tasks
+        of the other process queues fail too.
+        """
+        workerqueue = QUEUES[queue]
+
+        with cls.lock:
+            groups = list(cls.groups.get(queue, ()))
+            lane = cls.lanes.get(workerqueue.threaded)
+
+        for group in groups:
+            group.cancel()
+
+        # INFO: Threads can't be killed, their running tasks finish
+        if terminate and lane is not None and not workerqueue.threaded:
+            lane.shutdown(terminate=True)
+
+    @classmethod
+    def shutdown(cls, terminate: bool = False):
+        """
+        Stops the worker processes. They are started again on the next `map`.
+        """
+        with cls.lock:
+            lanes = list(cls.lanes.values())
+
+        for lane in lanes:
+            lane.shutdown(terminate=terminate)
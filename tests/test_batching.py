@@ -0,0 +1,134 @@
+import os
+import tempfile
+import unittest
+
+from sqlalchemy import create_engine, func, select
+
+from swingmusic.db import Base
+from swingmusic.db.engine import DbEngine
+from swingmusic.db.libdata import TrackTable
+from swingmusic.utils.batching import AdaptiveBatchSize
+
+
+def make_row(i: int, **overrides):
+    row = {
+        "album": "Album",
+        "albumartists": "Artist",
+        "albumhash": "albumhash",
+        "artists": "Artist",
+        "bitrate": 320,
+        "copyright": "",
+        "date": 2000,
+        "disc": 1,
+        "duration": 200,
+        "filepath": f"/music/{i}.mp3",
+        "folder": "/music",
+        "genres": "",
+        "last_mod": i,
+        "title": f"Song {i}",
+        "track": i,
+        "trackhash": f"trackhash{i}",
+        "lastplayed": 0,
+        "playcount": 0,
+        "playduration": 0,
+        "extra": {},
+    }
+    row.update(overrides)
+    return row
+
+
+class TestInsertBatch(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.engine = create_engine(
+            f"sqlite+pysqlite:///{os.path.join(self.tmpdir.name, 'test.db')}"
+        )
+        Base.metadata.create_all(self.engine)
+
+        self.previous_engine = DbEngine._engine
+        DbEngine._engine = self.engine
+
+    def tearDown(self):
+        DbEngine._engine = self.previous_engine
+        self.engine.dispose()
+        self.tmpdir.cleanup()
+
+    def filepaths(self):
+        with self.engine.connect() as conn:
+            return set(conn.scalars(select(TrackTable.filepath)))
+
+    def test_inserts_whole_batch(self):
+        rows = [make_row(i) for i in range(20)]
+
+        self.assertEqual(TrackTable.insert_batch(rows), rows)
+        self.assertEqual(len(self.filepaths()), 20)
+
+    def test_bad_row_is_isolated(self):
+        rows = [make_row(i) for i in range(20)]
+        rows[7] = make_row(7, title=None)
+
+        inserted = TrackTable.insert_batch(rows)
+
+        self.assertEqual(len(inserted), 19)
+        self.assertNotIn(rows[7], inserted)
+        self.assertEqual(
+            self.filepaths(), {row["filepath"] for row in rows} - {"/music/7.mp3"}
+        )
+
+    def test_existing_filepath_is_skipped(self):
+        TrackTable.insert_batch([make_row(3)])
+        inserted = TrackTable.insert_batch([make_row(i) for i in range(10)])
+
+        self.assertEqual(len(inserted), 9)
+
+        with self.engine.connect() as conn:
+            self.assertEqual(
+                conn.scalar(select(func.count()).select_from(TrackTable)), 10
+            )
+
+
+class TestAdaptiveBatchSize(unittest.TestCase):
+    def test_shrinks_when_inserts_are_slow(self):
+        inserts = AdaptiveBatchSize(initial=1000, target=0.25)
+
+        for _ in range(10):
+            # INFO: 10ms per row, so 25 rows fit in the target time
+            inserts.record(inserts.size, inserts.size * 0.01)
+
+        self.assertEqual(inserts.size, inserts.minimum)
+
+    def test_grows_when_inserts_are_fast(self):
+        inserts = AdaptiveBatchSize(initial=150, target=0.25)
+        sizes = []
+
+        for _ in range(5):
+            # INFO: 0.1ms per row, so 2500 rows fit in the target time
+            inserts.record(inserts.size, inserts.size * 0.0001)
+            sizes.append(inserts.size)
+
+        self.assertEqual(sizes, sorted(sizes))
+        self.assertGreater(sizes[-1], 2000)
+        self.assertLessEqual(sizes[-1], 2500)
+
+    def test_stays_within_bounds(self):
+        inserts = AdaptiveBatchSize(initial=150, minimum=50, maximum=500)
+
+        for _ in range(10):
+            inserts.record(inserts.size, 0)
+
+        self.assertEqual(inserts.size, 500)
+
+        for _ in range(10):
+            inserts.record(inserts.size, 60)
+
+        self.assertEqual(inserts.size, 50)
+
+    def test_ignores_empty_batches(self):
+        inserts = AdaptiveBatchSize(initial=150)
+        inserts.record(0, 5)
+
+        self.assertEqual(inserts.size, 150)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,246 @@
+import os
+import tempfile
+import unittest
+
+from sortedcontainers import SortedDict, SortedSet
+from sqlalchemy import create_engine, select
+
+from swingmusic.config import UserConfig
+from swingmusic.db import Base
+from swingmusic.db.engine import DbEngine
+from swingmusic.db.libdata import TrackTable
+from swingmusic.lib.filemoves import IndexedFile, match_moves
+from swingmusic.lib.storeupdater import apply_moves
+from swingmusic.models.track import Track
+from swingmusic.store.folder import FolderStore
+from swingmusic.store.tracks import TrackStore
+
+MTIME = 1_700_000_000
+
+
+def make_track(filepath: str, title: str, playcount: int = 0) -> Track:
+    return Track(
+        id=1,
+        album="Album",
+        albumartists="Artist",
+        albumhash="albumhash",
+        artists="Artist",
+        bitrate=320,
+        copyright="",
+        date=2000,
+        disc=1,
+        duration=200,
+        filepath=filepath,
+        folder=os.path.dirname(filepath),
+        genres="",
+        last_mod=MTIME,
+        title=title,
+        track=1,
+        trackhash="",
+        extra={},
+        lastplayed=0,
+        playcount=playcount,
+        playduration=0,
+        config=UserConfig(),
+    )
+
+
+def reset_stores():
+    TrackStore.trackhashmap = {}
+    TrackStore.albumindex = {}
+    TrackStore.artistindex = {}
+    TrackStore.folderindex = SortedDict()
+    TrackStore.filepathmap = {}
+    TrackStore.corpus.clear()
+    TrackStore.invalidate()
+    FolderStore.filepaths = SortedSet()
+
+
+class TestMatchMoves(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.root = self.tmpdir.name
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def create(self, name: str, size: int, mtime: int = MTIME) -> str:
+        path = os.path.join(self.root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        with open(path, "wb") as f:
+            f.write(b"\0" * size)
+
+        os.utime(path, (mtime, mtime))
+        return path
+
+    def indexed(self, filepath: str, size: int | None, title: str = "Tagged Title"):
+        extra = {"filesize": size} if size else {}
+        return IndexedFile(filepath, MTIME, title, "Album", extra)
+
+    def test_moved_file_is_matched(self):
+        new = self.create("new/song.mp3", 1000)
+        old = self.indexed("/old/song.mp3", 1000)
+
+        self.assertEqual(match_moves([old], [new]), {old.filepath: new})
+
+    def test_different_identity_is_not_matched(self):
+        bigger = self.create("new/song.mp3", 1001)
+        newer = self.create("new/other.mp3", 1000, mtime=MTIME + 60)
+        flac = self.create("new/song.flac", 1000)
+        old = self.indexed("/old/song.mp3", 1000)
+
+        self.assertEqual(match_moves([old], [bigger, newer, flac]), {})
+
+    def test_ambiguous_missing_files_are_skipped(self):
+        new = self.create("new/song.mp3", 1000)
+        first = self.indexed("/old/a/song.mp3", 1000)
+        second = self.indexed("/old/b/song.mp3", 1000)
+
+        self.assertEqual(match_moves([first, second], [new]), {})
+
+    def test_ambiguous_new_files_are_skipped(self):
+        copies = [self.create(f"new/{i}/song.mp3", 1000) for i in range(2)]
+        old = self.indexed("/old/song.mp3", 1000)
+
+        self.assertEqual(match_moves([old], copies), {})
+
+    def test_files_without_size_are_skipped(self):
+        new = self.create("new/song.mp3", 1000)
+        old = self.indexed("/old/song.mp3", None)
+
+        self.assertEqual(match_moves([old], [new]), {})
+
+    def test_renamed_file_with_tags_is_matched(self):
+        new = self.create("new/renamed.mp3", 1000)
+        old = self.indexed("/old/song.mp3", 1000)
+
+        self.assertEqual(match_moves([old], [new]), {old.filepath: new})
+
+    def test_renamed_file_titled_from_filename_is_skipped(self):
+        new = self.create("new/renamed.mp3", 1000)
+        old = self.indexed("/old/Some Song.mp3", 1000, title="Some Song")
+
+        self.assertEqual(match_moves([old], [new]), {})
+
+    def test_moved_file_titled_from_filename_is_matched(self):
+        new = self.create("new/Some Song.mp3", 1000)
+        old = self.indexed("/old/Some Song.mp3", 1000, title="Some Song")
+
+        self.assertEqual(match_moves([old], [new]), {old.filepath: new})
+
+
+class TestApplyMoves(unittest.TestCase):
+    def setUp(self):
+        reset_stores()
+
+    def tearDown(self):
+        reset_stores()
+
+    def test_stores_stay_consistent(self):
+        moved = make_track("/music/a/song.mp3", "Song", playcount=7)
+        other = make_track("/music/a/other.mp3", "Other")
+
+        TrackStore.add_tracks([moved, other])
+        FolderStore.load_filepaths()
+
+        apply_moves({"/music/a/song.mp3": "/music/b/song.mp3"})
+
+        self.assertNotIn("/music/a/song.mp3", TrackStore.filepathmap)
+        self.assertIs(TrackStore.filepathmap["/music/b/song.mp3"], moved)
+        self.assertEqual(moved.folder, "/music/b/")
+        self.assertEqual(moved.playcount, 7)
+
+        self.assertEqual(
+            list(FolderStore.filepaths), sorted(TrackStore.filepathmap.keys())
+        )
+        self.assertEqual(TrackStore.get_tracks_in_path("/music/b/"), [moved])
+        self.assertEqual(TrackStore.get_tracks_in_path("/music/a/"), [other])
+        self.assertEqual(len(TrackStore.corpus), 2)
+
+    def test_unknown_filepath_is_ignored(self):
+        track = make_track("/music/a/song.mp3", "Song")
+        TrackStore.add_track(track)
+        FolderStore.load_filepaths()
+
+        apply_moves({"/music/a/missing.mp3": "/music/b/missing.mp3"})
+
+        self.assertEqual(list(FolderStore.filepaths), ["/music/a/song.mp3"])
+        self.assertEqual(list(TrackStore.filepathmap), ["/music/a/song.mp3"])
+
+
+class TestMoveTracksInDatabase(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.engine = create_engine(
+            f"sqlite+pysqlite:///{os.path.join(self.tmpdir.name, 'test.db')}"
+        )
+        Base.metadata.create_all(self.engine)
+
+        self.previous_engine = DbEngine._engine
+        DbEngine._engine = self.engine
+
+    def tearDown(self):
+        DbEngine._engine = self.previous_engine
+        self.engine.dispose()
+        self.tmpdir.cleanup()
+
+    def test_paths_are_rewritten_and_play_data_kept(self):
+        TrackTable.insert_batch([self.make_row()])
+
+        TrackTable.move_tracks({"/music/a/song.mp3": "/music/b/song.mp3"})
+
+        with self.engine.connect() as conn:
+            rows = conn.execute(
+                select(
+                    TrackTable.filepath,
+                    TrackTable.folder,
+                    TrackTable.playcount,
+                    TrackTable.playduration,
+                )
+            ).all()
+
+        self.assertEqual(rows, [("/music/b/song.mp3", "/music/b", 7, 1400)])
+
+    def test_move_info_matches_indexed_file(self):
+        TrackTable.insert_batch([self.make_row()])
+
+        info = list(TrackTable.get_move_info(["/music/a/song.mp3", "/missing.mp3"]))
+
+        self.assertEqual(
+            [IndexedFile(*row) for row in info],
+            [
+                IndexedFile(
+                    "/music/a/song.mp3", MTIME, "Song", "Album", {"filesize": 1000}
+                )
+            ],
+        )
+
+    @staticmethod
+    def make_row():
+        return {
+            "album": "Album",
+            "albumartists": "Artist",
+            "albumhash": "albumhash",
+            "artists": "Artist",
+            "bitrate": 320,
+            "copyright": "",
+            "date": 2000,
+            "disc": 1,
+            "duration": 200,
+            "filepath": "/music/a/song.mp3",
+            "folder": "/music/a",
+            "genres": "",
+            "last_mod": MTIME,
+            "title": "Song",
+            "track": 1,
+            "trackhash": "trackhash",
+            "lastplayed": MTIME,
+            "playcount": 7,
+            "playduration": 1400,
+            "extra": {"filesize": 1000},
+        }
+
+
+if __name__ == "__main__":
+    unittest.main()
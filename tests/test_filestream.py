@@ -0,0 +1,143 @@
+import os
+import tempfile
+import unittest
+
+from flask import Flask
+
+from swingmusic.utils.filestream import send_file_range
+
+
+class FileWrapper:
+    """
+    A `wsgi.file_wrapper` that records whether it was used.
+    """
+
+    used = False
+
+    def __init__(self, file, block_size):
+        FileWrapper.used = True
+        self.file = file
+
+    def __iter__(self):
+        return iter(lambda: self.file.read(64 * 1024), b"")
+
+    def close(self):
+        self.file.close()
+
+
+class TestSendFileRange(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.data = os.urandom(100_003)
+
+        with tempfile.NamedTemporaryFile(suffix=".mp3", delete=False) as f:
+            f.write(cls.data)
+            cls.path = f.name
+
+        app = Flask(__name__)
+        app.add_url_rule(
+            "/file",
+            "file",
+            lambda: send_file_range(cls.path, "audio/mpeg"),
+            methods=["GET", "HEAD"],
+        )
+        cls.client = app.test_client()
+
+    @classmethod
+    def tearDownClass(cls):
+        os.remove(cls.path)
+
+    def get(self, **headers):
+        return self.client.get("/file", headers=headers)
+
+    def test_whole_file(self):
+        response = self.get()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, self.data)
+        self.assertEqual(response.headers["Accept-Ranges"], "bytes")
+        self.assertEqual(response.headers["Content-Length"], str(len(self.data)))
+
+    def test_open_ended_range(self):
+        response = self.get(Range="bytes=0-")
+
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.headers["Content-Range"], "bytes 0-100002/100003")
+        self.assertEqual(response.data, self.data)
+
+    def test_range(self):
+        response = self.get(Range="bytes=10-19")
+
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.headers["Content-Range"], "bytes 10-19/100003")
+        self.assertEqual(response.headers["Content-Length"], "10")
+        self.assertEqual(response.data, self.data[10:20])
+
+    def test_suffix_range(self):
+        response = self.get(Range="bytes=-5")
+
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(
+            response.headers["Content-Range"], "bytes 99998-100002/100003"
+        )
+        self.assertEqual(response.data, self.data[-5:])
+
+    def test_multiple_ranges(self):
+        response = self.get(Range="bytes=0-1,5-6")
+
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response.headers["Content-Range"], "bytes */100003")
+        self.assertEqual(response.data, b"")
+
+    def test_out_of_bounds_range(self):
+        response = self.get(Range="bytes=200000-")
+
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response.headers["Content-Range"], "bytes */100003")
+
+    def test_if_range(self):
+        etag = self.get().headers["ETag"]
+
+        current = self.get(Range="bytes=5-9", **{"If-Range": etag})
+        self.assertEqual(current.status_code, 206)
+        self.assertEqual(current.data, self.data[5:10])
+
+        stale = self.get(Range="bytes=5-9", **{"If-Range": '"stale"'})
+        self.assertEqual(stale.status_code, 200)
+        self.assertEqual(stale.data, self.data)
+
+    def test_not_modified(self):
+        etag = self.get().headers["ETag"]
+        response = self.get(**{"If-None-Match": etag})
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.data, b"")
+
+    def test_head(self):
+        response = self.client.head("/file", headers={"Range": "bytes=0-9"})
+
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.headers["Content-Length"], "10")
+        self.assertEqual(response.headers["Content-Range"], "bytes 0-9/100003")
+        self.assertEqual(response.data, b"")
+
+    def test_file_wrapper_only_for_ranges_to_the_end(self):
+        environ = {"wsgi.file_wrapper": FileWrapper}
+
+        FileWrapper.used = False
+        response = self.client.get(
+            "/file", headers={"Range": "bytes=100-"}, environ_base=environ
+        )
+        self.assertTrue(FileWrapper.used)
+        self.assertEqual(response.data, self.data[100:])
+
+        FileWrapper.used = False
+        response = self.client.get(
+            "/file", headers={"Range": "bytes=100-199"}, environ_base=environ
+        )
+        self.assertFalse(FileWrapper.used)
+        self.assertEqual(response.data, self.data[100:200])
+
+
+if __name__ == "__main__":
+    unittest.main()
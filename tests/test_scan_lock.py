@@ -0,0 +1,40 @@
+import threading
+import time
+import unittest
+from unittest import mock
+
+from swingmusic.lib import index
+
+
+class TestScanLock(unittest.TestCase):
+    def test_one_scan_at_a_time(self):
+        runs = []
+        release = threading.Event()
+
+        def scan_library(quick, rebuild):
+            runs.append((quick, rebuild))
+            release.wait(5)
+
+        with mock.patch.object(index, "scan_library", scan_library):
+            self.assertTrue(index.index_everything(quick=True))
+            self.assertFalse(index.index_everything(quick=True, queue=False))
+            self.assertIsNone(index.queued_scan)
+
+            # INFO: Scans queued while one runs are merged into one follow-up
+            self.assertFalse(index.index_everything(quick=True))
+            self.assertFalse(index.index_everything(rebuild=True))
+            release.set()
+
+            for _ in range(50):
+                if not index.scan_lock.locked() and len(runs) == 2:
+                    break
+
+                time.sleep(0.05)
+
+        self.assertEqual(runs, [(True, False), (False, True)])
+        self.assertFalse(index.scan_lock.locked())
+        self.assertIsNone(index.queued_scan)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+import random
+import unittest
+
+from rapidfuzz import fuzz
+
+from swingmusic.lib.searchlib import SearchCache, search_corpus
+from swingmusic.store.searchcorpus import SearchCorpus
+
+
+def make_corpus():
+    rng = random.Random(0)
+    words = ["best", "big", "band", "blue", "beach", "bell", "boys", "bright"]
+
+    titles = [
+        f"the {rng.choice(words)}{i} {rng.choice(words)}{i * 7}" for i in range(5000)
+    ]
+    titles.append("The Beatles Forever")
+
+    corpus = SearchCorpus(key=lambda title: title, text=lambda title: title)
+    corpus.load(titles)
+    return corpus
+
+
+class TestSearchCache(unittest.TestCase):
+    def setUp(self):
+        SearchCache.clear()
+        self.corpus = make_corpus()
+
+    def tearDown(self):
+        SearchCache.clear()
+
+    def search(self, query: str, limit: int = 150):
+        return search_corpus(
+            "tracks",
+            self.corpus,
+            version=0,
+            query=query,
+            scorer=fuzz.WRatio,
+            score_cutoff=50,
+            limit=limit,
+        )
+
+    def test_typing_matches_fresh_search(self):
+        query = "the beatles"
+
+        for end in range(1, len(query) + 1):
+            typed = self.search(query[:end])
+            fresh = self.corpus.extract(query[:end], fuzz.WRatio, 50, limit=150)
+
+            self.assertEqual(typed, fresh, query[:end])
+
+        self.assertEqual(typed[0].item, "The Beatles Forever")
+
+    def test_repeated_query_is_a_hit(self):
+        first = self.search("the beatles")
+        second = self.search("the beatles")
+
+        self.assertEqual(first, second)
+        self.assertEqual(SearchCache.stats()["hits"], 1)
+        self.assertEqual(SearchCache.stats()["misses"], 1)
+
+    def test_limits_are_cached_separately(self):
+        self.search("the beatles")
+        fewer = self.search("the beatles", limit=4)
+
+        self.assertEqual(fewer, self.corpus.extract("the beatles", fuzz.WRatio, 50, 4))
+        self.assertEqual(SearchCache.stats()["misses"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
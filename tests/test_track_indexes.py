@@ -0,0 +1,160 @@
+import copy
+import unittest
+
+from sortedcontainers import SortedDict
+
+from swingmusic.config import UserConfig
+from swingmusic.models.track import Track
+from swingmusic.store.tracks import TrackStore
+
+
+def make_track(
+    filepath: str, title: str, album: str = "Album", artists: str = "Artist"
+) -> Track:
+    return Track(
+        id=1,
+        album=album,
+        albumartists=artists,
+        albumhash=f"{album}hash",
+        artists=artists,
+        bitrate=320,
+        copyright="",
+        date=2000,
+        disc=1,
+        duration=200,
+        filepath=filepath,
+        folder=filepath.rsplit("/", 1)[0],
+        genres="",
+        last_mod=0,
+        title=title,
+        track=1,
+        trackhash="",
+        extra={},
+        lastplayed=0,
+        playcount=0,
+        playduration=0,
+        config=UserConfig(),
+    )
+
+
+def reset_store():
+    TrackStore.trackhashmap = {}
+    TrackStore.albumindex = {}
+    TrackStore.artistindex = {}
+    TrackStore.folderindex = SortedDict()
+    TrackStore.filepathmap = {}
+    TrackStore.corpus.clear()
+    TrackStore.invalidate()
+
+
+def corpus_items():
+    return TrackStore.corpus.view()[0]
+
+
+class TestTrackIndexes(unittest.TestCase):
+    def setUp(self):
+        reset_store()
+
+    def tearDown(self):
+        reset_store()
+
+    def test_lookups_keep_insertion_order(self):
+        titles = ["Zeta", "Alpha", "Mid", "Beta"]
+        tracks = [make_track(f"/music/a/{i}.mp3", title) for i, title in enumerate(titles)]
+        TrackStore.add_tracks(tracks)
+
+        hashes = [t.trackhash for t in tracks]
+        artisthash = tracks[0].artisthashes[0]
+
+        self.assertEqual(list(TrackStore.albumindex["Albumhash"]), hashes)
+        self.assertEqual(list(TrackStore.artistindex[artisthash]), hashes)
+        self.assertEqual(list(TrackStore.folderindex["/music/a/"]), hashes)
+
+        self.assertEqual(TrackStore.get_tracks_by_albumhash("Albumhash"), tracks)
+        self.assertEqual(TrackStore.get_tracks_by_artisthash(artisthash), tracks)
+        self.assertEqual(TrackStore.get_tracks_in_path("/music/a/"), tracks)
+
+    def test_readded_track_moves_to_the_end(self):
+        tracks = [make_track(f"/music/a/{i}.mp3", f"Song {i}") for i in range(3)]
+        TrackStore.add_tracks(tracks)
+
+        TrackStore.remove_track(tracks[0])
+        TrackStore.add_track(tracks[0])
+
+        self.assertEqual(
+            TrackStore.get_tracks_by_albumhash("Albumhash"),
+            [tracks[1], tracks[2], tracks[0]],
+        )
+
+    def test_retag_keeping_trackhash_added_before_remove(self):
+        old = make_track("/music/a/song.mp3", "Song")
+        TrackStore.add_track(old)
+
+        # INFO: Same path and trackhash, as when only the genre changes
+        new = copy.copy(old)
+        new.genres = [{"name": "Rock", "genrehash": "rock"}]
+
+        TrackStore.add_track(new)
+        TrackStore.remove_track(old)
+
+        self.assertIs(TrackStore.filepathmap["/music/a/song.mp3"], new)
+        self.assertEqual(corpus_items(), (new,))
+        self.assertEqual(TrackStore.trackhashmap[new.trackhash].tracks, [new])
+        self.assertEqual(TrackStore.get_tracks_by_albumhash("Albumhash"), [new])
+        self.assertEqual(TrackStore.get_tracks_in_path("/music/a/"), [new])
+
+    def test_retag_changing_trackhash(self):
+        old = make_track("/music/a/song.mp3", "Song")
+        TrackStore.add_track(old)
+
+        new = make_track("/music/a/song.mp3", "Song (Live)")
+        self.assertNotEqual(new.trackhash, old.trackhash)
+
+        TrackStore.add_track(new)
+        TrackStore.remove_track(old)
+
+        self.assertIs(TrackStore.filepathmap["/music/a/song.mp3"], new)
+        self.assertEqual(corpus_items(), (new,))
+        self.assertNotIn(old.trackhash, TrackStore.trackhashmap)
+        self.assertEqual(list(TrackStore.albumindex["Albumhash"]), [new.trackhash])
+        self.assertEqual(list(TrackStore.folderindex["/music/a/"]), [new.trackhash])
+
+    def test_removing_a_duplicate_keeps_shared_entries(self):
+        first = make_track("/music/a/song.mp3", "Song")
+        copy_ = make_track("/music/b/song.mp3", "Song")
+        self.assertEqual(first.trackhash, copy_.trackhash)
+
+        TrackStore.add_tracks([first, copy_])
+        TrackStore.remove_track(first)
+
+        self.assertEqual(list(TrackStore.filepathmap), ["/music/b/song.mp3"])
+        self.assertEqual(list(TrackStore.albumindex["Albumhash"]), [first.trackhash])
+        self.assertNotIn("/music/a/", TrackStore.folderindex)
+        self.assertEqual(list(TrackStore.folderindex["/music/b/"]), [first.trackhash])
+        self.assertEqual(TrackStore.get_tracks_by_albumhash("Albumhash"), [copy_])
+
+    def test_removing_the_last_track_drops_entries(self):
+        track = make_track("/music/a/song.mp3", "Song", album="Other")
+        kept = make_track("/music/a/kept.mp3", "Kept")
+        TrackStore.add_tracks([track, kept])
+
+        TrackStore.remove_track(track)
+
+        self.assertNotIn("Otherhash", TrackStore.albumindex)
+        self.assertEqual(list(TrackStore.folderindex["/music/a/"]), [kept.trackhash])
+        self.assertNotIn("/music/a/song.mp3", TrackStore.filepathmap)
+        self.assertEqual(corpus_items(), (kept,))
+
+    def test_removed_artist_entries_are_dropped(self):
+        solo = make_track("/music/a/solo.mp3", "Solo", artists="Solo Artist")
+        TrackStore.add_track(solo)
+        artisthash = solo.artisthashes[0]
+
+        TrackStore.remove_track(solo)
+
+        self.assertNotIn(artisthash, TrackStore.artistindex)
+        self.assertEqual(TrackStore.get_tracks_by_artisthash(artisthash), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
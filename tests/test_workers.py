@@ -0,0 +1,64 @@
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from unittest import mock
+
+from swingmusic.utils.workers import QUEUES, Lane, Task, TaskGroup
+
+
+def double(x: int):
+    return x * 2
+
+
+class BrokenExecutor:
+    def __init__(self):
+        self.shut_down = False
+
+    def submit(self, *args, **kwargs):
+        raise BrokenProcessPool("A worker died")
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        self.shut_down = True
+
+
+def queue_tasks(lane: Lane, items: list[int]) -> TaskGroup:
+    queue = QUEUES["network"]
+    group = TaskGroup(queue, len(items))
+
+    for seq, item in enumerate(items):
+        lane.tasks.put(Task(queue.priority, seq, double, item, group))
+
+    return group
+
+
+class TestLane(unittest.TestCase):
+    def test_broken_executor_is_shut_down_and_replaced(self):
+        lane = Lane("test-broken", 2, threaded=True)
+        broken = BrokenExecutor()
+        lane.executor = broken
+
+        group = queue_tasks(lane, [1, 2, 3])
+
+        self.assertEqual(sorted(group), [2, 4, 6])
+        self.assertTrue(broken.shut_down)
+        self.assertIsInstance(lane.executor, ThreadPoolExecutor)
+
+    def test_failed_submit_fails_the_task_only(self):
+        lane = Lane("test-failing", 2, threaded=True)
+
+        with mock.patch.object(
+            lane, "get_executor", side_effect=RuntimeError("cannot schedule")
+        ):
+            group = queue_tasks(lane, [1, 2])
+            errors = [future.exception() for _, future in group.as_completed()]
+
+        self.assertEqual(len(errors), 2)
+        self.assertTrue(all(isinstance(e, RuntimeError) for e in errors))
+
+        # INFO: The dispatcher keeps running once the executor works again
+        self.assertTrue(lane.dispatcher.is_alive())
+        self.assertEqual(sorted(queue_tasks(lane, [5])), [10])
+
+
+if __name__ == "__main__":
+    unittest.main()